@@ -1,17 +1,97 @@
+import time
+APP_START = time.perf_counter()  # reference point for startup timing, taken before the other imports
 import os
 import sys
+import copy
+import csv
+import atexit
+import glob
+import hashlib
+import hmac
+import ipaddress
+import fnmatch
+import argparse
+import re
+import select
+import asyncio
 import json
+import stat
+import mmap
+import shlex
 import shutil
+import signal
+import socket
+import socketserver
+import sqlite3
+import struct
+import itertools
 import threading
+import concurrent.futures
 import subprocess
+import tempfile
 import queue
+import collections
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import webbrowser
 
+IMPORTS_DONE = time.perf_counter()
+
+def user_dir(kind):
+    """Per-user folder for "config" (presets) or "cache" files (tool paths,
+    probes, build fingerprints, profiles: safe to delete), never the working
+    folder, which is usually someone's media. MEDIA_TOOL_HOME overrides both.
+    Not created here; see make_parent()."""
+    home = os.environ.get("MEDIA_TOOL_HOME")
+    if home:
+        return os.path.join(home, kind)
+    if os.name == "nt":
+        if kind == "cache":
+            return os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "media-tool", "Cache")
+        return os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), "media-tool")
+    if sys.platform == "darwin":
+        lib = os.path.expanduser("~/Library")
+        return os.path.join(lib, "Caches" if kind == "cache" else "Application Support", "media-tool")
+    if kind == "cache":
+        return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "media-tool")
+    return os.path.join(os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "media-tool")
+
+def make_parent(path):
+    """Create the folder ``path`` is to be written in."""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+
 APP_TITLE = "Media Tool GUI"
 APP_VERSION = "1.0.0"
-DEFAULT_PRESET_FILE = "tool_gui_presets.json"
+DEFAULT_PRESET_FILE = os.path.join(user_dir("config"), "tool_gui_presets.db")
+LEGACY_PRESET_FILE = "tool_gui_presets.db"  # in the working folder, before presets moved to user_dir()
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_CHUNK_WORKERS = max(2, (os.cpu_count() or 4) // 4)
+DEFAULT_CHUNK_SECONDS = 60
+DEFAULT_BENCH_SECONDS = 10
+BENCH_LAVFI_SOURCE = "testsrc2=size=1920x1080:rate=24"
+BENCH_PRESETS = ("ultrafast", "veryfast", "medium", "slow")
+BENCH_CRFS = ("22",)
+PROGRESS_STALL_SECONDS = 30
+DEFAULT_LOG_MAX_LINES = 10000
+RUNNER_BACKLOG_LINES = 20000
+RUNNER_MIN_FLUSH_MS = 20
+TOOL_CACHE_FILE = os.path.join(user_dir("cache"), "tool_gui_tools.json")
+TOOL_SEARCH_DEPTH = 3
+PROBE_CACHE_FILE = os.path.join(user_dir("cache"), "tool_gui_probes.json")
+PROBE_CACHE_SIZE = 500
+FS_TIMEOUT_SECONDS = 10
+FS_UI_WAIT_SECONDS = 0.25
+FS_CACHE_SECONDS = 2
+BUILD_CACHE_FILE = os.path.join(user_dir("cache"), "tool_gui_builds.json")
+BUILD_CACHE_SIZE = 5000
+STARTUP_BUDGET_MS = 1500
+LOAD_RECHECK_SECONDS = 5
+KILL_GRACE_SECONDS = 5
+WATCH_SETTLE_SECONDS = 10
+WATCH_POLL_SECONDS = 2
+DEFAULT_AGENT_PORT = 8765
+EXTERNAL_TOOLS = ("dovi_tool", "mp4muxer", "mkvmerge", "mkvextract", "mkvinfo", "mkvpropedit", "ffmpeg", "ffprobe")
 
 # ---------------------------------------------------------------------------
 # Theming (minimal, professional, compact). Two palettes: Light & Dark.
@@ -187,109 +267,4111 @@ def resource_path(relative: str) -> str:
             base = os.path.abspath(".")
     return os.path.join(base, relative)
 
+def startup_budget_ms():
+    """Time-to-first-window budget in ms (MEDIA_TOOL_STARTUP_BUDGET_MS overrides)."""
+    try:
+        return int(os.environ.get("MEDIA_TOOL_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS))
+    except ValueError:
+        return STARTUP_BUDGET_MS
+
+# ---------------------------------------------------------------------------
+# Profiling. MEDIA_TOOL_PROFILE=1 records a phase-by-phase startup timeline;
+# MEDIA_TOOL_PROFILE=sample additionally samples the Tk main thread's Python
+# stack while mainloop runs. Results go to MEDIA_TOOL_PROFILE_OUT (JSON, plus
+# a .collapsed.txt file of folded stacks for flame graph tools) on exit.
+# ---------------------------------------------------------------------------
+class Profiler:
+    """Startup timeline and optional sampling profiler (no-op unless enabled)."""
+
+    def __init__(self, mode="", out_path=None, interval_ms=5):
+        self.mode = mode
+        self.enabled = mode not in ("", "0")
+        self.sampling = mode == "sample"
+        self.out_path = out_path or os.path.join(user_dir("cache"), "media_tool_profile.json")
+        self.interval = max(1, interval_ms) / 1000
+        self.phases = []
+        self.marks = {}
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._dumped = False
+
+    @classmethod
+    def from_env(cls):
+        try:
+            interval = int(os.environ.get("MEDIA_TOOL_PROFILE_INTERVAL_MS", "5"))
+        except ValueError:
+            interval = 5
+        return cls(os.environ.get("MEDIA_TOOL_PROFILE", "").strip().lower(),
+                   os.environ.get("MEDIA_TOOL_PROFILE_OUT"),
+                   interval)
+
+    def record(self, name, start, end=None):
+        """Record a phase from perf_counter() start/end times."""
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            self.phases.append((name, (start - APP_START) * 1000, (end - APP_START) * 1000,
+                                threading.current_thread().name))
+
+    def phase(self, name):
+        """Context manager timing a named phase."""
+        return _ProfilePhase(self, name)
+
+    def mark(self, name, ms):
+        if self.enabled:
+            self.marks[name] = ms
+
+    # ---- sampling ----
+    def start_sampling(self):
+        if not self.sampling or self._sampler is not None:
+            return
+        target = threading.main_thread().ident
+        self._sampler = threading.Thread(target=self._sample_loop, args=(target,), name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join(timeout=1)
+            self._sampler = None
+
+    def _sample_loop(self, ident):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def run_mainloop(self, app):
+        self.start_sampling()
+        try:
+            app.mainloop()
+        finally:
+            self.stop_sampling()
+            self.dump()
+
+    # ---- output ----
+    def top_functions(self, limit=30):
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        for stack, n in self.stacks.items():
+            # aggregate per function, ignoring the line inside it
+            frames = [re.sub(r":\d+\)$", ")", f) for f in stack.split(";")]
+            self_counts[frames[-1]] += n
+            for f in set(frames):
+                total_counts[f] += n
+        return [{"function": f, "self": self_counts[f], "total": n} for f, n in total_counts.most_common(limit)]
+
+    def dump(self):
+        if not self.enabled or self._dumped:
+            return
+        self._dumped = True
+        phases = [{"phase": n, "start_ms": round(a, 1), "end_ms": round(b, 1), "ms": round(b - a, 1), "thread": t}
+                  for n, a, b, t in sorted(self.phases, key=lambda p: p[1])]
+        data = {"mode": self.mode, "phases": phases, "marks": {k: round(v, 1) for k, v in self.marks.items()}}
+        print("[PROFILE] startup timeline (ms since process start):")
+        for p in phases:
+            print(f"[PROFILE] {p['start_ms']:9.1f} {p['end_ms']:9.1f} {p['ms']:8.1f}  {p['phase']} [{p['thread']}]")
+        for k, v in data["marks"].items():
+            print(f"[PROFILE] {v:9.1f}  {k}")
+        if self.sampling:
+            data["sampling"] = {"interval_ms": self.interval * 1000, "samples": self.samples, "top": self.top_functions()}
+            try:
+                make_parent(self.out_path)
+                with open(os.path.splitext(self.out_path)[0] + ".collapsed.txt", "w", encoding="utf-8") as f:
+                    for stack, n in self.stacks.most_common():
+                        f.write(f"{stack} {n}\n")
+            except OSError as e:
+                print(f"[PROFILE] could not write stacks: {e}")
+        try:
+            make_parent(self.out_path)
+            with open(self.out_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            print(f"[PROFILE] written to {self.out_path}")
+        except OSError as e:
+            print(f"[PROFILE] could not write {self.out_path}: {e}")
+
+class _ProfilePhase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start)
+        return False
+
+PROFILER = Profiler.from_env()
+PROFILER.record("imports", APP_START, IMPORTS_DONE)
+atexit.register(PROFILER.dump)
+
 def which(cmd):
     return shutil.which(cmd)
 
+# ---------------------------------------------------------------------------
+# External tool discovery. All tools are located together: PATH, a few
+# well-known install locations, then ONE depth-limited walk of the working
+# directory. Results (including "not found" + the directory mtimes that
+# proved it) are cached in TOOL_CACHE_FILE and revalidated by mtime.
+# ---------------------------------------------------------------------------
+def tool_search_hints():
+    """Well-known install directories for the current platform."""
+    hints = [resource_path(""), resource_path("tools"), resource_path("bin")]
+    home = os.path.expanduser("~")
+    if os.name == "nt":
+        for var in ("ProgramFiles", "ProgramFiles(x86)", "LOCALAPPDATA"):
+            root = os.environ.get(var)
+            if root:
+                for sub in ("MKVToolNix", os.path.join("ffmpeg", "bin"), "ffmpeg", "dovi_tool", "mp4muxer"):
+                    hints.append(os.path.join(root, sub))
+        local = os.environ.get("LOCALAPPDATA")
+        if local:
+            hints.append(os.path.join(local, "Microsoft", "WinGet", "Links"))
+        hints += [os.path.join(home, "scoop", "shims"), r"C:\ProgramData\chocolatey\bin"]
+    else:
+        hints += ["/usr/local/bin", "/usr/bin", "/opt/bin", "/snap/bin",
+                  os.path.join(home, ".local", "bin"), os.path.join(home, "bin")]
+        if sys.platform == "darwin":
+            hints += ["/opt/homebrew/bin", "/Applications/MKVToolNix.app/Contents/MacOS"]
+    return hints
+
+def _exe_names(name):
+    return [name + ".exe"] if os.name == "nt" else [name, name + ".exe"]
+
+def _is_exe(path):
+    return os.path.isfile(path) and (os.name == "nt" or path.endswith(".exe") or os.access(path, os.X_OK))
+
+class ToolDiscovery:
+    """Shared, cached lookup of the external tools used by the tabs."""
+
+    def __init__(self, names=EXTERNAL_TOOLS, cache_file=TOOL_CACHE_FILE, max_depth=TOOL_SEARCH_DEPTH):
+        self.names = tuple(names)
+        self.cache_file = cache_file
+        self.max_depth = max_depth
+        self._lock = threading.Lock()         # _thread / _refresh_queued
+        self._search_lock = threading.Lock()  # one search at a time
+        self._result = None
+        self._thread = None
+        self._refresh_queued = False
+
+    def get(self, name):
+        return self.discover().get(name)
+
+    def start(self, refresh=False):
+        """Run discover() on a background thread. While one is running this is
+        a no-op, except that a refresh is queued to run after it."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._refresh_queued = self._refresh_queued or refresh
+                return
+            self._thread = threading.Thread(target=self._run, args=(refresh,), daemon=True)
+            self._thread.start()
+
+    def _run(self, refresh):
+        self.discover(refresh)
+        while True:
+            with self._lock:
+                # The thread counts as running until no refresh is left
+                if not self._refresh_queued:
+                    self._thread = None
+                    return
+                self._refresh_queued = False
+            self.discover(refresh=True)
+
+    def peek(self):
+        """Return the result without blocking, or None while discovery is still running."""
+        if self._result is None:
+            self.start()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return None
+        return dict(self._result) if self._result is not None else None
+
+    def discover(self, refresh=False):
+        """Return {tool name: path} for every tool found (missing tools are absent).
+        A failed search counts as finding nothing, so it is not retried
+        until a refresh."""
+        with self._search_lock:
+            if self._result is None or refresh:
+                try:
+                    self._result = self._discover(refresh)
+                except Exception as e:
+                    print(f"Tool discovery failed: {e}")
+                    self._result = {}
+            return dict(self._result)
+
+    def _discover(self, refresh):
+        with PROFILER.phase("tool discovery"):
+            return self._discover_tools(refresh)
+
+    def _discover_tools(self, refresh):
+        cache = {} if refresh else self._load_cache()
+        found = {}
+        for name, entry in cache.get("tools", {}).items():
+            if name in self.names and self._entry_valid(entry):
+                found[name] = entry["path"]
+        missing = [n for n in self.names if n not in found]
+        for name in list(missing):
+            path = which(name) or self._search_hints(name)
+            if path:
+                found[name] = path
+                missing.remove(name)
+        cwd = os.path.abspath(".")
+        scan = cache.get("scans", {}).get(cwd)
+        dirs = scan.get("dirs", {}) if scan else {}
+        walk_needed = missing and not (scan and set(missing) <= set(scan.get("missing", []))
+                                       and self._dirs_unchanged(dirs))
+        if walk_needed:
+            located, dirs = self._walk(missing)
+            found.update(located)
+        still_missing = [n for n in missing if n not in found]
+        self._save_cache(found, cwd, still_missing, dirs, cache)
+        return found
+
+    def _search_hints(self, name):
+        for d in tool_search_hints():
+            for exe in _exe_names(name):
+                p = os.path.join(d, exe)
+                if _is_exe(p):
+                    return os.path.abspath(p)
+        return None
+
+    def _walk(self, names):
+        """One depth-limited walk of the cwd looking for all ``names`` at once."""
+        wanted = {}
+        for name in names:
+            for exe in _exe_names(name):
+                wanted.setdefault(exe, name)
+        found = {}
+        dirs_seen = {}
+        base_depth = os.path.abspath(".").rstrip(os.sep).count(os.sep)
+        for root, dirs, files in os.walk("."):
+            root_abs = os.path.abspath(root)
+            try:
+                dirs_seen[root_abs] = os.stat(root_abs).st_mtime
+            except OSError:
+                pass
+            for fn in files:
+                name = wanted.get(fn)
+                if name and name not in found and _is_exe(os.path.join(root, fn)):
+                    found[name] = os.path.abspath(os.path.join(root, fn))
+            if len(found) == len(names):
+                break
+            if root_abs.rstrip(os.sep).count(os.sep) - base_depth >= self.max_depth:
+                dirs[:] = []
+            else:
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+        return found, dirs_seen
+
+    @staticmethod
+    def _entry_valid(entry):
+        try:
+            return os.stat(entry["path"]).st_mtime == entry["mtime"]
+        except (OSError, KeyError, TypeError):
+            return False
+
+    @staticmethod
+    def _dirs_unchanged(dirs):
+        try:
+            return all(os.stat(d).st_mtime == m for d, m in dirs.items())
+        except OSError:
+            return False
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def _save_cache(self, found, cwd, missing, dirs, old):
+        tools = {}
+        for name, path in found.items():
+            try:
+                tools[name] = {"path": path, "mtime": os.stat(path).st_mtime}
+            except OSError:
+                pass
+        scans = dict(old.get("scans", {}))
+        scans[cwd] = {"missing": missing, "dirs": dirs if missing else {}}
+        data = {"tools": tools, "scans": scans}
+        if data == old:
+            return
+        try:
+            make_parent(self.cache_file)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.cache_file)
+        except Exception as e:
+            print(f"Tool cache not saved: {e}")
+
+TOOL_DISCOVERY = ToolDiscovery()
+
 def find_exe(name):
-    """Find executable in PATH, current directory, or subdirectories."""
-    # First, try which (includes PATH)
-    path = which(name)
-    if path:
-        return path
-    # Then, check current directory with .exe
-    exe_name = name + ".exe"
-    if os.path.exists(exe_name):
-        return os.path.abspath(exe_name)
-    # Then, check in subdirectories of current
-    for root, dirs, files in os.walk('.'):
-        if exe_name in files:
-            return os.path.abspath(os.path.join(root, exe_name))
-    return None
+    """Find executable in PATH, install locations, current directory or subdirectories."""
+    return TOOL_DISCOVERY.get(name)
 
-class AsyncRunner:
-    def __init__(self, text_widget, run_button, cancel_button):
-        self.text = text_widget
-        self.run_button = run_button
-        self.cancel_button = cancel_button
-        self.proc = None
-        self.q = queue.Queue()
-        self.reader_thread = None
+# ---------------------------------------------------------------------------
+# Progress parsing. One parser per tool turns output lines into a Progress
+# sample (percent / fps / speed / ETA). prepare_progress_cmd() switches the
+# tools into their machine-readable progress modes where they have one.
+# ---------------------------------------------------------------------------
+def tool_name(exe):
+    """'C:\\tools\\ffmpeg.exe' -> 'ffmpeg'."""
+    name = os.path.basename(exe or "").lower()
+    return name[:-4] if name.endswith((".exe", ".bat", ".cmd")) else name
 
-    def log(self, msg):
-        self.text.configure(state="normal")
-        self.text.insert("end", msg + "\n")
-        self.text.see("end")
-        self.text.configure(state="disabled")
-
-    def _reader(self, stream):
-        for line in iter(stream.readline, b''):
-            self.q.put(line.decode(errors="replace"))
-        stream.close()
+def parse_timestamp(text):
+    """Parse ffmpeg style '[HH:]MM:SS[.ms]' or plain seconds; None if invalid."""
+    try:
+        secs = 0.0
+        for part in text.strip().split(":"):
+            secs = secs * 60 + float(part)
+        return secs
+    except ValueError:
+        return None
+
+def format_hms(seconds):
+    seconds = int(max(0, seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
 
-    def _drain_queue(self):
+class Progress:
+    """Latest progress sample of a running process. Any field may be None."""
+
+    def __init__(self):
+        self.percent = None
+        self.fps = None
+        self.speed = None
+        self.eta = None
+        self.updated = None
+
+    def stalled(self, timeout=PROGRESS_STALL_SECONDS):
+        return self.updated is not None and time.time() - self.updated > timeout
+
+    def summary(self):
+        parts = []
+        if self.percent is not None:
+            parts.append(f"{self.percent:.1f}%")
+        if self.fps is not None:
+            parts.append(f"{self.fps:.1f} fps")
+        if self.speed is not None:
+            parts.append(f"{self.speed:.2f}x")
+        if self.eta is not None:
+            parts.append(f"ETA {format_hms(self.eta)}")
+        if self.stalled():
+            parts.append("stalled")
+        return " | ".join(parts)
+
+class ProgressParser:
+    """Fallback parser: no progress. feed() returns True if the line was pure progress data."""
+
+    def __init__(self, cmd=None):
+        self.progress = Progress()
+        self.start = time.time()
+
+    def feed(self, line):
+        return False
+
+    def _update(self, percent=None, fps=None, speed=None, eta=None):
+        p = self.progress
+        now = time.time()
+        if percent is not None:
+            p.percent = max(0.0, min(100.0, percent))
+            elapsed = now - self.start
+            if eta is None and 0 < p.percent < 100:
+                eta = elapsed * (100 - p.percent) / p.percent
+            elif p.percent >= 100:
+                eta = 0
+        if fps is not None:
+            p.fps = fps
+        if speed is not None:
+            p.speed = speed
+        if eta is not None:
+            p.eta = eta
+        p.updated = now
+
+class PercentProgressParser(ProgressParser):
+    """dovi_tool / mp4muxer: pick up the last 'NN%' / 'NN.N%' on a line."""
+
+    PERCENT_RE = re.compile(r"(?<![\d.])(\d{1,3}(?:\.\d+)?)\s*%")
+
+    def feed(self, line):
+        found = self.PERCENT_RE.findall(line)
+        if found:
+            value = float(found[-1])
+            if value <= 100:
+                self._update(percent=value)
+        return False
+
+class MkvmergeProgressParser(ProgressParser):
+    """mkvmerge / mkvextract --gui-mode: '#GUI#progress 42%'."""
+
+    def feed(self, line):
+        if line.startswith("#GUI#progress"):
+            try:
+                self._update(percent=float(line.split()[1].rstrip("%")))
+            except (IndexError, ValueError):
+                pass
+            return True
+        return False
+
+class FFmpegProgressParser(ProgressParser):
+    """ffmpeg -progress key=value blocks, with the total taken from 'Duration:' or -t."""
+
+    KEYS = {"frame", "fps", "bitrate", "total_size", "out_time_us", "out_time_ms", "out_time",
+            "dup_frames", "drop_frames", "speed", "progress"}
+    DURATION_RE = re.compile(r"Duration:\s*(\d+:\d+:\d+(?:\.\d+)?)")
+
+    def __init__(self, cmd=None):
+        super().__init__(cmd)
+        self.duration = None
+        self.limit = None
+        cmd = list(cmd or [])
+        for flag, value in zip(cmd, cmd[1:]):
+            if flag == "-t":
+                self.limit = parse_timestamp(value)
+        self.out_time = None
+
+    def feed(self, line):
+        key, sep, value = line.strip().partition("=")
+        if sep and (key in self.KEYS or key.startswith("stream_")):
+            value = value.strip()
+            try:
+                if key == "fps":
+                    self._update(fps=float(value))
+                elif key == "speed" and value.endswith("x"):
+                    self._update(speed=float(value[:-1]))
+                elif key in ("out_time_us", "out_time_ms"):
+                    # both keys are in microseconds (ffmpeg quirk)
+                    self.out_time = int(value) / 1_000_000
+                elif key == "progress":
+                    self._refresh(done=(value == "end"))
+            except ValueError:
+                pass
+            return True
+        if self.duration is None:
+            m = self.DURATION_RE.search(line)
+            if m:
+                self.duration = parse_timestamp(m.group(1))
+        return False
+
+    def _refresh(self, done=False):
+        total = self.duration
+        if self.limit and (total is None or self.limit < total):
+            total = self.limit
+        if done:
+            self._update(percent=100.0)
+        elif total and self.out_time is not None:
+            eta = None
+            speed = self.progress.speed
+            if speed:
+                eta = max(0.0, total - self.out_time) / speed
+            self._update(percent=100.0 * self.out_time / total, eta=eta)
+        else:
+            self._update()
+
+PROGRESS_PARSERS = {
+    "ffmpeg": FFmpegProgressParser,
+    "mkvmerge": MkvmergeProgressParser,
+    "mkvextract": MkvmergeProgressParser,
+    "dovi_tool": PercentProgressParser,
+    "mp4muxer": PercentProgressParser,
+}
+
+def parser_for_cmd(cmd):
+    name = tool_name(cmd[0]) if cmd else ""
+    return PROGRESS_PARSERS.get(name, ProgressParser)(cmd)
+
+def prepare_progress_cmd(cmd):
+    """Return cmd with the tool's machine-readable progress output switched on.
+
+    ffmpeg reports to stderr (pipe:2) so stdout stays free for piped output.
+    """
+    cmd = list(cmd)
+    name = tool_name(cmd[0]) if cmd else ""
+    if name == "ffmpeg" and "-progress" not in cmd:
+        extra = ["-progress", "pipe:2"]
+        if "-stats" not in cmd:
+            extra.append("-nostats")
+        cmd = cmd[:1] + extra + cmd[1:]
+    elif name in ("mkvmerge", "mkvextract") and "--gui-mode" not in cmd:
+        cmd = cmd[:1] + ["--gui-mode"] + cmd[1:]
+    return cmd
+
+_EOL_RE = re.compile(rb"\r\n|\n|\r")
+
+def iter_output_records(stream, chunk_size=65536):
+    """Yield (text, transient) for each line of a binary stream.
+
+    Lines end at \\n or a bare \\r; transient=True marks \\r-terminated
+    progress updates that a terminal would overwrite in place.
+    """
+    read = getattr(stream, "read1", stream.read)
+    splitter = OutputSplitter()
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+class OutputSplitter:
+    """iter_output_records() for output that arrives in pieces: feed() each
+    chunk and get the records it completed; close() at EOF."""
+
+    def __init__(self):
+        self.buf = b""
+
+    def feed(self, chunk):
+        buf = self.buf + chunk
+        records = []
+        pos = 0
+        while True:
+            m = _EOL_RE.search(buf, pos)
+            if m is None:
+                break
+            if m.group() == b"\r" and m.end() == len(buf):
+                break  # may be the first half of a \r\n split across reads
+            text = buf[pos:m.start()].decode(errors="replace")
+            transient = m.group() == b"\r"
+            if text or not transient:
+                records.append((text, transient))
+            pos = m.end()
+        self.buf = buf[pos:]
+        return records
+
+    def close(self):
+        rest, self.buf = self.buf.rstrip(b"\r"), b""
+        return [(rest.decode(errors="replace"), False)] if rest else []
+
+# ---------------------------------------------------------------------------
+# Process I/O loop. The processes AsyncRunner starts live on one asyncio event
+# loop in a background thread: no reader thread or queue per run, and the Tk
+# thread is woken (TkWaker) when a run has new output instead of polling it.
+# A consumer that falls behind stops the pipe being read, so the tool blocks
+# on its writes rather than the backlog growing without bound.
+# ---------------------------------------------------------------------------
+class ProcessLoop:
+    """The background event loop, started on first use."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()  # Proactor on Windows (pipes + subprocesses)
+                if sys.version_info < (3, 12) and hasattr(os, "pidfd_open"):
+                    # The default watcher waits on each child in a thread of its own
+                    watcher = asyncio.PidfdChildWatcher()
+                    watcher.attach_loop(loop)
+                    asyncio.set_child_watcher(watcher)
+                threading.Thread(target=loop.run_forever, name="process-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """concurrent.futures.Future of ``coro`` run on the loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+PROCESS_LOOP = ProcessLoop()
+
+class StreamedProcess:
+    """A command running on PROCESS_LOOP. Its output records (minus the
+    progress lines ``parser`` consumes) collect until take() is called;
+    wake() is called from the loop thread when there is something new,
+    once per take(), and when the run is over (``finished``). With a
+    ``sink`` the records are handed to sink(records) on the loop thread
+    instead (called for every chunk read, even one of progress lines only).
+
+    Looks enough like a Popen (pid, poll(), send_signal(), terminate())
+    for terminate_tree()."""
+
+    def __init__(self, cmd, cwd=None, popen_kwargs=None, parser=None, wake=None, backlog=RUNNER_BACKLOG_LINES,
+                 sink=None):
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.popen_kwargs = popen_kwargs or {}
+        self.parser = parser or ProgressParser()
+        self.wake = wake or (lambda: None)
+        self.backlog = backlog
+        self.sink = sink
+        self.process = None
+        self.pid = None
+        self.returncode = None
+        self.finished = False
+        self._records = collections.deque()
+        self._lock = threading.Lock()
+        self._woken = False
+        self._room = None  # asyncio.Event, cleared while the backlog is full
+
+    def start(self):
+        """Start the process; waits only for the spawn and raises what Popen would."""
+        PROCESS_LOOP.submit(self.spawn()).result()
+        PROCESS_LOOP.submit(self.pump())
+
+    async def spawn(self):
+        self._room = asyncio.Event()
+        self._room.set()
+        self.process = await asyncio.create_subprocess_exec(
+            *self.cmd, cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **self.popen_kwargs)
+        self.pid = self.process.pid
+
+    async def pump(self):
+        """Read the output until EOF, then wait for the exit code."""
+        splitter = OutputSplitter()
         try:
             while True:
-                line = self.q.get_nowait()
-                self.log(line.rstrip("\n"))
-        except queue.Empty:
-            pass
-        if self.proc and self.proc.poll() is None:
-            self.text.after(100, self._drain_queue)
-        else:
-            # final drain
+                chunk = await self.process.stdout.read(65536)
+                if not chunk:
+                    break
+                await self._put(splitter.feed(chunk))
+            await self._put(splitter.close())
+        except Exception as e:
+            await self._put([(f"Output reader failed: {e}", False)])
+        self.returncode = await self.process.wait()
+        self.finished = True
+        self.wake()
+
+    async def _put(self, records):
+        records = [r for r in records if not self.parser.feed(r[0])]
+        if self.sink is not None:
+            self.sink(records)
+            return
+        with self._lock:
+            self._records.extend(records)
+            wake, self._woken = not self._woken, True
+            full = len(self._records) >= self.backlog
+            if full:
+                self._room.clear()
+        if wake:
+            self.wake()  # also for progress-only chunks, so the bar moves
+        if full:
+            await self._room.wait()
+
+    def take(self):
+        """The records that arrived since the last call (any thread)."""
+        with self._lock:
+            batch = list(self._records)
+            self._records.clear()
+            self._woken = False
+        if self._room is not None and not self._room.is_set():
+            PROCESS_LOOP.loop().call_soon_threadsafe(self._room.set)
+        return batch
+
+    def poll(self):
+        # Running until the pipe is closed too: children of the tool may still write
+        return self.returncode if self.finished else None
+
+    def send_signal(self, sig):
+        if self.process is None or self.finished:
+            raise ProcessLookupError(f"process {self.pid} has finished")
+        self.process.send_signal(sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+class TkWaker:
+    """Runs ``callback`` on the Tk thread after wake() is called on any thread,
+    at most every RUNNER_MIN_FLUSH_MS. On POSIX wake() writes to a pipe that
+    Tk watches (createfilehandler), so an idle Tk does not wake up at all;
+    elsewhere the flag wake() sets is polled with after()."""
+
+    def __init__(self, widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending = False
+        self._signalled = False  # a byte is in the pipe already
+        self._scheduled = None
+        self._last = 0.0
+        self._rfd = self._wfd = None
+        if hasattr(widget.tk, "createfilehandler"):
+            try:
+                self._rfd, self._wfd = os.pipe()
+                os.set_blocking(self._rfd, False)
+                os.set_blocking(self._wfd, False)
+                widget.tk.createfilehandler(self._rfd, tk.READABLE, self._readable)
+            except (OSError, RuntimeError, tk.TclError):
+                self._close_pipe()
+        if self._rfd is None:
+            self._poll()
+
+    def wake(self):
+        with self._lock:
+            if self.closed:
+                return
+            if self._wfd is None:
+                self._pending = True
+                return
+            if self._signalled:
+                return
+            self._signalled = True
             try:
-                while True:
-                    line = self.q.get_nowait()
-                    self.log(line.rstrip("\n"))
-            except queue.Empty:
+                os.write(self._wfd, b"!")
+            except BlockingIOError:
                 pass
-            code = None if self.proc is None else self.proc.returncode
-            self.log(f"[exit code] {code}")
-            self.run_button.configure(state="normal")
+
+    def _readable(self, fd, mask):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            self._signalled = False
+        self._call()
+
+    def _poll(self):
+        if self.closed:
+            return
+        if self._pending:
+            self._pending = False
+            self._call()
+        self.widget.after(RUNNER_MIN_FLUSH_MS * 2, self._poll)
+
+    def _call(self):
+        if self.closed or self._scheduled is not None:
+            return
+        wait = RUNNER_MIN_FLUSH_MS - (time.perf_counter() - self._last) * 1000
+        if wait > 0:
+            # Output pours in: flush it in batches instead of per chunk
+            self._scheduled = self.widget.after(int(wait) + 1, self._scheduled_call)
+            return
+        self._last = time.perf_counter()
+        self.callback()
+
+    def _scheduled_call(self):
+        self._scheduled = None
+        self._call()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if self._rfd is not None:
+                self.widget.tk.deletefilehandler(self._rfd)
+            self._close_pipe()
+        if self._scheduled is not None:
+            self.widget.after_cancel(self._scheduled)
+            self._scheduled = None
+
+    def _close_pipe(self):
+        for fd in (self._rfd, self._wfd):
+            if fd is not None:
+                os.close(fd)
+        self._rfd = self._wfd = None
+
+class AsyncRunner:
+    """One interactive command for the log pane. The process and its pipe
+    live on PROCESS_LOOP; Tk is only woken when output has arrived."""
+
+    def __init__(self, text_widget, run_button, cancel_button, progress_view=None):
+        self.text = text_widget
+        self.run_button = run_button
+        self.cancel_button = cancel_button
+        self.progress_view = progress_view
+        self.proc = None  # StreamedProcess
+        self.parser = ProgressParser()
+        self.jobs = None  # JobQueue whose ResourcePolicy (and load) applies here too
+        self.cancelled = False
+        self._new_outputs = []
+        self._cleaning = False  # partial outputs of a cancelled run still being removed
+
+    def log(self, msg):
+        self.text.append([(msg, False)])
+
+    def _flush(self, proc, waker):
+        # One insert per wakeup, however many lines arrived. Read finished
+        # first: the last records may arrive between take() and the check
+        done = proc.finished
+        batch = proc.take()
+        if batch:
+            self.text.append(batch)
+        if self.progress_view is not None:
+            self.progress_view.show_progress(self.parser.progress)
+        if done and not waker.closed:
+            waker.close()
+            self.log(f"[exit code] {proc.returncode}")
             self.cancel_button.configure(state="disabled")
+            if self.cancelled and self._new_outputs:
+                # Off the Tk thread (the share may be slow); Run comes back once done
+                lines = []
+                mode = self.jobs.partial_outputs if self.jobs else "delete"
+                self._cleaning = True
+                future = FS.submit(discard_partial_outputs, self._new_outputs, mode, lines.append)
+                when_done(self.text, future, lambda _: self._cleaned_up(lines),
+                          lambda e: self._cleaned_up(lines + [f"Partial outputs not cleaned up: {e}"]))
+                return
+            self.run_button.configure(state="normal")
+
+    def _cleaned_up(self, lines):
+        self._cleaning = False
+        if lines:
+            self.text.append([(line, False) for line in lines])
+        self.run_button.configure(state="normal")
 
     def run(self, cmd, cwd=None):
-        if self.proc is not None and self.proc.poll() is None:
+        if (self.proc is not None and self.proc.poll() is None) or self._cleaning:
             messagebox.showwarning("Busy", "A process is already running.")
             return
-        self.text.configure(state="normal")
-        self.text.delete("1.0", "end")
-        self.text.configure(state="disabled")
+        self.text.clear()
+
+        self.parser = parser_for_cmd(cmd)
+        self.cancelled = False
+        # Which outputs are new decides what a cancel cleans up. Checked off
+        # the Tk thread; a share that does not answer in time gets no cleanup
+        outputs = [os.path.abspath(os.path.join(cwd or "", p)) for p in command_outputs(cmd)]
+        try:
+            self._new_outputs = FS.submit(new_outputs, outputs).result(FS_UI_WAIT_SECONDS) if outputs else []
+        except concurrent.futures.TimeoutError:
+            self._new_outputs = []
+        policy, threads = None, None
+        if self.jobs is not None:
+            policy = self.jobs.policy
+            running = [j for j in self.jobs.jobs if j.status == "running"]
+            threads = policy.thread_budget(len(running) + 1, sum(j.threads or 0 for j in running))
+        cmd = prepare_progress_cmd(apply_thread_budget(cmd, threads))
+        if self.progress_view is not None:
+            self.progress_view.show_progress(None)
 
         # Debug: Print the full command
         print(f"AsyncRunner executing: {cmd}")
         self.log("> " + " ".join(cmd))
+        argv = policy.wrap(cmd) if policy is not None else cmd
+        proc = StreamedProcess(argv, cwd, group_popen_kwargs(policy.popen_kwargs() if policy else None), self.parser)
+        waker = TkWaker(self.text, lambda: self._flush(proc, waker))
+        proc.wake = waker.wake
         try:
-            self.proc = subprocess.Popen(
-                cmd,
-                cwd=cwd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                bufsize=1
-            )
+            proc.start()
         except Exception as e:
+            waker.close()
             self.log(f"Failed to start: {e}")
             return
+        if policy is not None:
+            policy.apply(proc.pid)
+        self.proc = proc
 
         self.run_button.configure(state="disabled")
         self.cancel_button.configure(state="normal")
-        self.reader_thread = threading.Thread(target=self._reader, args=(self.proc.stdout,), daemon=True)
-        self.reader_thread.start()
-        self._drain_queue()
 
     def cancel(self):
         if self.proc and self.proc.poll() is None:
+            self.cancelled = True
+            terminate_tree(self.proc)
+
+# ---------------------------------------------------------------------------
+# Process groups. Every tool runs in its own process group (a new session on
+# POSIX), so Cancel reaches wrapper scripts, pipeline stages and whatever the
+# tool started itself: SIGTERM to the group first, SIGKILL for anything still
+# alive after KILL_GRACE_SECONDS. Outputs a cancelled command had created are
+# then removed (or moved aside), see discard_partial_outputs().
+# ---------------------------------------------------------------------------
+PARTIAL_OUTPUT_MODES = ("delete", "quarantine", "keep")
+_KILL_TIMERS = {}  # pid -> threading.Timer of the pending SIGKILL
+_KILL_LOCK = threading.Lock()
+
+def group_popen_kwargs(extra=None):
+    """Popen arguments that start the process as the leader of a new process
+    group, merged with ``extra`` (e.g. ResourcePolicy.popen_kwargs())."""
+    kwargs = dict(extra or {})
+    if os.name == "nt":
+        kwargs["creationflags"] = kwargs.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return kwargs
+
+def terminate_tree(proc, grace=KILL_GRACE_SECONDS):
+    """Ask the process group of ``proc`` to stop, then kill what is left of it
+    after ``grace`` seconds. Returns at once; the kill runs on a timer."""
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:
+        try:
+            proc.terminate()
+        except OSError:
+            pass
+    with _KILL_LOCK:
+        if proc.pid not in _KILL_TIMERS:
+            timer = threading.Timer(grace, _kill_group, args=(proc,))
+            timer.daemon = True
+            _KILL_TIMERS[proc.pid] = timer
+            timer.start()
+
+def _kill_group(proc):
+    with _KILL_LOCK:
+        _KILL_TIMERS.pop(proc.pid, None)
+    if os.name == "nt":
+        if proc.poll() is None:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        # The leader may be gone while children it started hold on
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def _kill_pending_groups():
+    """At exit: do not leave groups behind whose grace period is still running."""
+    with _KILL_LOCK:
+        pending = list(_KILL_TIMERS.values())
+    for timer in pending:
+        timer.cancel()
+        _kill_group(*timer.args)
+
+atexit.register(_kill_pending_groups)
+
+def new_outputs(outputs):
+    """The subset of ``outputs`` that does not exist yet (a cancelled run may
+    remove those; files that were already there are never touched)."""
+    return [p for p in outputs if not os.path.exists(p)]
+
+def discard_partial_outputs(paths, mode, log):
+    """Remove (or rename to .partial) the files in ``paths`` a cancelled
+    command left behind."""
+    if mode == "keep":
+        return
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        try:
+            if mode == "quarantine":
+                os.replace(path, path + ".partial")
+                log(f"Partial output moved to {path}.partial")
+            else:
+                os.remove(path)
+                log(f"Removed partial output {path}")
+        except OSError as e:
+            log(f"Partial output {path} not removed: {e}")
+
+# ---------------------------------------------------------------------------
+# Resource governor. A ResourcePolicy lowers the priority of the processes we
+# start, pins them to a CPU set and hands ffmpeg / x265 a thread budget, so
+# concurrent jobs share the machine instead of each sizing itself to all cores.
+# ---------------------------------------------------------------------------
+def parse_cpu_list(text):
+    """Sorted CPU numbers from '0,1,4-6'; empty text -> None (all CPUs)."""
+    cpus = set()
+    for part in (text or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if not lo.isdigit() or (sep and not hi.isdigit()):
+            raise ValueError(f"Invalid CPU list: {text}")
+        cpus.update(range(int(lo), int(hi if sep else lo) + 1))
+    return sorted(cpus) or None
+
+def format_cpu_list(cpus):
+    """Inverse of parse_cpu_list: [0, 1, 4, 5, 6] -> '0-1,4-6'."""
+    runs = []
+    for cpu in cpus or ():
+        if runs and cpu == runs[-1][1] + 1:
+            runs[-1][1] = cpu
+        else:
+            runs.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in runs)
+
+def parse_thread_budget(text):
+    """'auto' (or empty) -> 0, 'off' -> None, else a thread count."""
+    text = str(text).strip().lower()
+    if text in ("", "auto", "0"):
+        return 0
+    if text == "off":
+        return None
+    if not text.isdigit():
+        raise ValueError(f"Invalid thread budget: {text} (use a number, auto or off)")
+    return int(text)
+
+def parse_max_load(text):
+    """'off' (or empty / 0) -> 0, 'auto' -> None (core count), else a load average."""
+    text = str(text).strip().lower()
+    if text in ("", "off", "0"):
+        return 0
+    if text == "auto":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"Invalid load limit: {text} (use a number, auto or off)") from None
+
+def usable_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def load_average():
+    """1-minute load average, or None where the OS has none (Windows)."""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+def apply_thread_budget(cmd, threads):
+    """Return cmd with an ffmpeg thread budget (-threads, -filter_threads and
+    x265 pools) unless the command already sets its own -threads. Commands
+    without an output (e.g. `ffmpeg -i in.mkv`) are left alone."""
+    if not threads or len(cmd) < 2 or tool_name(cmd[0]) != "ffmpeg" or "-threads" in cmd:
+        return list(cmd)
+    positions = ffmpeg_output_positions(cmd[1:])
+    if not positions:
+        return list(cmd)
+    last = positions[-1] + 1
+    head, body, output = cmd[:1], list(cmd[1:last]), cmd[last:]
+    if "-filter_threads" not in body:
+        head += ["-filter_threads", str(threads)]
+    if "libx265" in body:
+        if "-x265-params" in body:
+            i = body.index("-x265-params") + 1
+            if i < len(body) and "pools=" not in body[i]:
+                body[i] = f"{body[i]}:pools={threads}" if body[i] else f"pools={threads}"
+        else:
+            body += ["-x265-params", f"pools={threads}"]
+    return head + body + ["-threads", str(threads)] + output
+
+_LAUNCHERS = {}  # "nice" / "taskset" -> path, or None where not installed
+
+def launcher(name):
+    """Path of the POSIX ``nice`` / ``taskset`` launcher (looked up once)."""
+    if name not in _LAUNCHERS:
+        _LAUNCHERS[name] = None if os.name == "nt" else which(name)
+    return _LAUNCHERS[name]
+
+class ResourcePolicy:
+    """Limits for the processes of a job.
+
+    nice: 0 (normal) .. 19 (idle); on Windows >0 means below normal, >=10 idle.
+    cpus: CPU numbers to pin to, or None for all (not available on Windows).
+    threads: ffmpeg thread budget per job; 0 = automatic share of the free
+    cores, None = leave commands alone.
+    max_load: hold queued jobs while the load average is at or above this
+    (0 = off, None = the number of usable cores).
+    """
+
+    def __init__(self, nice=0, cpus=None, threads=0, max_load=0):
+        self.nice = max(0, min(19, int(nice)))
+        self.cpus = sorted(cpus) if cpus else None
+        self.threads = None if threads is None else max(0, int(threads))
+        self.max_load = max_load
+
+    @property
+    def cores(self):
+        return len(self.cpus) if self.cpus else len(usable_cpus())
+
+    def thread_budget(self, concurrent=1, own_threads=0):
+        """Threads for one of ``concurrent`` jobs: an equal share of the cores
+        not kept busy by other programs. Their share is estimated as the load
+        average minus ``own_threads`` (what our running jobs were given)."""
+        if self.threads is None:
+            return None
+        if self.threads:
+            return self.threads
+        free = self.cores
+        load = load_average()
+        if load is not None:
+            free = max(1.0, free - max(0.0, load - own_threads))
+        return max(1, int(free // max(1, concurrent)))
+
+    def load_ok(self, running):
+        """Whether another job may start next to ``running`` ones."""
+        if running == 0 or self.max_load == 0:
+            return True
+        load = load_average()
+        return load is None or load < (self.max_load or self.cores)
+
+    def popen_kwargs(self):
+        """Extra subprocess.Popen arguments that apply the priority (Windows;
+        elsewhere see apply())."""
+        if os.name == "nt":
+            if self.nice >= 10:
+                return {"creationflags": 0x00000040}  # IDLE_PRIORITY_CLASS
+            if self.nice:
+                return {"creationflags": 0x00004000}  # BELOW_NORMAL_PRIORITY_CLASS
+        return {}
+
+    def wrap(self, cmd):
+        """``cmd`` started through `taskset -c` / `nice -n` (POSIX, when they
+        are installed), so the limits hold from exec on, for every thread the
+        tool creates. A preexec_fn would be unsafe in a process with threads."""
+        prefix = []
+        if self.cpus and launcher("taskset"):
+            prefix += [launcher("taskset"), "-c", format_cpu_list(self.cpus)]
+        if self.nice and launcher("nice"):
+            prefix += [launcher("nice"), "-n", str(self.nice)]
+        return prefix + list(cmd)
+
+    def apply(self, pid):
+        """Fallback for the limits wrap() had no launcher for: lower the
+        priority of / pin the process ``pid`` just started. On Linux this
+        reaches only its main thread, not threads it started already."""
+        if os.name == "nt":
+            return
+        try:
+            if self.nice and not launcher("nice"):
+                os.setpriority(os.PRIO_PROCESS, pid, min(19, os.getpriority(os.PRIO_PROCESS, 0) + self.nice))
+            if self.cpus and not launcher("taskset") and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(pid, self.cpus)
+        except OSError:
+            pass  # already gone
+
+    def describe(self, threads=None):
+        parts = []
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.cpus:
+            parts.append(f"CPUs {format_cpu_list(self.cpus)}")
+        if threads:
+            parts.append(f"{threads} threads")
+        return ", ".join(parts)
+
+# ---------------------------------------------------------------------------
+# Incremental runs. A job that finished records a fingerprint of what it ran:
+# every argv, the version of each tool and a signature of each input (size,
+# mtime and a hash of a few sampled blocks). A later job with the same
+# fingerprint is skipped while its outputs are still the files it wrote.
+# ---------------------------------------------------------------------------
+# ffmpeg options without a value; every other option takes one
+FFMPEG_FLAGS = {"-y", "-n", "-vn", "-an", "-sn", "-dn", "-nostdin", "-stdin", "-nostats", "-stats", "-hide_banner",
+                "-shortest", "-benchmark", "-benchmark_all", "-copyts", "-start_at_zero", "-re", "-report",
+                "-ignore_unknown", "-copy_unknown", "-accurate_seek", "-noaccurate_seek", "-autorotate",
+                "-noautorotate", "-xerror", "-debug_ts", "-dump", "-hex", "-bitexact", "-psnr"}
+OUTPUT_OPTIONS = {"-o", "--output", "--bl-out", "--el-out", "--rpu-out"}  # dovi_tool, mp4muxer, mkvmerge
+MKVEXTRACT_TRACK_MODES = {"tracks", "attachments", "timestamps_v2", "timecodes_v2", "cues"}
+MKVEXTRACT_FILE_MODES = {"chapters", "tags", "cuesheet"}
+SIGNATURE_BLOCKS = 8
+SIGNATURE_BLOCK_SIZE = 64 * 1024
+
+def _is_stream(arg):
+    return arg in ("", "-") or arg.startswith(("pipe:", "/dev/")) or arg.upper() == "NUL"
+
+def ffmpeg_output_positions(args):
+    """Indexes of the output arguments (files or pipes) in ffmpeg's argv
+    without the program name."""
+    positions = []
+    i = 0
+    while i < len(args):
+        if args[i].startswith("-") and len(args[i]) > 1:
+            i += 1 if args[i] in FFMPEG_FLAGS else 2
+            continue
+        positions.append(i)
+        i += 1
+    return positions
+
+def command_outputs(cmd):
+    """Files a tool command writes, as far as its argv tells (may be empty)."""
+    name, args = tool_name(cmd[0]), cmd[1:]
+    outputs = []
+    if name == "ffmpeg":
+        outputs = [args[i] for i in ffmpeg_output_positions(args)]
+    elif name == "mkvextract":
+        mode = None
+        for arg in args:
+            if arg.startswith("-"):
+                continue
+            if arg in MKVEXTRACT_TRACK_MODES or arg in MKVEXTRACT_FILE_MODES:
+                mode = arg
+            elif mode in MKVEXTRACT_TRACK_MODES:
+                m = re.match(r"\d+:(.+)", arg)
+                if m:
+                    outputs.append(m.group(1))
+            elif mode in MKVEXTRACT_FILE_MODES:
+                outputs.append(arg)
+                mode = None
+    elif name == "mkvpropedit":
+        outputs = [a for a in args[:1] if not a.startswith("-")]  # edited in place
+    elif name not in ("ffprobe", "mkvinfo"):
+        outputs = [b for a, b in zip(args, args[1:]) if a in OUTPUT_OPTIONS]
+    return [o for o in outputs if not _is_stream(o)]
+
+def command_io(cmd, cwd=None):
+    """(inputs, outputs) of an argv as absolute paths. Inputs are the
+    arguments naming existing files that the command does not write."""
+    resolve = lambda p: os.path.abspath(os.path.join(cwd or "", p))
+    outputs = [resolve(p) for p in command_outputs(cmd)]
+    inputs = []
+    for arg in cmd[1:]:
+        if arg.startswith("-") or _is_stream(arg):
+            continue
+        path = resolve(arg)
+        if path not in outputs and path not in inputs and os.path.isfile(path):
+            inputs.append(path)
+    return inputs, outputs
+
+def input_signature(path):
+    """[size, mtime_ns, hash of SIGNATURE_BLOCKS sampled blocks]: cheap even
+    for 50 GB remuxes, and catches files rewritten with the same size."""
+    st = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if st.st_size <= SIGNATURE_BLOCKS * SIGNATURE_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            step = (st.st_size - SIGNATURE_BLOCK_SIZE) // (SIGNATURE_BLOCKS - 1)
+            for i in range(SIGNATURE_BLOCKS):
+                f.seek(i * step)
+                digest.update(f.read(SIGNATURE_BLOCK_SIZE))
+    return [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+
+_TOOL_VERSIONS = {}
+
+def tool_version(exe):
+    """First line of ``exe --version`` (ffmpeg / ffprobe: -version), cached
+    per binary; the binary's size and mtime if it prints nothing."""
+    path = shutil.which(exe) or exe
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _TOOL_VERSIONS:
+        flag = "-version" if tool_name(exe) in ("ffmpeg", "ffprobe") else "--version"
+        try:
+            out = subprocess.run([path, flag], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 stdin=subprocess.DEVNULL, timeout=10).stdout.decode("utf-8", "replace")
+        except (OSError, subprocess.SubprocessError):
+            out = ""
+        lines = [ln.strip() for ln in out.splitlines() if ln.strip()]
+        _TOOL_VERSIONS[key] = lines[0] if lines else f"{st.st_size}:{st.st_mtime_ns}"
+    return _TOOL_VERSIONS[key]
+
+class BuildCache:
+    """Fingerprints of finished jobs in a JSON file, keyed by their outputs."""
+
+    def __init__(self, cache_file=BUILD_CACHE_FILE, max_entries=BUILD_CACHE_SIZE):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self._entries = None  # OrderedDict key -> {"fingerprint", "outputs"}, oldest first
+        self._lock = threading.Lock()
+
+    def fingerprint(self, job):
+        """{"key", "fingerprint", "outputs"} for a job, or None if it writes
+        no file we can check (such jobs always run)."""
+        cmds, inputs, outputs = job.build_spec()
+        if not outputs:
+            return None
+        tools = {cmd[0]: tool_version(cmd[0]) for cmd in cmds if cmd}
+        signatures = {path: input_signature(path) for path in sorted(inputs)}
+        blob = json.dumps([cmds, tools, signatures], sort_keys=True)
+        return {"key": "|".join(sorted(outputs)), "outputs": sorted(outputs),
+                "fingerprint": hashlib.sha256(blob.encode("utf-8")).hexdigest()}
+
+    def up_to_date(self, fp):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(fp["key"])
+        if not entry or entry["fingerprint"] != fp["fingerprint"]:
+            return False
+        try:
+            return all(list(self._stat(p)) == entry["outputs"].get(p) for p in fp["outputs"])
+        except OSError:
+            return False
+
+    def record(self, fp):
+        """Remember a fingerprint after its job succeeded (outputs as written now)."""
+        try:
+            outputs = {p: list(self._stat(p)) for p in fp["outputs"]}
+        except OSError:
+            return  # an output was not written after all: nothing to skip next time
+        with self._lock:
+            self._load()
+            self._entries.pop(fp["key"], None)
+            self._entries[fp["key"]] = {"fingerprint": fp["fingerprint"], "outputs": outputs}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
             try:
-                self.proc.terminate()
-            except Exception:
+                make_parent(self.cache_file)
+                tmp = self.cache_file + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"entries": list(self._entries.items())}, f)
+                os.replace(tmp, self.cache_file)
+            except OSError as e:
+                print(f"Build cache not saved: {e}")
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = collections.OrderedDict()
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, entry in data.get("entries", [])[-self.max_entries:]:
+                self._entries[key] = entry
+        except Exception:
+            pass
+
+# ---------------------------------------------------------------------------
+# Job queue. Unlike AsyncRunner (one interactive process for the log pane),
+# the queue accepts any number of commands and runs up to N at once, each
+# with its own log, status and exit code. No Tk here; the GUI polls it.
+# ---------------------------------------------------------------------------
+class Job:
+    """A single queued command with its own log stream, status and exit code."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, cmd, cwd=None, label=None):
+        self.id = next(Job._ids)
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.label = label or (os.path.basename(self.cmd[0]) if self.cmd else "job")
+        self.status = "queued"  # queued -> running -> done / failed / cancelled
+        self.returncode = None
+        self.proc = None
+        self.lines = collections.deque(maxlen=DEFAULT_LOG_MAX_LINES)  # (text, transient)
+        self.line_count = 0
+        self._lines_lock = threading.Lock()
+        self.progress = Progress()
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.policy = None  # ResourcePolicy and thread budget, set by the JobQueue
+        self.threads = None
+        self._limits_logged = False
+        self.on_change = None  # called (any thread) on new log lines / progress; set by the JobQueue
+        self._procs = set()  # processes started by _spawn(), for cancel()
+        self._procs_lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def streams(self):
+        """True if the job is a single command run by run_async() on
+        PROCESS_LOOP; subclasses with their own execute() need a thread."""
+        return type(self).execute is Job.execute
+
+    def log(self, line, transient=False):
+        with self._lines_lock:
+            self.lines.append((line, transient))
+            self.line_count += 1
+        if self.on_change is not None:
+            self.on_change()
+
+    def _log_records(self, records):
+        # StreamedProcess sink: one lock round trip per chunk read
+        with self._lines_lock:
+            self.lines.extend(records)
+            self.line_count += len(records)
+        if self.on_change is not None:
+            self.on_change()
+
+    def tail(self, since):
+        """Return (records logged after the first ``since``, new line_count)."""
+        with self._lines_lock:
+            new = min(self.line_count - since, len(self.lines))
+            records = list(self.lines)[len(self.lines) - new:] if new > 0 else []
+            return records, self.line_count
+
+    def build_spec(self):
+        """(argv lists, inputs, outputs) of the job, for BuildCache. A job
+        without outputs always runs."""
+        inputs, outputs = command_io(self.cmd, self.cwd)
+        return [self.cmd], inputs, outputs
+
+    def clone(self):
+        """A new queued job with the same work (to run this one again)."""
+        return Job(self.cmd, cwd=self.cwd, label=self.label)
+
+    def skip(self, reason):
+        self.status = "skipped"
+        self.started = self.finished = time.time()
+        self.log(f"[skipped] {reason}")
+
+    def _popen_kwargs(self):
+        """Popen arguments for a new process group that apply self.policy
+        (logged once per job)."""
+        if self.policy is None:
+            return group_popen_kwargs()
+        if not self._limits_logged:
+            self._limits_logged = True
+            limits = self.policy.describe(self.threads)
+            if limits:
+                self.log(f"[limits] {limits}")
+        return group_popen_kwargs(self.policy.popen_kwargs())
+
+    def _argv(self, cmd):
+        """``cmd`` as started: behind the launchers of self.policy."""
+        return self.policy.wrap(cmd) if self.policy is not None else list(cmd)
+
+    def _limit(self, proc):
+        """Apply what _argv() could not of self.policy to a process just started."""
+        if self.policy is not None:
+            self.policy.apply(proc.pid)
+
+    def _spawn(self, cmd, parser, prefix="", on_line=None, threads=None):
+        """Run one helper process of a multi-step job to completion on the
+        calling thread, logging its output. Returns the exit code."""
+        argv = self._argv(prepare_progress_cmd(apply_thread_budget(cmd, threads)))
+        try:
+            proc = subprocess.Popen(argv, cwd=self.cwd,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **self._popen_kwargs())
+        except Exception as e:
+            self.log(f"{prefix}Failed to start: {e}")
+            return -1
+        self._limit(proc)
+        with self._procs_lock:
+            self._procs.add(proc)
+        if self.cancelled:
+            terminate_tree(proc)
+        for line, transient in iter_output_records(proc.stdout):
+            if on_line is not None and on_line(line):
+                continue
+            if not parser.feed(line):
+                self.log(prefix + line, transient)
+        proc.stdout.close()
+        rc = proc.wait()
+        with self._procs_lock:
+            self._procs.discard(proc)
+        return rc
+
+    def execute(self):
+        """Run the command to completion, blocking the calling thread (the
+        JobQueue runs plain jobs with run_async() instead)."""
+        PROCESS_LOOP.submit(self.run_async()).result()
+
+    async def run_async(self):
+        """Run the command on PROCESS_LOOP: its pipe is read by the loop,
+        so any number of jobs share one thread."""
+        if self.cancelled:
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        self.started = time.time()
+        parser = parser_for_cmd(self.cmd)
+        self.progress = parser.progress
+        cmd = prepare_progress_cmd(apply_thread_budget(self.cmd, self.threads))
+        self.log("> " + " ".join(cmd))
+        proc = StreamedProcess(self._argv(cmd), self.cwd, self._popen_kwargs(), parser, sink=self._log_records)
+        try:
+            await proc.spawn()
+        except Exception as e:
+            self.log(f"Failed to start: {e}")
+            self.status = "failed"
+            self.finished = time.time()
+            return
+        self.proc = proc
+        self._limit(proc)
+        if self.cancelled:
+            self.cancel()
+        await proc.pump()
+        self.returncode = proc.returncode
+        self.log(f"[exit code] {self.returncode}")
+        self.finished = time.time()
+        if self.cancelled:
+            self.status = "cancelled"
+        elif self.returncode == 0:
+            self.status = "done"
+        else:
+            self.status = "failed"
+
+    def cancel(self):
+        self.cancelled = True
+        with self._procs_lock:
+            procs = list(self._procs)
+        for p in [self.proc] + procs:
+            terminate_tree(p)
+
+class JobQueue:
+    """FIFO of Jobs, up to ``workers`` of them running at once. Plain command
+    jobs run on PROCESS_LOOP (no thread each); jobs with their own execute()
+    get a worker thread. ``on_change`` is called (any thread) when a job is
+    added, starts, logs or ends."""
+
+    def __init__(self, workers=DEFAULT_JOB_WORKERS):
+        self.workers = max(1, int(workers))
+        self.jobs = []
+        self._pending = collections.deque()
+        self._running = set()
+        self._lock = threading.Lock()
+        self.agents = []
+        self.path_maps = []
+        self.agent_token = None
+        self.policy = ResourcePolicy()
+        self._recheck = None
+        self.builds = None
+        self.force = False
+        self.partial_outputs = "delete"  # what happens to files a cancelled job created
+        self.on_change = None
+
+    def use_build_cache(self, cache, force=False):
+        """Skip jobs whose BuildCache fingerprint shows their outputs are up to
+        date; ``force`` runs them anyway (and records them again)."""
+        self.builds = cache
+        self.force = force
+
+    def set_policy(self, policy):
+        """Limits for jobs started from now on."""
+        self.policy = policy
+        self._dispatch()
+
+    def use_agents(self, agents, path_maps=(), token=None):
+        """Send command jobs to worker agents; an empty list runs them here."""
+        self.agents = list(agents)
+        self.path_maps = list(path_maps)
+        self.agent_token = token
+
+    def submit(self, cmd, cwd=None, label=None):
+        if self.agents:
+            return self.add(RemoteJob(cmd, self.agents, self.path_maps, self.agent_token, cwd=cwd, label=label))
+        return self.add(Job(cmd, cwd=cwd, label=label))
+
+    def add(self, job):
+        job.on_change = self._changed
+        with self._lock:
+            self.jobs.append(job)
+            self._pending.append(job)
+        self._dispatch()
+        self._changed()
+        return job
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def set_workers(self, n):
+        self.workers = max(1, int(n))
+        self._dispatch()
+
+    def cancel(self, job):
+        with self._lock:
+            if job in self._pending:
+                self._pending.remove(job)
+                job.cancelled = True
+                job.status = "cancelled"
+                job.log("[cancelled before start]")
+                return
+        job.cancel()
+        self._changed()
+
+    def clear_finished(self, jobs=None):
+        """Forget finished jobs (only those in ``jobs`` if given)."""
+        with self._lock:
+            self.jobs = [j for j in self.jobs if j.active or (jobs is not None and j not in jobs)]
+
+    def _dispatch(self):
+        with self._lock:
+            while self._pending and len(self._running) < self.workers:
+                if not self.policy.load_ok(len(self._running)):
+                    # Over the load cap: look again later (or when a job ends)
+                    if self._recheck is None:
+                        self._recheck = threading.Timer(LOAD_RECHECK_SECONDS, self._load_recheck)
+                        self._recheck.daemon = True
+                        self._recheck.start()
+                    break
+                job = self._pending.popleft()
+                concurrent = min(self.workers, len(self._running) + 1 + len(self._pending))
+                job.policy = self.policy
+                job.threads = self.policy.thread_budget(concurrent, sum(j.threads or 0 for j in self._running))
+                self._running.add(job)
+                if job.streams:
+                    PROCESS_LOOP.submit(self._work_async(job))
+                else:
+                    threading.Thread(target=self._work, args=(job,), daemon=True).start()
+
+    def _fingerprint(self, job):
+        if self.builds is None or job.cancelled:
+            return None
+        try:
+            return self.builds.fingerprint(job)
+        except OSError as e:
+            job.log(f"[incremental] cannot fingerprint inputs, running: {e}")
+            return None
+
+    def _load_recheck(self):
+        with self._lock:
+            self._recheck = None
+        self._dispatch()
+
+    def _prepare(self, job):
+        """(fingerprint, outputs the job would create), or None if the job
+        was skipped as up to date. Hashes inputs: not for the loop thread."""
+        fp = self._fingerprint(job)
+        if fp and not self.force and self.builds.up_to_date(fp):
+            job.skip("outputs are up to date: " + ", ".join(fp["outputs"]))
+            return None
+        return fp, new_outputs(job.build_spec()[2]) if self.partial_outputs != "keep" else []
+
+    def _complete(self, job, fp, created):
+        if fp and job.status == "done":
+            self.builds.record(fp)
+        if job.status == "cancelled":
+            discard_partial_outputs(created, self.partial_outputs, job.log)
+
+    def _release(self, job):
+        with self._lock:
+            self._running.discard(job)
+        self._dispatch()
+        self._changed()
+
+    def _work(self, job):
+        try:
+            prepared = self._prepare(job)
+            if prepared is not None:
+                job.execute()
+                self._complete(job, *prepared)
+        except Exception as e:
+            job.log(f"Job error: {e}")
+            job.status = "failed"
+        finally:
+            self._release(job)
+
+    async def _work_async(self, job):
+        loop = asyncio.get_running_loop()
+        try:
+            prepared = await loop.run_in_executor(None, self._prepare, job)
+            if prepared is not None:
+                await job.run_async()
+                await loop.run_in_executor(None, self._complete, job, *prepared)
+        except Exception as e:
+            job.log(f"Job error: {e}")
+            job.status = "failed"
+        finally:
+            self._release(job)
+
+class PipelineJob(Job):
+    """Job made of steps run one after another, each step being a chain of
+    processes joined by OS pipes (stdout of one feeds stdin of the next).
+
+    Only the last process's stdout goes to the log; every process's stderr is
+    logged too. ``temp_files`` (intermediates a later step had to read from
+    disk) are removed when the job ends.
+    """
+
+    def __init__(self, steps, cwd=None, label=None, temp_files=()):
+        super().__init__(steps[0][0], cwd=cwd, label=label)
+        self.steps = [[list(c) for c in step] for step in steps]
+        self.temp_files = list(temp_files)
+        self.procs = []
+
+    def describe(self):
+        return [" | ".join(format_cmd(c) for c in step) for step in self.steps]
+
+    def clone(self):
+        return PipelineJob(self.steps, cwd=self.cwd, label=self.label, temp_files=self.temp_files)
+
+    def build_spec(self):
+        cmds = [c for step in self.steps for c in step]
+        temps = {os.path.abspath(os.path.join(self.cwd or "", t)) for t in self.temp_files}
+        inputs, outputs = [], []
+        for cmd in cmds:
+            ins, outs = command_io(cmd, self.cwd)
+            inputs += [p for p in ins if p not in inputs]
+            outputs += [p for p in outs if p not in outputs and p not in temps]
+        return cmds, [p for p in inputs if p not in outputs and p not in temps], outputs
+
+    def execute(self):
+        if self.cancelled:
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        self.started = time.time()
+        rc = 0
+        try:
+            for index, step in enumerate(self.steps, 1):
+                if self.cancelled:
+                    break
+                self.log(f"[step {index}/{len(self.steps)}]")
+                rc = self._run_step(step)
+                if rc != 0:
+                    break
+        finally:
+            for path in self.temp_files:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                        self.log(f"Removed intermediate {path}")
+                except OSError as e:
+                    self.log(f"Could not remove intermediate {path}: {e}")
+        self.returncode = rc
+        self.log(f"[exit code] {rc}")
+        self.finished = time.time()
+        if self.cancelled:
+            self.status = "cancelled"
+        elif rc == 0:
+            self.status = "done"
+        else:
+            self.status = "failed"
+
+    def _read(self, stream, parser, prefix):
+        for line, transient in iter_output_records(stream):
+            if not parser.feed(line):
+                self.log(prefix + line, transient)
+        stream.close()
+
+    def _run_step(self, stages):
+        parsers = [parser_for_cmd(c) for c in stages]
+        # The step's progress is that of the first process that reports any
+        # (normally the ffmpeg reading the source).
+        self.progress = next((p.progress for p in parsers if type(p) is not ProgressParser), parsers[0].progress)
+        cmds = [prepare_progress_cmd(apply_thread_budget(c, self.threads)) for c in stages]
+        self.log("> " + " | ".join(format_cmd(c) for c in cmds))
+        procs = []
+        readers = []
+        upstream = subprocess.DEVNULL
+        try:
+            for n, cmd in enumerate(cmds):
+                last = n == len(cmds) - 1
+                p = subprocess.Popen(
+                    self._argv(cmd),
+                    cwd=self.cwd,
+                    stdin=upstream,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT if last else subprocess.PIPE,
+                    **self._popen_kwargs(),
+                )
+                self._limit(p)
+                if n:
+                    upstream.close()  # the child owns the read end now
+                upstream = p.stdout
+                procs.append(p)
+                if not last:
+                    t = threading.Thread(target=self._read, args=(p.stderr, parsers[n], f"[{tool_name(cmd[0])}] "), daemon=True)
+                    t.start()
+                    readers.append(t)
+        except Exception as e:
+            self.log(f"Failed to start: {e}")
+            for p in procs:
+                terminate_tree(p, grace=0)
+            return 1
+        self.procs = procs
+        self.proc = procs[-1]
+        if self.cancelled:
+            self.cancel()
+        self._read(procs[-1].stdout, parsers[-1], f"[{tool_name(cmds[-1][0])}] " if len(cmds) > 1 else "")
+        for t in readers:
+            t.join()
+        codes = [p.wait() for p in procs]
+        for cmd, code in zip(cmds, codes):
+            if code != 0:
+                self.log(f"{tool_name(cmd[0])} exited with {code}")
+        return next((c for c in codes if c != 0), 0)
+
+    def cancel(self):
+        self.cancelled = True
+        for p in self.procs:
+            terminate_tree(p)
+
+def plan_chunks(cuts, duration, chunk_seconds):
+    """(start, length) of each chunk, splitting only at ``cuts`` (seconds) and
+    making chunks at least ``chunk_seconds`` long (the last one may be shorter)."""
+    starts = [0.0]
+    for t in sorted(cuts):
+        if t - starts[-1] >= chunk_seconds and duration - t >= chunk_seconds / 2:
+            starts.append(t)
+    ends = starts[1:] + [duration]
+    return [(s, e - s) for s, e in zip(starts, ends)]
+
+class ChunkedEncodeJob(Job):
+    """Encode the video of one input as independent chunks on several ffmpeg
+    processes at once, then join them with the concat demuxer (stream copy)
+    and add the input's audio/subtitles.
+
+    Chunks start at keyframes (or detected scene changes) of the source and
+    are cut with accurate input seeking, so each chunk starts on an IDR frame
+    and the concatenated timestamps line up with the source.
+
+    The chunk plan and each finished chunk are checkpointed in a manifest in
+    the work folder, so a cancelled or interrupted encode queued again with
+    the same input and settings only encodes the chunks that are missing.
+    """
+
+    def __init__(self, opts, ffprobe=None, workers=DEFAULT_CHUNK_WORKERS, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                 split="keyframes", scene_threshold=0.3, label=None):
+        self.opts = dict(opts)
+        super().__init__([opts["path"]], label=label or f"ffmpeg chunked x{workers}")
+        self.ffprobe = ffprobe
+        self.workers = max(1, int(workers))
+        self.chunk_seconds = max(1.0, float(chunk_seconds))
+        self.split = split
+        self.scene_threshold = float(scene_threshold)
+        self.workdir = opts["output"] + ".chunks"
+
+    # ---------------- Commands -----------------
+    def keyframe_cmd(self):
+        return [self.ffprobe, "-v", "error", "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", self.opts["input"]]
+
+    def scene_cmd(self):
+        vf = f"scale=480:-2,select='gt(scene,{self.scene_threshold})',showinfo"
+        return [self.opts["path"], "-hide_banner", "-nostdin", "-i", self.opts["input"],
+                "-map", "0:v:0", "-an", "-sn", "-dn", "-vf", vf, "-f", "null", "-"]
+
+    def chunk_path(self, index):
+        return os.path.join(self.workdir, f"chunk_{index:05d}.mkv")
+
+    def manifest_path(self):
+        return os.path.join(self.workdir, "manifest.json")
+
+    def chunk_cmd(self, index, start, length):
+        o = self.opts
+        cmd = [o["path"], "-hide_banner", "-nostdin", "-loglevel", "error", "-y"]
+        if start:
+            cmd += ["-ss", f"{start:.6f}"]
+        cmd += ["-t", f"{length:.6f}", "-i", o["input"], "-map", "0:v:0", "-an", "-sn", "-dn", "-c:v", o["video_codec"]]
+        if o.get("quality"):
+            cmd += ["-crf", o["quality"]]
+        if o.get("preset"):
+            cmd += ["-preset", o["preset"]]
+        if o.get("resolution"):
+            cmd += ["-s", o["resolution"]]
+        return cmd + [self.chunk_path(index)]
+
+    def concat_cmd(self, list_file):
+        o = self.opts
+        cmd = [o["path"], "-hide_banner", "-nostdin", "-y", "-f", "concat", "-safe", "0", "-i", list_file,
+               "-i", o["input"], "-map", "0:v:0", "-map", "1:a?"]
+        if o["output"].lower().endswith((".mkv", ".mka")):
+            cmd += ["-map", "1:s?"]
+        cmd += ["-c", "copy"]
+        if o.get("audio_codec") and o["audio_codec"] != "copy":
+            cmd += ["-c:a", o["audio_codec"]]
+            if o.get("audio_bitrate"):
+                cmd += ["-b:a", o["audio_bitrate"]]
+        return cmd + [o["output"]]
+
+    def clone(self):
+        return ChunkedEncodeJob(self.opts, self.ffprobe, self.workers, self.chunk_seconds, self.split,
+                                self.scene_threshold, self.label)
+
+    def build_spec(self):
+        settings = [self.opts["path"], json.dumps(self.opts, sort_keys=True), self.split,
+                    str(self.chunk_seconds), str(self.scene_threshold)]
+        return [settings], [os.path.abspath(self.opts["input"])], [os.path.abspath(self.opts["output"])]
+
+    # ---------------- Running -----------------
+    def _find_cuts(self, start_time=0.0):
+        """(exit code, candidate cut points in seconds from the start of the
+        input). Keyframe pts are absolute, so ``start_time`` (the input's) is
+        taken off them to match -ss, which seeks relative to it."""
+        cuts = []
+        if self.split == "scenes":
+            self.log(f"Detecting scene changes (threshold {self.scene_threshold})...")
+            pts_re = re.compile(r"pts_time:\s*([0-9.]+)")
+
+            def on_line(line):
+                m = pts_re.search(line)
+                if m and "Parsed_showinfo" in line:
+                    cuts.append(float(m.group(1)))
+                    return True
+                return False
+            parser = parser_for_cmd(self.scene_cmd())
+            self.progress = parser.progress
+            rc = self._spawn(self.scene_cmd(), parser, on_line=on_line)
+        else:
+            self.log("Listing keyframes...")
+            packet_re = re.compile(r"^([0-9.]+|N/A),([A-Z_]+)$")
+
+            def on_line(line):
+                m = packet_re.match(line.strip())
+                if m and "K" in m.group(2) and m.group(1) != "N/A" and float(m.group(1)) > start_time:
+                    cuts.append(float(m.group(1)) - start_time)
+                return m is not None
+            rc = self._spawn(self.keyframe_cmd(), ProgressParser(), on_line=on_line)
+        return rc, cuts
+
+    # ---------------- Checkpoints -----------------
+    def _checkpoint_key(self):
+        """What the chunks depend on: the input file, the encode arguments and
+        the split settings. A manifest with another key is not resumed."""
+        return {"input": os.path.abspath(self.opts["input"]), "signature": input_signature(self.opts["input"]),
+                "encode": self.chunk_cmd(0, 0.0, 1.0)[1:-1], "split": self.split,
+                "chunk_seconds": self.chunk_seconds, "scene_threshold": self.scene_threshold}
+
+    def _load_manifest(self, key):
+        """(chunks, {index: [size, mtime_ns]} of the finished ones) of an
+        earlier run with the same key, or None."""
+        try:
+            with open(self.manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("key") != json.loads(json.dumps(key)):
+            self.log(f"Settings or input changed since the chunks in {self.workdir} were encoded; starting over")
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            return None
+        done = {}
+        for index, sig in manifest.get("done", {}).items():
+            try:
+                st = os.stat(self.chunk_path(int(index)))
+            except OSError:
+                continue
+            if [st.st_size, st.st_mtime_ns] == sig:
+                done[int(index)] = sig
+        return [tuple(c) for c in manifest["chunks"]], done
+
+    def _save_manifest(self, key, chunks, done):
+        tmp = self.manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "chunks": chunks, "done": {str(i): stat for i, stat in done.items()}}, f)
+        os.replace(tmp, self.manifest_path())
+
+    def _encode_chunks(self, chunks, finished, key):
+        """Encode the chunks not in ``finished`` (index -> [size, mtime_ns]),
+        checkpointing each one as it finishes."""
+        total = sum(length for _, length in chunks) or 1.0
+        pending = collections.deque(i for i in range(len(chunks)) if i not in finished)
+        running = {}  # index -> (thread, parser)
+        results = {i: 0 for i in finished}  # written by the encode threads: use codes()
+        lock = threading.Lock()
+        resumed = sum(chunks[i][1] for i in finished)
+        progress = Progress()
+        self.progress = progress
+        started = time.time()
+
+        def encode(i, parser):
+            rc = self._spawn(self.chunk_cmd(i, *chunks[i]), parser, prefix=f"[chunk {i}] ",
+                             threads=self.threads and max(1, self.threads // self.workers))
+            with lock:
+                results[i] = rc
+
+        def codes():
+            with lock:
+                return dict(results)
+
+        while (pending or running) and not self.cancelled:
+            while pending and len(running) < self.workers and not any(rc != 0 for rc in codes().values()):
+                i = pending.popleft()
+                parser = parser_for_cmd(self.chunk_cmd(i, *chunks[i]))
+                thread = threading.Thread(target=encode, args=(i, parser), daemon=True)
+                running[i] = (thread, parser)
+                thread.start()
+            for i, (thread, _) in list(running.items()):
+                if not thread.is_alive():
+                    del running[i]
+                    rc = codes().get(i)
+                    if rc == 0:
+                        st = os.stat(self.chunk_path(i))
+                        finished[i] = [st.st_size, st.st_mtime_ns]
+                        self._save_manifest(key, chunks, finished)
+                    self.log(f"[chunk {i}] {'done' if rc == 0 else 'failed (exit %s)' % rc}"
+                             f" ({sum(1 for c in codes().values() if c == 0)}/{len(chunks)})")
+            current = codes()
+            if any(rc != 0 for rc in current.values()) and not running:
+                break
+            # Overall progress: finished chunks plus the running chunks' share
+            done = sum(chunks[i][1] for i, rc in current.items() if rc == 0)
+            done += sum(chunks[i][1] * (p.progress.percent or 0) / 100 for i, (_, p) in running.items())
+            progress.percent = min(100.0, 100.0 * done / total)
+            speeds = [p.progress.speed for _, p in running.values() if p.progress.speed]
+            fps = [p.progress.fps for _, p in running.values() if p.progress.fps]
+            progress.speed = sum(speeds) if speeds else None
+            progress.fps = sum(fps) if fps else None
+            elapsed = time.time() - started
+            progress.eta = elapsed * (total - done) / (done - resumed) if done > resumed else None
+            progress.updated = time.time()
+            time.sleep(0.5)
+        for thread, _ in running.values():
+            thread.join()
+        current = codes()
+        return len(current) == len(chunks) and all(rc == 0 for rc in current.values())
+
+    def execute(self):
+        if self.cancelled:
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        self.started = time.time()
+        ok = False
+        try:
+            ok = self._run()
+        except Exception as e:
+            self.log(f"Chunked encode error: {e}")
+        self.returncode = 0 if ok else 1
+        if ok:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        elif os.path.isdir(self.workdir):
+            self.log(f"Chunks kept in {self.workdir}; queue the same encode again to resume")
+        self.log(f"[exit code] {self.returncode}")
+        self.finished = time.time()
+        if self.cancelled:
+            self.status = "cancelled"
+        else:
+            self.status = "done" if ok else "failed"
+
+    def _run(self):
+        key = self._checkpoint_key()
+        resume = self._load_manifest(key)
+        if resume:
+            chunks, done = resume
+            self.log(f"Resuming from {self.manifest_path()}: {len(done)}/{len(chunks)} chunk(s) already encoded")
+        else:
+            chunks = self._plan()
+            if not chunks:
+                return False
+            done = {}
+            os.makedirs(self.workdir, exist_ok=True)
+            self._save_manifest(key, chunks, done)
+        if not self._encode_chunks(chunks, done, key) or self.cancelled:
+            return False
+        list_file = os.path.join(self.workdir, "concat.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for i in range(len(chunks)):
+                path = os.path.abspath(self.chunk_path(i)).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+        self.log("Joining chunks...")
+        parser = parser_for_cmd(self.concat_cmd(list_file))
+        self.progress = parser.progress
+        rc = self._spawn(self.concat_cmd(list_file), parser, prefix="[concat] ")
+        return rc == 0
+
+    def _plan(self):
+        """[(start, length)] of the chunks, or None after logging why not."""
+        o = self.opts
+        try:
+            probe = probe_file(o["input"], self.ffprobe)
+        except (OSError, ValueError) as e:
+            self.log(f"Cannot probe {o['input']}: {e}")
+            return None
+        duration = probe.get("duration")
+        if not duration:
+            self.log(f"Cannot chunk: duration of {o['input']} unknown")
+            return None
+        rc, cuts = self._find_cuts(probe.get("start_time") or 0.0)
+        if rc != 0 or self.cancelled:
+            self.log(f"Split point detection failed (exit {rc})")
+            return None
+        chunks = plan_chunks(cuts, duration, self.chunk_seconds)
+        self.log(f"{len(chunks)} chunk(s) of ~{self.chunk_seconds:g}s from {len(cuts)} candidate split point(s) "
+                 f"({self.split}), {self.workers} encoding at a time")
+        return chunks
+
+# ---------------------------------------------------------------------------
+# Worker agents. `media_tool.py agent` runs tool commands for other machines:
+# one JSON object per line over TCP, a connection carries either a status
+# query or one job (log and progress lines stream back, then the exit code).
+# Agents only run the known EXTERNAL_TOOLS, resolved on the agent itself.
+# ---------------------------------------------------------------------------
+def parse_address(text, default_port=DEFAULT_AGENT_PORT):
+    host, sep, port = text.strip().rpartition(":")
+    if not sep:
+        return port, default_port
+    return host or "127.0.0.1", int(port)
+
+def is_loopback(host):
+    """True if every address ``host`` resolves to is a loopback address."""
+    try:
+        infos = socket.getaddrinfo(host or None, None, proto=socket.IPPROTO_TCP, flags=socket.AI_PASSIVE)
+    except OSError:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split("%")[0]).is_loopback for info in infos)
+
+def parse_path_maps(items):
+    """[(prefix, replacement)] from 'FROM=TO' strings (';' separates several)."""
+    maps = []
+    for item in items or ():
+        for part in item.split(";"):
+            src, sep, dst = part.partition("=")
+            if sep and src.strip():
+                maps.append((src.strip(), dst.strip()))
+    return maps
+
+def map_path_arg(arg, maps):
+    """Rewrite an argument that starts with a mapped path prefix (e.g. a Windows
+    share seen as a mount point on a Linux node)."""
+    for src, dst in maps:
+        if arg.startswith(src):
+            rest = arg[len(src):]
+            if "/" in dst and "\\" not in dst:
+                rest = rest.replace("\\", "/")
+            elif "\\" in dst:
+                rest = rest.replace("/", "\\")
+            return dst + rest
+    return arg
+
+def agents_from_env():
+    """(addresses, path maps, token) from MEDIA_TOOL_AGENTS ("host:port,..."),
+    MEDIA_TOOL_PATH_MAP ("FROM=TO;...") and MEDIA_TOOL_AGENT_TOKEN."""
+    agents = [parse_address(a) for a in os.environ.get("MEDIA_TOOL_AGENTS", "").split(",") if a.strip()]
+    maps = parse_path_maps([os.environ.get("MEDIA_TOOL_PATH_MAP", "")])
+    return agents, maps, os.environ.get("MEDIA_TOOL_AGENT_TOKEN") or None
+
+def _agent_send(wfile, msg):
+    wfile.write((json.dumps(msg) + "\n").encode("utf-8"))
+    wfile.flush()
+
+def agent_status(address, token=None, timeout=1.0):
+    """Ask an agent for its load; None if it cannot be reached."""
+    try:
+        with socket.create_connection(address, timeout=timeout) as sock:
+            f = sock.makefile("rwb")
+            _agent_send(f, {"type": "status", "token": token})
+            msg = json.loads(f.readline() or b"{}")
+            return msg if msg.get("type") == "status" else None
+    except (OSError, ValueError):
+        return None
+
+def agent_statuses(addresses, token=None):
+    """{address: status or None}, querying all agents in parallel."""
+    results = {}
+    threads = [threading.Thread(target=lambda a=a: results.__setitem__(a, agent_status(a, token)), daemon=True)
+               for a in addresses]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+# Jobs this process has sent to each agent and not seen finish yet. Jobs that
+# start together all see the same idle agents, so this counts as load too.
+_AGENT_ASSIGNED = collections.Counter()
+_AGENT_LOCK = threading.Lock()
+
+def least_loaded_agent(addresses, token=None):
+    """Reserve and return the reachable agent with the fewest jobs per slot, or
+    None. Release it with release_agent() when the job ends."""
+    results = agent_statuses(addresses, token)
+    best, best_key = None, None
+    with _AGENT_LOCK:
+        for address in addresses:
+            st = results.get(address)
+            if not st:
+                continue
+            busy = max(st.get("running", 0) + st.get("queued", 0), _AGENT_ASSIGNED[address])
+            key = (busy / max(1, st.get("slots", 1)), (st.get("load") or 0) / max(1, st.get("cpus") or 1))
+            if best_key is None or key < best_key:
+                best, best_key = address, key
+        if best is not None:
+            _AGENT_ASSIGNED[best] += 1
+    return best
+
+def release_agent(address):
+    with _AGENT_LOCK:
+        _AGENT_ASSIGNED[address] -= 1
+        if _AGENT_ASSIGNED[address] <= 0:
+            del _AGENT_ASSIGNED[address]
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, slots=DEFAULT_JOB_WORKERS, token=None, path_maps=(), policy=None):
+        super().__init__(address, AgentHandler)
+        self.jobs = JobQueue(slots)
+        if policy is not None:
+            self.jobs.set_policy(policy)
+        self.token = token
+        self.path_maps = list(path_maps)
+
+    def status(self):
+        jobs = list(self.jobs.jobs)
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load = None
+        return {"type": "status", "version": APP_VERSION, "slots": self.jobs.workers, "cpus": os.cpu_count(),
+                "load": load, "running": sum(j.status == "running" for j in jobs),
+                "queued": sum(j.status == "queued" for j in jobs)}
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            msg = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            return
+        try:
+            if self.server.token and not hmac.compare_digest(str(msg.get("token") or "").encode(),
+                                                             self.server.token.encode()):
+                _agent_send(self.wfile, {"type": "error", "message": "bad token"})
+            elif msg.get("type") == "status":
+                _agent_send(self.wfile, self.server.status())
+            elif msg.get("type") == "run":
+                self.run_job(msg.get("job") or {})
+            else:
+                _agent_send(self.wfile, {"type": "error", "message": f"unknown request {msg.get('type')!r}"})
+        except OSError:
+            pass  # client went away
+
+    def run_job(self, spec):
+        tool, argv = spec.get("tool"), spec.get("argv") or []
+        if tool not in EXTERNAL_TOOLS:
+            _agent_send(self.wfile, {"type": "error", "message": f"tool {tool!r} is not allowed"})
+            return
+        exe = find_exe(tool)
+        if not exe:
+            _agent_send(self.wfile, {"type": "error", "message": f"{tool} not found on agent"})
+            return
+        maps = parse_path_maps(spec.get("path_map", [])) + self.server.path_maps
+        cmd = [exe] + [map_path_arg(str(a), maps) for a in argv[1:]]
+        cwd = map_path_arg(spec["cwd"], maps) if spec.get("cwd") else None
+        job = self.server.jobs.submit(cmd, cwd=cwd, label=spec.get("label") or tool)
+        print(f"Agent: job {job.id} from {self.client_address[0]}: {format_cmd(cmd)}")
+
+        def watch_cancel():
+            # A cancel message or a dropped connection cancels the job
+            try:
+                for line in self.rfile:
+                    if json.loads(line).get("type") == "cancel":
+                        break
+            except (OSError, ValueError):
                 pass
+            if job.active:
+                self.server.jobs.cancel(job)
+        threading.Thread(target=watch_cancel, daemon=True).start()
+
+        seen, shown = 0, None
+        try:
+            while True:
+                active = job.active
+                records, seen = job.tail(seen)
+                for text, transient in records:
+                    _agent_send(self.wfile, {"type": "log", "text": text, "transient": transient})
+                p = job.progress
+                sample = (p.percent, p.fps, p.speed, p.eta)
+                if sample != shown:
+                    shown = sample
+                    _agent_send(self.wfile, {"type": "progress", "percent": p.percent, "fps": p.fps,
+                                             "speed": p.speed, "eta": p.eta})
+                if not active:
+                    break
+                time.sleep(0.2)
+            _agent_send(self.wfile, {"type": "exit", "code": job.returncode, "status": job.status})
+        except OSError:
+            self.server.jobs.cancel(job)
+            while job.active:
+                time.sleep(0.2)
+        # The client has the log now: do not keep it (and the job) for the agent's lifetime
+        self.server.jobs.clear_finished([job])
+
+class RemoteJob(Job):
+    """A Job run by the least-loaded worker agent (picked when it starts).
+    Runs locally when no agent answers."""
+
+    def __init__(self, cmd, agents, path_maps=(), token=None, cwd=None, label=None):
+        super().__init__(cmd, cwd=cwd, label=label)
+        self.agents = list(agents)
+        self.path_maps = list(path_maps)
+        self.token = token
+        self.agent = None
+        self._wfile = None
+
+    def clone(self):
+        return RemoteJob(self.cmd, self.agents, self.path_maps, self.token, cwd=self.cwd, label=self.label)
+
+    def execute(self):
+        if self.cancelled:
+            self.status = "cancelled"
+            return
+        address = least_loaded_agent(self.agents, self.token)
+        if address is None:
+            self.log("No worker agent reachable; running locally")
+            return super().execute()
+        self.agent = address
+        self.label = f"{self.label} @{address[0]}:{address[1]}"
+        self.status = "running"
+        self.started = time.time()
+        spec = {"tool": tool_name(self.cmd[0]), "argv": self.cmd, "cwd": self.cwd, "label": self.label,
+                "path_map": [f"{s}={d}" for s, d in self.path_maps]}
+        self.log(f"[agent {address[0]}:{address[1]}]")
+        rc = None
+        try:
+            with socket.create_connection(address, timeout=10) as sock:
+                sock.settimeout(None)
+                f = sock.makefile("rwb")
+                self._wfile = f
+                _agent_send(f, {"type": "run", "token": self.token, "job": spec})
+                if self.cancelled:
+                    self.cancel()
+                for line in f:
+                    msg = json.loads(line)
+                    kind = msg.get("type")
+                    if kind == "log":
+                        self.log(msg.get("text", ""), msg.get("transient", False))
+                    elif kind == "progress":
+                        p = self.progress
+                        p.percent, p.fps, p.speed, p.eta = msg.get("percent"), msg.get("fps"), msg.get("speed"), msg.get("eta")
+                        p.updated = time.time()
+                    elif kind == "error":
+                        self.log(f"Agent error: {msg.get('message')}")
+                        break
+                    elif kind == "exit":
+                        rc = msg.get("code")
+                        break
+        except (OSError, ValueError) as e:
+            self.log(f"Agent connection failed: {e}")
+        finally:
+            release_agent(address)
+        self._wfile = None
+        self.returncode = rc
+        self.finished = time.time()
+        if self.cancelled:
+            self.status = "cancelled"
+        elif rc == 0:
+            self.status = "done"
+        else:
+            self.status = "failed"
+
+    def cancel(self):
+        self.cancelled = True
+        f = self._wfile
+        if f is not None:
+            try:
+                _agent_send(f, {"type": "cancel"})
+            except (OSError, ValueError):
+                pass
+        elif self.proc is not None:
+            super().cancel()
+
+# ---------------------------------------------------------------------------
+# Encoder benchmark (no Tk). Encodes one short reference clip with every
+# codec x preset x CRF combination, one case at a time so they do not
+# compete, and records speed, CPU time, bitrate and optionally SSIM / PSNR.
+# ---------------------------------------------------------------------------
+def bench_cases(codecs, presets=("",), crfs=("",)):
+    """The benchmark matrix as a list of {codec, preset, crf} dicts."""
+    return [{"codec": c, "preset": p, "crf": q}
+            for c in codecs for p in (presets or ("",)) for q in (crfs or ("",))]
+
+def parse_bench_list(text):
+    """'slow, medium fast' -> ['slow', 'medium', 'fast']."""
+    return [part for part in re.split(r"[,\s]+", text or "") if part]
+
+class BenchmarkJob(Job):
+    """Benchmark matrix run as one queue job; ``results`` grows as cases finish.
+
+    The source (a slice of a real input, or BENCH_LAVFI_SOURCE) is first
+    written losslessly (FFV1) so every case decodes the same frames and the
+    quality metrics have a reference.
+    """
+
+    _BENCH_RE = re.compile(r"\b([usr]time)=([0-9.]+)s")
+    _SSIM_RE = re.compile(r"SSIM .*All:([0-9.]+)")
+    _PSNR_RE = re.compile(r"PSNR .*average:([0-9.]+|inf)")
+
+    def __init__(self, ffmpeg, cases, source=None, start=0.0, seconds=DEFAULT_BENCH_SECONDS, quality=False, label=None):
+        super().__init__([ffmpeg], label=label or f"benchmark x{len(cases)}")
+        if not cases:
+            raise ValueError("Benchmark needs at least one codec")
+        self.cases = [dict(c) for c in cases]
+        self.source = source or None
+        self.start = float(start or 0)
+        self.seconds = max(1.0, float(seconds))
+        self.quality = quality
+        self.results = []
+        self.workdir = None
+
+    def clone(self):
+        return BenchmarkJob(self.cmd[0], self.cases, self.source, self.start, self.seconds, self.quality, self.label)
+
+    # ---------------- Commands -----------------
+    def reference_cmd(self, path):
+        cmd = [self.cmd[0], "-hide_banner", "-nostdin", "-y"]
+        if self.source:
+            if self.start:
+                cmd += ["-ss", f"{self.start:.3f}"]
+            cmd += ["-t", f"{self.seconds:.3f}", "-i", self.source]
+        else:
+            cmd += ["-f", "lavfi", "-t", f"{self.seconds:.3f}", "-i", BENCH_LAVFI_SOURCE]
+        return cmd + ["-map", "0:v:0", "-an", "-sn", "-dn", "-c:v", "ffv1", "-level", "3", path]
+
+    def encode_cmd(self, case, ref, out):
+        # No thread budget here: the point is what the encoder does on this machine
+        cmd = [self.cmd[0], "-hide_banner", "-nostdin", "-y", "-benchmark", "-i", ref, "-map", "0:v:0",
+               "-c:v", case["codec"]]
+        if case.get("preset"):
+            cmd += ["-preset", case["preset"]]
+        if case.get("crf"):
+            cmd += ["-crf", str(case["crf"])]
+        return cmd + [out]
+
+    def quality_cmd(self, out, ref):
+        return [self.cmd[0], "-hide_banner", "-nostdin", "-i", out, "-i", ref, "-lavfi",
+                "[0:v]split[a][b];[1:v]split[c][d];[a][c]ssim;[b][d]psnr", "-f", "null", "-"]
+
+    # ---------------- Running -----------------
+    def _run_case(self, index, case, ref):
+        name = " ".join(str(v) for v in (case["codec"], case.get("preset"), case.get("crf") and f"crf {case['crf']}") if v)
+        self.log(f"[{index + 1}/{len(self.cases)}] {name}")
+        result = dict(case, status="failed", frames=None, seconds=None, fps=None, cpu_seconds=None,
+                      bitrate_kbps=None, size_bytes=None, ssim=None, psnr=None)
+        out = os.path.join(self.workdir, f"case_{index:03d}.mkv")
+        cmd = self.encode_cmd(case, ref, out)
+        parser = parser_for_cmd(cmd)
+        times = {}
+        n = len(self.cases)
+
+        def on_line(line):
+            # Overall progress: finished cases plus the running one
+            p = parser.progress
+            self.progress.percent = 100.0 * (index + (p.percent or 0) / 100) / n
+            self.progress.fps, self.progress.speed, self.progress.updated = p.fps, p.speed, p.updated
+            if line.startswith("frame=") and line[6:].strip().isdigit():
+                result["frames"] = int(line[6:])
+            elif line.startswith("bench:"):
+                times.update((k, float(v)) for k, v in self._BENCH_RE.findall(line))
+                return True
+            return False
+
+        wall = time.perf_counter()
+        rc = self._spawn(cmd, parser, on_line=on_line)
+        wall = time.perf_counter() - wall
+        if rc != 0:
+            result["status"] = "cancelled" if self.cancelled else "failed"
+            return result
+        seconds = times.get("rtime") or wall
+        size = os.path.getsize(out)
+        duration = parser.out_time or self.seconds
+        result.update(status="ok", seconds=round(seconds, 3), size_bytes=size,
+                      bitrate_kbps=round(size * 8 / duration / 1000, 1))
+        if result["frames"]:
+            result["fps"] = round(result["frames"] / seconds, 2)
+        if "utime" in times:
+            result["cpu_seconds"] = round(times["utime"] + times.get("stime", 0.0), 3)
+        if self.quality and not self.cancelled:
+            def on_metric(line):
+                m = self._SSIM_RE.search(line)
+                if m:
+                    result["ssim"] = float(m.group(1))
+                m = self._PSNR_RE.search(line)
+                if m:
+                    result["psnr"] = float(m.group(1))
+                return False
+            if self._spawn(self.quality_cmd(out, ref), ProgressParser(), on_line=on_metric) != 0:
+                self.log("Quality measurement failed")
+        os.remove(out)
+        return result
+
+    def execute(self):
+        if self.cancelled:
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        self.started = time.time()
+        self.threads = None  # measured as the encoder sizes itself, see encode_cmd()
+        self.workdir = tempfile.mkdtemp(prefix="media_tool_bench_")
+        try:
+            rc = self._run()
+        except Exception as e:
+            self.log(f"Benchmark error: {e}")
+            rc = -1
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        self.returncode = rc
+        self.finished = time.time()
+        if self.cancelled:
+            self.status = "cancelled"
+        elif rc == 0:
+            self.status = "done"
+        else:
+            self.status = "failed"
+
+    def _run(self):
+        ref = os.path.join(self.workdir, "reference.mkv")
+        self.log(f"Writing a {self.seconds:g}s reference clip from {self.source or BENCH_LAVFI_SOURCE}")
+        cmd = self.reference_cmd(ref)
+        rc = self._spawn(cmd, parser_for_cmd(cmd))
+        if rc != 0:
+            self.log("Could not write the reference clip")
+            return rc
+        for index, case in enumerate(self.cases):
+            if self.cancelled:
+                return -1
+            self.results.append(self._run_case(index, case, ref))
+        for line in format_bench_table(self.results):
+            self.log(line)
+        return 0 if all(r["status"] == "ok" for r in self.results) else 1
+
+BENCH_COLUMNS = ("codec", "preset", "crf", "status", "frames", "seconds", "fps", "cpu_seconds",
+                 "bitrate_kbps", "size_bytes", "ssim", "psnr")
+
+def format_bench_table(results):
+    """Fixed-width text table of benchmark results."""
+    cols = ("codec", "preset", "crf", "fps", "cpu_seconds", "bitrate_kbps", "ssim", "psnr", "status")
+    rows = [[("" if r.get(c) is None else str(r.get(c))) for c in cols] for r in results]
+    widths = [max([len(c)] + [len(row[i]) for row in rows]) for i, c in enumerate(cols)]
+    return ["  ".join(c.ljust(w) for c, w in zip(cols, widths))] + \
+           ["  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows]
+
+def write_bench_results(results, path):
+    """Export results as JSON (.json) or CSV (anything else)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            json.dump(results, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=BENCH_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+    os.replace(tmp, path)
+
+# ---------------------------------------------------------------------------
+# Watch folders (no Tk). New files in a drop folder are handed on once their
+# size and mtime have stopped changing. inotify (Linux, via ctypes) reports
+# which names changed; elsewhere a folder is listed again only when its own
+# mtime moves, so idle folders with thousands of files cost one stat a tick.
+# ---------------------------------------------------------------------------
+WATCH_IGNORE_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".!qb", "~")
+
+class _Inotify:
+    """Just enough inotify for FolderWatcher. Raises OSError if unavailable."""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    GONE = IN_MOVED_FROM | IN_DELETE
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            init = libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError(f"inotify not available: {e}") from None
+        self._libc = libc
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}  # watch descriptor -> folder
+
+    def add(self, folder):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+        if wd < 0:
+            raise OSError(self._ctypes.get_errno(), f"cannot watch {folder}")
+        self.folders[wd] = folder
+
+    def read(self, timeout):
+        """[(folder, name, mask)] of the events that arrive within ``timeout`` s."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events, pos = [], 0
+        while pos + 16 <= len(data):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", data, pos)
+            name = data[pos + 16:pos + 16 + length].rstrip(b"\0")
+            pos += 16 + length
+            events.append((self.folders.get(wd), os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher:
+    """Calls on_ready(entry, path) from a background thread once per new (or
+    replaced) file, after its size and mtime held still for entry["settle"]
+    seconds.
+
+    Entries are dicts with "folder", optional "pattern" ("*.mkv;*.mp4") and
+    "settle", plus whatever on_ready needs (preset, tab, output template).
+    Files already present at start are skipped unless ``process_existing``.
+    """
+
+    def __init__(self, entries, on_ready, process_existing=False, use_inotify=True):
+        self.entries = {os.path.abspath(e["folder"]): dict(e) for e in entries}
+        self.on_ready = on_ready
+        self.process_existing = process_existing
+        self.use_inotify = use_inotify
+        self.backend = None
+        self.messages = collections.deque(maxlen=1000)  # drained by the UI / CLI
+        self._inotify = None
+        self._listing = {}  # folder -> (mtime_ns or None, names)
+        self._pending = {}  # path -> [entry, size, mtime_ns, unchanged since]
+        self._done = {}     # path -> (size, mtime_ns) handed to on_ready
+        self._ignored = set()  # outputs expected in watched folders, until they settle
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def log(self, text):
+        self.messages.append(text)
+
+    def ignore(self, path):
+        """Do not report ``path`` (e.g. an output written into a watched folder)
+        when it next settles. Paths outside the watched folders are not kept."""
+        path = os.path.abspath(path)
+        if os.path.dirname(path) in self.entries:
+            with self._lock:
+                self._ignored.add(path)
+
+    def start(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                for folder in self.entries:
+                    self._inotify.add(folder)
+            except OSError as e:
+                self.log(f"inotify unavailable ({e}); polling instead")
+                if self._inotify is not None:
+                    self._inotify.close()
+                self._inotify = None
+        self.backend = "inotify" if self._inotify else "polling"
+        for folder, entry in self.entries.items():
+            self._scan(folder, entry, initial=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.log(f"Watching {len(self.entries)} folder(s) ({self.backend})")
+
+    def stop(self):
+        """Stop watching; the watcher thread closes the inotify fd itself on
+        its way out, so it is never closed under a read in progress."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(WATCH_POLL_SECONDS + 1)
+            self._thread = None
+
+    def matches(self, entry, name):
+        lower = name.lower()
+        if lower.startswith(".") or lower.endswith(WATCH_IGNORE_SUFFIXES):
+            return False
+        patterns = [p for p in re.split(r"[;,\s]+", entry.get("pattern") or "*") if p]
+        return any(fnmatch.fnmatch(lower, p.lower()) for p in patterns)
+
+    def _scan(self, folder, entry, initial=False):
+        """List a folder and track new or replaced files. Only called at start,
+        after an inotify overflow, or (polling) when the folder's mtime moved."""
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            files = {}
+            with os.scandir(folder) as it:
+                for e in it:
+                    if e.is_file() and self.matches(entry, e.name):
+                        st = e.stat()
+                        files[e.name] = (st.st_size, st.st_mtime_ns)
+        except OSError as e:
+            self.log(f"Cannot list {folder}: {e}")
+            return
+        # A folder changed within the mtime granularity may change again
+        # unnoticed in the same tick: list it again next time.
+        recent = time.time_ns() - mtime < 2_000_000_000
+        old_names = self._listing.get(folder, (None, set()))[1]
+        self._listing[folder] = (None if recent else mtime, set(files))
+        for name in old_names - set(files):
+            self._forget(os.path.join(folder, name))
+        for name, sig in files.items():
+            path = os.path.join(folder, name)
+            if initial and not self.process_existing:
+                self._done[path] = sig
+            elif self._done.get(path) != sig:
+                self._track(entry, path)
+
+    def _track(self, entry, path):
+        if path not in self._pending:
+            self._pending[path] = [entry, None, None, None]
+
+    def _forget(self, path):
+        self._pending.pop(path, None)
+        self._done.pop(path, None)
+
+    def _run(self):
+        inotify = self._inotify
+        try:
+            self._loop(inotify)
+        finally:
+            if inotify is not None:
+                inotify.close()
+                if self._inotify is inotify:
+                    self._inotify = None
+
+    def _loop(self, inotify):
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            if inotify is not None:
+                for folder, name, mask in inotify.read(WATCH_POLL_SECONDS):
+                    if mask & _Inotify.IN_Q_OVERFLOW:
+                        for f, e in self.entries.items():
+                            self._scan(f, e)
+                        continue
+                    entry = self.entries.get(folder)
+                    if entry is None or not name or mask & _Inotify.IN_ISDIR or not self.matches(entry, name):
+                        continue
+                    path = os.path.join(folder, name)
+                    if mask & _Inotify.GONE:
+                        self._forget(path)
+                    else:
+                        self._track(entry, path)
+            else:
+                self._stop.wait(WATCH_POLL_SECONDS)
+                for folder, entry in self.entries.items():
+                    cached = self._listing.get(folder, (None,))[0]
+                    try:
+                        changed = cached is None or os.stat(folder).st_mtime_ns != cached
+                    except OSError:
+                        changed = False
+                    if changed:
+                        self._scan(folder, entry)
+            if time.monotonic() - last_check >= WATCH_POLL_SECONDS:
+                last_check = time.monotonic()
+                self._check_pending()
+
+    def _check_pending(self):
+        """stat() only the files still settling; hand on the ones that held still."""
+        now = time.monotonic()
+        for path, item in list(self._pending.items()):
+            entry, size, mtime, since = item
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._forget(path)
+                continue
+            stat = (st.st_size, st.st_mtime_ns)
+            if stat != (size, mtime):
+                item[1:] = [stat[0], stat[1], now]
+                continue
+            if now - since < float(entry.get("settle") or WATCH_SETTLE_SECONDS) or not st.st_size:
+                continue
+            del self._pending[path]
+            if self._done.get(path) == stat:
+                continue
+            self._done[path] = stat
+            with self._lock:
+                ignored = os.path.abspath(path) in self._ignored
+                self._ignored.discard(os.path.abspath(path))
+            if ignored:
+                continue
+            try:
+                self.on_ready(entry, path)
+            except Exception as e:
+                self.log(f"{os.path.basename(path)}: {e}")
+
+# ---------------------------------------------------------------------------
+# Command builders (no Tk). Each takes the same dict a tab stores in a preset
+# (see the tabs' get_state()) and returns the argv list. The tabs, the job
+# queue and the headless CLI all build commands through these.
+# ---------------------------------------------------------------------------
+DOVI_SUBCOMMANDS = ["convert", "demux", "editor", "export", "extract-rpu", "inject-rpu", "generate", "info", "mux", "plot", "remove"]
+
+def build_dovi_cmd(opts):
+    exe = opts.get("path", "")
+    if not exe:
+        raise ValueError("dovi_tool path is required")
+    sub = opts.get("subcmd", "extract-rpu").strip()
+    cmd = [exe, sub]
+
+    # I/O by subcommand
+    inf = opts.get("in", "")
+    outf = opts.get("out", "")
+    if sub in DOVI_SUBCOMMANDS:
+        if inf:
+            cmd += [inf]
+    # outputs
+    if outf:
+        cmd += ["-o", outf]
+
+    # RPU in/out
+    if sub == "inject-rpu":
+        rpu_in = opts.get("rpu_in", "")
+        if rpu_in:
+            cmd += ["--rpu-in", rpu_in]
+    if sub == "extract-rpu":
+        rpu_out = opts.get("rpu_out", "")
+        if rpu_out:
+            cmd += ["-o", rpu_out]
+
+    # global options - build them in the correct order
+    global_opts = []
+    if opts.get("mode"):
+        global_opts.extend(["-m", opts["mode"]])
+    if opts.get("crop"):
+        global_opts.append("-c")
+    if opts.get("drop_hdr10p"):
+        global_opts.append("--drop-hdr10plus")
+    editc = opts.get("edit_cfg", "")
+    if editc:
+        global_opts.extend(["--edit-config", editc])
+    if opts.get("start_code"):
+        global_opts.extend(["--start-code", opts["start_code"]])
+
+    # Rebuild command with global options before subcommand
+    if global_opts:
+        cmd = [exe] + global_opts + [sub] + cmd[2:]
+
+    # extra args
+    extra = opts.get("extra", "").strip()
+    if extra:
+        cmd += extra.split()
+
+    return cmd
+
+def build_mp4muxer_cmd(opts):
+    exe = opts.get("path", "")
+    if not exe:
+        raise ValueError("mp4muxer path is required")
+    cmd = [exe]
+
+    for it in opts.get("inputs", []):
+        f = it.get("file", "")
+        if f:
+            cmd += ["-i", f]
+            if it.get("lang", "").strip():
+                cmd += ["--media-lang", it["lang"].strip()]
+            if it.get("tscale", "").strip():
+                cmd += ["--media-timescale", it["tscale"].strip()]
+            if it.get("fr", "").strip():
+                cmd += ["--input-video-frame-rate", it["fr"].strip()]
+
+    out = opts.get("out", "")
+    if out:
+        cmd += ["-o", out]
+
+    if opts.get("dv_profile"):
+        cmd += ["--dv-profile", opts["dv_profile"]]
+    if opts.get("dv_bl_compat", "").strip():
+        cmd += ["--dv-bl-compatible-id", opts["dv_bl_compat"].strip()]
+    if opts.get("brands", "").strip():
+        cmd += ["--mpeg4-comp-brand", opts["brands"].strip()]
+    if opts.get("hvc1flag"):
+        cmd += ["--hvc1flag", "0"]
+    if opts.get("dvh1flag"):
+        cmd += ["--dvh1flag", "0"]
+    if opts.get("overwrite", True):
+        cmd += ["--overwrite"]
+
+    extra = opts.get("extra", "").strip()
+    if extra:
+        cmd += extra.split()
+
+    return cmd
+
+def build_ffmpeg_cmd(opts):
+    exe = opts.get("path", "")
+    if not exe:
+        raise ValueError("ffmpeg path is required")
+
+    # Check for custom command
+    custom = opts.get("custom_cmd", "").strip()
+    if custom:
+        return [exe] + custom.split()
+
+    # Build command based on operation
+    operation = opts.get("operation", "convert")
+    cmd = [exe]
+
+    # Input file
+    input_file = opts.get("input", "")
+    if not input_file:
+        raise ValueError("Input file is required")
+    cmd += ["-i", input_file]
+
+    # Second input for merge
+    if operation == "merge":
+        input2 = opts.get("input2", "")
+        if input2:
+            cmd += ["-i", input2]
+
+    # Video settings
+    if operation in ["convert", "extract_video", "merge"]:
+        vcodec = opts.get("video_codec", "")
+        if vcodec:
+            cmd += ["-c:v", vcodec]
+
+        quality = opts.get("quality", "")
+        if quality:
+            cmd += ["-crf", quality]
+
+        resolution = opts.get("resolution", "")
+        if resolution:
+            cmd += ["-s", resolution]
+
+        preset = opts.get("preset", "")
+        if preset:
+            cmd += ["-preset", preset]
+
+    # Audio settings
+    if operation in ["convert", "extract_audio", "merge"]:
+        acodec = opts.get("audio_codec", "")
+        if acodec:
+            cmd += ["-c:a", acodec]
+
+        abitrate = opts.get("audio_bitrate", "")
+        if abitrate:
+            cmd += ["-b:a", abitrate]
+
+    # Operation-specific settings
+    if operation == "extract_audio":
+        cmd += ["-vn"]  # No video
+    elif operation == "extract_video":
+        cmd += ["-an"]  # No audio
+    elif operation == "info":
+        cmd = [exe, "-i", input_file]
+        return cmd
+
+    # Output file
+    output_file = opts.get("output", "")
+    if not output_file:
+        raise ValueError("Output file is required")
+    cmd += [output_file]
+
+    return cmd
+
+def build_mkv_cmd(opts):
+    tool = opts.get("tool", "mkvmerge")
+    exe = opts.get(tool, "")
+    if not exe:
+        raise ValueError(f"{tool} path is required. Please set the path using 'Find in PATH' or browse to the executable.")
+    src = opts.get("src", "")
+    if not src:
+        raise ValueError("Source file is required")
+    args = opts.get("args", "").strip().split()
+    out = opts.get("out", "")
+
+    # Validate executable exists (unless the share it is on does not answer quickly)
+    if FS.isfile(exe, FS_UI_WAIT_SECONDS) is False:
+        raise ValueError(f"Executable not found: {exe}")
+
+    cmd = [exe] + args
+    # For mkvmerge, append -o out if provided
+    if tool == "mkvmerge" and out:
+        cmd += ["-o", out]
+    # mkvpropedit expects the file before actions; mkvextract has modes; mkvinfo just takes file
+    # Here we adopt a simple pattern: put source at the end for mkvmerge/info; for others we place src first
+    if tool in ["mkvinfo", "mkvmerge"]:
+        cmd += [src]
+    else:
+        # mkvextract/mkvpropedit: put src immediately after exe
+        # (mkvextract modes and output targets must be expressed via args field;
+        # mkvpropedit edits in place, so out is ignored)
+        cmd = [exe, src] + args
+
+    return cmd
+
+COMMAND_BUILDERS = {
+    "dovi": build_dovi_cmd,
+    "mp4": build_mp4muxer_cmd,
+    "mkv": build_mkv_cmd,
+    "ffmpeg": build_ffmpeg_cmd,
+}
+
+# Pipelines: ffmpeg / dovi_tool / mkvmerge / mp4muxer chained through pipes.
+# The HEVC stream goes ffmpeg -> dovi_tool over stdout/stdin ('-'); a file
+# is only written where a tool needs seekable input (the final mux step).
+PIPELINE_WORKFLOWS = ["extract-rpu", "convert", "inject-rpu"]
+RAW_HEVC_EXTS = (".hevc", ".h265", ".265")
+PIPELINE_TOOLS = ("ffmpeg", "dovi_tool", "mkvmerge", "mp4muxer")
+
+def build_pipeline_steps(opts):
+    """Return (steps, temp_files) for a pipeline preset section.
+
+    steps is a list of steps; each step is a list of argv lists whose
+    processes are connected stdout -> stdin.
+    """
+    workflow = opts.get("workflow", "extract-rpu")
+    if workflow not in PIPELINE_WORKFLOWS:
+        raise ValueError(f"Unknown pipeline workflow: {workflow}")
+    src = opts.get("source", "")
+    if not src:
+        raise ValueError("Source file is required")
+    dovi = opts.get("dovi_tool", "")
+    if not dovi:
+        raise ValueError("dovi_tool path is required")
+
+    # Stage 1: Annex B HEVC on stdout, unless the source already is raw HEVC
+    stages = []
+    feed = src
+    if not src.lower().endswith(RAW_HEVC_EXTS):
+        ffmpeg = opts.get("ffmpeg", "")
+        if not ffmpeg:
+            raise ValueError("ffmpeg path is required to read video from a container")
+        stages.append([ffmpeg, "-hide_banner", "-nostdin", "-i", src, "-map", "0:v:0",
+                       "-c:v", "copy", "-bsf:v", "hevc_mp4toannexb", "-f", "hevc", "-"])
+        feed = "-"
+
+    dovi_cmd = [dovi]
+    if opts.get("mode"):
+        dovi_cmd += ["-m", opts["mode"]]
+    if opts.get("crop"):
+        dovi_cmd.append("-c")
+
+    steps = []
+    temp_files = []
+    if workflow == "extract-rpu":
+        rpu = opts.get("rpu", "")
+        if not rpu:
+            raise ValueError("RPU output file is required")
+        stages.append(dovi_cmd + ["extract-rpu", "-i", feed, "-o", rpu])
+        return [stages], temp_files
+
+    output = opts.get("output", "")
+    if not output:
+        raise ValueError("Output file is required")
+    container = os.path.splitext(output)[1].lower()
+    if container in (".mkv", ".mp4"):
+        # Muxers need a seekable file: the one intermediate of the pipeline
+        target = os.path.splitext(output)[0] + ".tmp.hevc"
+        temp_files.append(target)
+    else:
+        target = output
+
+    if workflow == "convert":
+        dovi_cmd += ["convert"]
+        if opts.get("discard_el", True):
+            dovi_cmd.append("--discard")
+        stages.append(dovi_cmd + ["-i", feed, "-o", target])
+    else:  # inject-rpu
+        rpu = opts.get("rpu", "")
+        if not rpu:
+            raise ValueError("RPU input file is required")
+        stages.append(dovi_cmd + ["inject-rpu", "-i", feed, "--rpu-in", rpu, "-o", target])
+    steps.append(stages)
+
+    if container == ".mkv":
+        mkvmerge = opts.get("mkvmerge", "")
+        if not mkvmerge:
+            raise ValueError("mkvmerge path is required for .mkv output")
+        mux = [mkvmerge, "-o", output, target]
+        if opts.get("keep_streams", True) and feed == "-":
+            mux += ["--no-video", src]  # audio / subtitles / chapters from the source
+        steps.append([mux])
+    elif container == ".mp4":
+        mp4muxer = opts.get("mp4muxer", "")
+        if not mp4muxer:
+            raise ValueError("mp4muxer path is required for .mp4 output")
+        mux = [mp4muxer, "-i", target, "-o", output]
+        if opts.get("dv_profile"):
+            mux += ["--dv-profile", opts["dv_profile"]]
+        if opts.get("dv_bl_compat", "").strip():
+            mux += ["--dv-bl-compatible-id", opts["dv_bl_compat"].strip()]
+        mux.append("--overwrite")
+        steps.append([mux])
+    return steps, temp_files
+
+def build_pipeline_job(opts, label=None):
+    steps, temp_files = build_pipeline_steps(opts)
+    return PipelineJob(steps, label=label or f"pipeline {opts.get('workflow', '')}", temp_files=temp_files)
+
+def build_chunked_job(opts):
+    """ChunkedEncodeJob for an FFmpeg preset section with "chunked" set."""
+    if opts.get("custom_cmd", "").strip() or opts.get("operation", "convert") != "convert":
+        raise ValueError("Chunked encoding needs the 'convert' operation without a custom command")
+    vcodec = opts.get("video_codec", "")
+    if not vcodec or vcodec == "copy":
+        raise ValueError("Chunked encoding needs a video encoder (e.g. libx265), not copy")
+    for key, what in (("path", "ffmpeg path"), ("input", "Input file"), ("output", "Output file")):
+        if not opts.get(key):
+            raise ValueError(f"{what} is required")
+    split = opts.get("chunk_split", "keyframes")
+    ffprobe = opts.get("ffprobe") or find_exe("ffprobe")
+    if split == "keyframes" and not ffprobe:
+        raise ValueError("ffprobe is required to find keyframes (or split at scenes)")
+    return ChunkedEncodeJob(opts, ffprobe=ffprobe,
+                            workers=int(opts.get("chunk_workers") or DEFAULT_CHUNK_WORKERS),
+                            chunk_seconds=float(opts.get("chunk_seconds") or DEFAULT_CHUNK_SECONDS),
+                            split=split, scene_threshold=float(opts.get("scene_threshold") or 0.3))
+
+def format_cmd(cmd):
+    """Printable, copy-pasteable form of an argv list."""
+    if os.name == "nt":
+        return subprocess.list2cmdline(cmd)
+    return shlex.join(cmd)
+
+# ---------------------------------------------------------------------------
+# RPU metadata (no Tk): L1 brightness from `dovi_tool export` and
+# downsampling of long per-frame series for plotting.
+# ---------------------------------------------------------------------------
+def pq_to_nits(code, bits=12):
+    """SMPTE ST 2084 (PQ) code value -> cd/m2."""
+    m1, m2 = 2610 / 16384, 2523 / 4096 * 128
+    c1, c2, c3 = 3424 / 4096, 2413 / 4096 * 32, 2392 / 4096 * 32
+    e = max(0.0, min(1.0, code / ((1 << bits) - 1))) ** (1 / m2)
+    return 10000 * (max(e - c1, 0.0) / (c2 - c3 * e)) ** (1 / m1)
+
+def nits_to_pq(nits, bits=12):
+    m1, m2 = 2610 / 16384, 2523 / 4096 * 128
+    c1, c2, c3 = 3424 / 4096, 2413 / 4096 * 32, 2392 / 4096 * 32
+    y = (max(0.0, nits) / 10000) ** m1
+    return ((c1 + c2 * y) / (1 + c3 * y)) ** m2 * ((1 << bits) - 1)
+
+def _find_level1(node, depth=0):
+    if isinstance(node, dict):
+        for key in ("Level1", "level1"):
+            block = node.get(key)
+            if isinstance(block, dict) and "max_pq" in block:
+                return block
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    if depth < 6:
+        for child in children:
+            if isinstance(child, (dict, list)):
+                block = _find_level1(child, depth + 1)
+                if block is not None:
+                    return block
+    return None
+
+def rpu_l1_series(frames):
+    """Per-frame (max_pq, avg_pq) lists from parsed `dovi_tool export` JSON.
+
+    Frames without an L1 block repeat the previous frame's values.
+    """
+    max_pq, avg_pq = [], []
+    last = (0, 0)
+    for frame in frames:
+        block = _find_level1(frame)
+        if block is not None:
+            last = (block.get("max_pq", 0), block.get("avg_pq", 0))
+        max_pq.append(last[0])
+        avg_pq.append(last[1])
+    return max_pq, avg_pq
+
+def load_rpu_l1(rpu_path, dovi_tool=None):
+    """Run `dovi_tool export` on an RPU .bin (or read an existing export .json)
+    and return (max_pq, avg_pq)."""
+    if rpu_path.lower().endswith(".json"):
+        with open(rpu_path, "r", encoding="utf-8") as f:
+            return rpu_l1_series(json.load(f))
+    if not dovi_tool:
+        raise ValueError("dovi_tool path is required to export the RPU")
+    fd, json_path = tempfile.mkstemp(prefix="rpu_export_", suffix=".json")
+    os.close(fd)
+    try:
+        cmd = [dovi_tool, "export", "-i", rpu_path, "-d", f"all={json_path}"]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if proc.returncode != 0:
+            out = proc.stdout.decode("utf-8", "replace").strip()
+            raise ValueError(f"dovi_tool export failed ({proc.returncode}): {out[-500:]}")
+        with open(json_path, "r", encoding="utf-8") as f:
+            return rpu_l1_series(json.load(f))
+    finally:
+        try:
+            os.remove(json_path)
+        except OSError:
+            pass
+
+def lttb(values, lo, hi, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of values[lo:hi] (x = index).
+
+    Returns at most ``threshold`` indices into values, always keeping the
+    first and last point, so peaks survive where plain decimation drops them.
+    """
+    count = hi - lo
+    if threshold >= count or threshold < 3:
+        return list(range(lo, hi))
+    every = (count - 2) / (threshold - 2)
+    out = [lo]
+    a = lo
+    for i in range(threshold - 2):
+        start = lo + int(i * every) + 1
+        end = lo + int((i + 1) * every) + 1
+        next_end = min(lo + int((i + 2) * every) + 1, hi)
+        # Third triangle corner: average of the following bucket
+        avg_x = (end + next_end - 1) / 2
+        avg_y = sum(values[end:next_end]) / (next_end - end)
+        ay = values[a]
+        dx = a - avg_x
+        dy = avg_y - ay
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(dx * (values[j] - ay) - (a - j) * dy)
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(hi - 1)
+    return out
+
+class BitReader:
+    """MSB-first bit reader with Exp-Golomb support, for small header blobs."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def u(self, n):
+        value = 0
+        for _ in range(n):
+            byte = self.data[self.pos >> 3]
+            value = (value << 1) | ((byte >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return value
+
+    def flag(self):
+        return bool(self.u(1))
+
+    def ue(self):
+        zeros = 0
+        while self.u(1) == 0:
+            zeros += 1
+            if zeros > 31:
+                raise ValueError("invalid Exp-Golomb code")
+        return (1 << zeros) - 1 + self.u(zeros)
+
+def strip_emulation_prevention(data):
+    """Remove the 0x03 in every 00 00 03 sequence of a NAL payload."""
+    return data.replace(b"\x00\x00\x03", b"\x00\x00")
+
+RPU_NAL_HEADER = b"\x7c\x01"  # nal_unit_type 62 (UNSPEC62)
+RPU_NAL_PREFIX = 0x19
+
+def parse_rpu_header(payload):
+    """Decode the rpu_data_header fields of one RPU NAL (after the NAL header)."""
+    r = BitReader(strip_emulation_prevention(bytes(payload[:128])))
+    h = {"rpu_nal_prefix": r.u(8), "rpu_type": r.u(6), "rpu_format": r.u(11)}
+    if h["rpu_type"] != 2:
+        return h
+    h["vdr_rpu_profile"] = r.u(4)
+    h["vdr_rpu_level"] = r.u(4)
+    h["vdr_seq_info_present_flag"] = r.flag()
+    if h["vdr_seq_info_present_flag"]:
+        h["chroma_resampling_explicit_filter_flag"] = r.flag()
+        h["coefficient_data_type"] = r.u(2)
+        if h["coefficient_data_type"] == 0:
+            h["coefficient_log2_denom"] = r.ue()
+        h["vdr_rpu_normalized_idc"] = r.u(2)
+        h["bl_video_full_range_flag"] = r.flag()
+        if h["rpu_format"] & 0x700 == 0:
+            h["bl_bit_depth"] = r.ue() + 8
+            h["el_bit_depth"] = (r.ue() & 0xFF) + 8  # upper bits carry ext_mapping_idc
+            h["vdr_bit_depth"] = r.ue() + 8
+            h["spatial_resampling_filter_flag"] = r.flag()
+            r.u(3)
+            h["el_spatial_resampling_filter_flag"] = r.flag()
+            h["disable_residual_flag"] = r.flag()
+    h["vdr_dm_metadata_present_flag"] = r.flag()
+    h["use_prev_vdr_rpu_flag"] = r.flag()
+    return h
+
+def rpu_profile(h):
+    """Dolby Vision profile implied by an RPU header (None if it cannot tell)."""
+    if h.get("rpu_type") != 2 or "bl_video_full_range_flag" not in h:
+        return None
+    if h["vdr_rpu_profile"] == 0:
+        return 5 if h["bl_video_full_range_flag"] else None
+    if h["vdr_rpu_profile"] == 1 and "disable_residual_flag" in h:
+        # Same rule as dovi_tool: an enhancement layer needs both flags
+        if h["el_spatial_resampling_filter_flag"] and not h["disable_residual_flag"]:
+            return 7 if h.get("vdr_bit_depth") == 12 else 4
+        return 8
+    return None
+
+def inspect_rpu(path):
+    """Scan an RPU .bin (as written by dovi_tool extract-rpu) without reading it
+    into memory: frame count, start code style, profile and header of the first
+    RPU, and anything that does not look like a well-formed RPU stream."""
+    info = {"path": path, "size": os.path.getsize(path), "frames": 0, "start_code": None,
+            "profile": None, "header": None, "anomalies": []}
+    if info["size"] == 0:
+        info["anomalies"].append("empty file")
+        return info
+    anomalies = info["anomalies"]
+    four = three = other_nals = bad_prefix = changed = 0
+    first_key = None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        pos = mm.find(b"\x00\x00\x01")
+        if pos < 0:
+            anomalies.append("no NAL start codes found")
+            return info
+        if pos > 1:
+            anomalies.append(f"{pos} bytes before the first start code")
+        while pos >= 0:
+            if pos and mm[pos - 1] == 0:
+                four += 1
+            else:
+                three += 1
+            start = pos + 3
+            pos = mm.find(b"\x00\x00\x01", start)
+            end = size if pos < 0 else pos
+            if pos > 0 and mm[pos - 1] == 0:
+                end -= 1  # zero byte belongs to the next four-byte start code
+            if mm[start:start + 2] != RPU_NAL_HEADER:
+                other_nals += 1
+                continue
+            info["frames"] += 1
+            if end - start < 8 or mm[start + 2] != RPU_NAL_PREFIX:
+                bad_prefix += 1
+                continue
+            # rpu_type / rpu_format / profile / level live in the first 4 payload bytes
+            key = mm[start + 3:start + 6]
+            if first_key is None:
+                first_key = key
+                try:
+                    info["header"] = parse_rpu_header(mm[start + 2:end])
+                    info["profile"] = rpu_profile(info["header"])
+                except (IndexError, ValueError) as e:
+                    anomalies.append(f"first RPU header unreadable: {e}")
+            elif key != first_key:
+                changed += 1
+    # dovi_tool's annex-b preset writes a four-byte code only for the first NAL
+    info["start_code"] = "four" if not three else ("annex-b" if four <= 1 else "mixed")
+    if info["start_code"] == "mixed":
+        anomalies.append(f"mixed start codes ({four} four-byte, {three} three-byte)")
+    if other_nals:
+        anomalies.append(f"{other_nals} non-RPU NAL unit(s)")
+    if bad_prefix:
+        anomalies.append(f"{bad_prefix} RPU(s) without the 0x19 prefix or truncated")
+    if changed:
+        anomalies.append(f"{changed} RPU(s) with a different type/format/profile than the first")
+    if info["header"] and info["header"].get("rpu_type") != 2:
+        anomalies.append(f"rpu_type {info['header']['rpu_type']} (expected 2)")
+    return info
+
+def format_rpu_info(info):
+    lines = [f"RPU: {info['path']} ({info['size']} bytes)",
+             f"  frames: {info['frames']}",
+             f"  start codes: {info['start_code'] or '?'}",
+             f"  profile: {info['profile'] if info['profile'] is not None else 'unknown'}"]
+    for key, value in (info["header"] or {}).items():
+        lines.append(f"  {key}: {int(value) if isinstance(value, bool) else value}")
+    lines += [f"  anomaly: {a}" for a in info["anomalies"]] or ["  anomalies: none"]
+    return lines
+
+# ---------------------------------------------------------------------------
+# Container inspection (no Tk). Header-only readers over mmap: only the
+# metadata elements are touched, never the media payload, so file size does
+# not matter.
+# ---------------------------------------------------------------------------
+DOVI_CONFIG_TYPES = (b"dvcC", b"dvvC", b"dvwC")
+
+def parse_dovi_config(data):
+    """DOVIDecoderConfigurationRecord (the body of a dvcC / dvvC / dvwC box)."""
+    r = BitReader(bytes(data[:8]))
+    cfg = {"version": f"{r.u(8)}.{r.u(8)}"}
+    cfg["profile"] = r.u(7)
+    cfg["level"] = r.u(6)
+    cfg["rpu_present"] = r.flag()
+    cfg["el_present"] = r.flag()
+    cfg["bl_present"] = r.flag()
+    cfg["bl_compat_id"] = r.u(4)
+    return cfg
+
+def format_dovi_config(cfg):
+    if not cfg:
+        return ""
+    layers = "+".join(n for n, k in (("BL", "bl_present"), ("EL", "el_present"), ("RPU", "rpu_present")) if cfg[k])
+    return f"DV {cfg['profile']}.{cfg['bl_compat_id']} L{cfg['level']} {layers}"
+
+# Matroska element IDs (with their length marker bits, as written in files)
+EBML_HEADER, EBML_DOCTYPE = 0x1A45DFA3, 0x4282
+MKV_SEGMENT, MKV_SEEKHEAD, MKV_SEEK, MKV_SEEK_ID, MKV_SEEK_POS = 0x18538067, 0x114D9B74, 0x4DBB, 0x53AB, 0x53AC
+MKV_INFO, MKV_TRACKS, MKV_CLUSTER = 0x1549A966, 0x1654AE6B, 0x1F43B675
+MKV_INFO_FIELDS = {0x2AD7B1: ("timestamp_scale", "uint"), 0x4489: ("duration", "float"), 0x7BA9: ("title", "str"),
+                   0x4D80: ("muxing_app", "str"), 0x5741: ("writing_app", "str")}
+MKV_TRACK_ENTRY, MKV_VIDEO, MKV_AUDIO, MKV_BLOCK_ADD_MAPPING = 0xAE, 0xE0, 0xE1, 0x41E4
+MKV_TRACK_FIELDS = {
+    0xD7: ("number", "uint"), 0x83: ("type", "uint"), 0x86: ("codec", "str"), 0x536E: ("name", "str"),
+    0x22B59C: ("language", "str"), 0x22B59D: ("language_bcp47", "str"), 0xB9: ("enabled", "uint"),
+    0x88: ("default", "uint"), 0x55AA: ("forced", "uint"), 0x23E383: ("default_duration", "uint"),
+    0xB0: ("width", "uint"), 0xBA: ("height", "uint"), 0xB5: ("sampling_frequency", "float"), 0x9F: ("channels", "uint"),
+}
+MKV_TRACK_TYPES = {1: "video", 2: "audio", 3: "complex", 16: "logo", 17: "subtitles", 18: "buttons", 32: "control", 33: "metadata"}
+
+def _ebml_vint(mm, pos, keep_marker=False):
+    first = mm[pos]
+    length, marker = 1, 0x80
+    while not first & marker:
+        marker >>= 1
+        length += 1
+        if length > 8:
+            raise ValueError(f"invalid EBML length at offset {pos}")
+    value = first if keep_marker else first & (marker - 1)
+    for b in mm[pos + 1:pos + length]:
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+def _ebml_elements(mm, start, end):
+    """Yield (id, data_start, data_end) for the elements in mm[start:end]."""
+    pos = start
+    while pos < end:
+        eid, n, _ = _ebml_vint(mm, pos, keep_marker=True)
+        size, m, unknown = _ebml_vint(mm, pos + n)
+        data = pos + n + m
+        data_end = end if unknown else min(end, data + size)
+        yield eid, data, data_end
+        pos = data_end
+
+def _ebml_value(mm, start, end, kind):
+    raw = mm[start:end]
+    if kind == "bytes":
+        return raw
+    if kind == "uint":
+        return int.from_bytes(raw, "big")
+    if kind == "float":
+        if len(raw) == 4:
+            return struct.unpack(">f", raw)[0]
+        return struct.unpack(">d", raw)[0] if len(raw) == 8 else 0.0
+    return raw.rstrip(b"\x00").decode("utf-8", "replace")
+
+def _mkv_fields(mm, start, end, fields, into):
+    for eid, a, b in _ebml_elements(mm, start, end):
+        if eid in fields:
+            key, kind = fields[eid]
+            into[key] = _ebml_value(mm, a, b, kind)
+    return into
+
+def _mkv_track(mm, start, end, index):
+    t = {"id": index, "language": "eng", "enabled": 1, "default": 1, "forced": 0, "dovi": None}
+    for eid, a, b in _ebml_elements(mm, start, end):
+        if eid in MKV_TRACK_FIELDS:
+            key, kind = MKV_TRACK_FIELDS[eid]
+            t[key] = _ebml_value(mm, a, b, kind)
+        elif eid in (MKV_VIDEO, MKV_AUDIO):
+            _mkv_fields(mm, a, b, MKV_TRACK_FIELDS, t)
+        elif eid == MKV_BLOCK_ADD_MAPPING:
+            mapping = _mkv_fields(mm, a, b, {0x41E7: ("type", "uint"), 0x41ED: ("extra", "bytes")}, {})
+            fourcc = (mapping.get("type", 0) & 0xFFFFFFFF).to_bytes(4, "big")
+            if fourcc in DOVI_CONFIG_TYPES and len(mapping.get("extra", b"")) >= 5:
+                t["dovi"] = parse_dovi_config(mapping["extra"])
+    t["type"] = MKV_TRACK_TYPES.get(t.get("type"), str(t.get("type", "?")))
+    for flag in ("enabled", "default", "forced"):
+        t[flag] = bool(t[flag])
+    return t
+
+def inspect_mkv(path):
+    """Read the EBML header, Segment Info and Tracks of a Matroska/WebM file.
+
+    Top-level elements are skipped by size and reading stops at the first
+    Cluster; Info/Tracks written after the clusters are reached via the
+    SeekHead.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        try:
+            info = _inspect_mkv(mm, path)
+        except IndexError:
+            raise ValueError(f"Truncated or damaged Matroska file: {path}")
+    scale = info.pop("timestamp_scale", 1000000)
+    if "duration" in info:
+        info["duration"] = info["duration"] * scale / 1e9  # seconds
+    return info
+
+def _inspect_mkv(mm, path):
+    size = len(mm)
+    elements = _ebml_elements(mm, 0, size)
+    eid, a, b = next(elements, (None, 0, 0))
+    if eid != EBML_HEADER:
+        raise ValueError(f"Not a Matroska/WebM file: {path}")
+    doctype = _mkv_fields(mm, a, b, {EBML_DOCTYPE: ("doctype", "str")}, {}).get("doctype", "")
+    eid, seg_start, seg_end = next(elements, (None, 0, 0))
+    if eid != MKV_SEGMENT:
+        raise ValueError("No Matroska Segment after the EBML header")
+    info = {"path": path, "size": size, "doctype": doctype, "tracks": []}
+    seek = {}
+    found = set()
+    for eid, a, b in _ebml_elements(mm, seg_start, seg_end):
+        if eid == MKV_SEEKHEAD:
+            for sid, sa, sb in _ebml_elements(mm, a, b):
+                if sid == MKV_SEEK:
+                    entry = _mkv_fields(mm, sa, sb, {MKV_SEEK_ID: ("id", "uint"), MKV_SEEK_POS: ("pos", "uint")}, {})
+                    if "id" in entry and "pos" in entry:
+                        seek.setdefault(entry["id"], seg_start + entry["pos"])
+        elif eid in (MKV_INFO, MKV_TRACKS):
+            _mkv_read_level1(mm, eid, a, b, info)
+            found.add(eid)
+        elif eid == MKV_CLUSTER:
+            break
+        if found == {MKV_INFO, MKV_TRACKS}:
+            break
+    for eid in (MKV_INFO, MKV_TRACKS):
+        if eid not in found and eid in seek and seek[eid] < size:
+            sid, a, b = next(_ebml_elements(mm, seek[eid], seg_end))
+            if sid == eid:
+                _mkv_read_level1(mm, eid, a, b, info)
+    return info
+
+def _mkv_read_level1(mm, eid, start, end, info):
+    if eid == MKV_INFO:
+        _mkv_fields(mm, start, end, MKV_INFO_FIELDS, info)
+        return
+    for tid, a, b in _ebml_elements(mm, start, end):
+        if tid == MKV_TRACK_ENTRY:
+            info["tracks"].append(_mkv_track(mm, a, b, len(info["tracks"])))
+
+MKV_CODEC_EXTS = {
+    "V_MPEGH/ISO/HEVC": "hevc", "V_MPEG4/ISO/AVC": "h264", "V_AV1": "ivf", "V_VP9": "ivf", "V_MPEG2": "m2v",
+    "A_AAC": "aac", "A_AC3": "ac3", "A_EAC3": "eac3", "A_DTS": "dts", "A_TRUEHD": "thd", "A_FLAC": "flac",
+    "A_OPUS": "opus", "A_MPEG/L3": "mp3", "A_PCM/INT/LIT": "wav",
+    "S_TEXT/UTF8": "srt", "S_TEXT/ASS": "ass", "S_TEXT/SSA": "ssa", "S_HDMV/PGS": "sup", "S_VOBSUB": "sub",
+}
+
+def format_mkv_info(info):
+    lines = [f"{info['path']}: {info['doctype']}" + (f", {format_hms(info['duration'])}" if info.get("duration") else "")]
+    for t in info["tracks"]:
+        lang = t.get("language_bcp47") or t["language"]
+        flags = "".join(f" [{f}]" for f in ("default", "forced") if t[f])
+        extra = ", ".join(x for x in (mkv_track_details(t), format_dovi_config(t["dovi"])) if x)
+        lines.append(f"  {t['id']}: {t['type']} {t.get('codec', '?')} {lang}{flags}" + (f" ({extra})" if extra else ""))
+    return lines
+
+def mkv_track_details(t):
+    """Short human-readable description of a track from inspect_mkv()."""
+    parts = []
+    if t.get("width"):
+        parts.append(f"{t['width']}x{t['height']}")
+    if t.get("default_duration"):
+        parts.append(f"{1e9 / t['default_duration']:.3f} fps")
+    if t.get("sampling_frequency"):
+        parts.append(f"{t['sampling_frequency']:g} Hz")
+    if t.get("channels"):
+        parts.append(f"{t['channels']} ch")
+    return ", ".join(parts)
+
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf"}
+MP4_VISUAL_ENTRIES = {b"hvc1", b"hev1", b"dvh1", b"dvhe", b"avc1", b"avc3", b"dva1", b"dvav", b"av01", b"dav1", b"vp09", b"mp4v"}
+MP4_AUDIO_ENTRIES = {b"mp4a", b"ac-3", b"ec-3", b"ac-4", b"Opus", b"fLaC", b"alac", b"mlpa", b"dtsc", b"dtsh", b"dtsl"}
+
+def _mp4_boxes(mm, start, end):
+    """Yield (type, data_start, box_end, box_start) for the boxes in mm[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", mm, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", mm, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError(f"invalid box size {size} at offset {pos}")
+        yield kind, pos + header, min(end, pos + size), pos
+        pos += size
+
+def _mp4_language(packed):
+    return "".join(chr(((packed >> s) & 0x1F) + 0x60) for s in (10, 5, 0))
+
+def _mp4_sample_entry(mm, kind, start, end):
+    entry = {"sample_entry": kind.decode("latin-1"), "config_boxes": []}
+    if kind in MP4_VISUAL_ENTRIES:
+        entry["width"], entry["height"] = struct.unpack_from(">HH", mm, start + 24)
+        children = start + 78
+    elif kind in MP4_AUDIO_ENTRIES:
+        entry["channels"] = struct.unpack_from(">H", mm, start + 16)[0]
+        entry["sample_rate"] = struct.unpack_from(">I", mm, start + 24)[0] >> 16
+        children = start + 28
+    else:
+        return entry
+    for child, a, b, _ in _mp4_boxes(mm, children, end):
+        entry["config_boxes"].append(child.decode("latin-1"))
+        if child in DOVI_CONFIG_TYPES:
+            entry["dovi"] = parse_dovi_config(mm[a:b])
+            entry["dovi_box"] = child.decode("latin-1")
+    return entry
+
+def _mp4_track(mm, start, end):
+    track = {}
+    # Depth-first over the container boxes of one trak
+    stack = [(start, end)]
+    while stack:
+        a0, b0 = stack.pop()
+        for kind, a, b, _ in _mp4_boxes(mm, a0, b0):
+            if kind in MP4_CONTAINERS:
+                stack.append((a, b))
+            elif kind == b"tkhd":
+                version = mm[a]
+                track["id"] = struct.unpack_from(">I", mm, a + (20 if version == 1 else 12))[0]
+            elif kind == b"mdhd":
+                version = mm[a]
+                if version == 1:
+                    timescale, duration = struct.unpack_from(">IQ", mm, a + 20)
+                    lang_at = a + 32
+                else:
+                    timescale, duration = struct.unpack_from(">II", mm, a + 12)
+                    lang_at = a + 20
+                track["duration"] = duration / timescale if timescale else 0
+                track["language"] = _mp4_language(struct.unpack_from(">H", mm, lang_at)[0])
+            elif kind == b"hdlr":
+                track["handler"] = bytes(mm[a + 8:a + 12]).decode("latin-1")
+            elif kind == b"stsd":
+                entries = list(_mp4_boxes(mm, a + 8, b))
+                if entries:
+                    track.update(_mp4_sample_entry(mm, entries[0][0], entries[0][1], entries[0][2]))
+                if len(entries) > 1:
+                    track["extra_sample_entries"] = len(entries) - 1
+    return track
+
+def inspect_mp4(path):
+    """Read ftyp and moov of an MP4 without touching the media data.
+
+    Top-level boxes are stepped over by their size fields, so an mdat in
+    front of moov (no fast-start) costs one header read, not a scan.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        info = {"path": path, "size": len(mm), "major_brand": None, "compatible_brands": [], "tracks": [],
+                "moov_offset": None, "mdat_offset": None}
+        try:
+            for kind, a, b, box_start in _mp4_boxes(mm, 0, len(mm)):
+                if kind == b"ftyp":
+                    info["major_brand"] = bytes(mm[a:a + 4]).decode("latin-1")
+                    info["minor_version"] = struct.unpack_from(">I", mm, a + 4)[0]
+                    info["compatible_brands"] = [bytes(mm[i:i + 4]).decode("latin-1") for i in range(a + 8, b - 3, 4)]
+                elif kind == b"mdat" and info["mdat_offset"] is None:
+                    info["mdat_offset"] = box_start
+                elif kind == b"moov":
+                    info["moov_offset"] = box_start
+                    for child, ca, cb, _ in _mp4_boxes(mm, a, b):
+                        if child == b"mvhd":
+                            version = mm[ca]
+                            if version == 1:
+                                timescale, duration = struct.unpack_from(">IQ", mm, ca + 20)
+                            else:
+                                timescale, duration = struct.unpack_from(">II", mm, ca + 12)
+                            info["duration"] = duration / timescale if timescale else 0
+                        elif child == b"trak":
+                            info["tracks"].append(_mp4_track(mm, ca, cb))
+                    break  # nothing after moov is needed
+        except (IndexError, struct.error):
+            raise ValueError(f"Truncated or damaged MP4 file: {path}")
+    if info["major_brand"] is None and info["moov_offset"] is None:
+        raise ValueError(f"Not an MP4 file: {path}")
+    info["faststart"] = info["mdat_offset"] is None or (info["moov_offset"] or 0) < info["mdat_offset"]
+    return info
+
+def mp4_checks(info, expect_profile=None, expect_compat=None):
+    """Problems worth flagging in an mp4muxer output (list of strings)."""
+    problems = []
+    if info["moov_offset"] is None:
+        problems.append("no moov box (incomplete file?)")
+    elif not info["faststart"]:
+        problems.append("moov is after mdat (not fast-start)")
+    for t in info["tracks"]:
+        entry = t.get("sample_entry", "")
+        cfg = t.get("dovi")
+        name = f"track {t.get('id', '?')} ({entry})"
+        if entry in ("dvh1", "dvhe", "dva1", "dvav") and not cfg:
+            problems.append(f"{name}: Dolby Vision sample entry without dvcC/dvvC")
+        if not cfg:
+            continue
+        expected_box = "dvcC" if cfg["profile"] <= 7 else ("dvvC" if cfg["profile"] <= 10 else "dvwC")
+        if t.get("dovi_box") != expected_box:
+            problems.append(f"{name}: profile {cfg['profile']} config stored in {t.get('dovi_box')}, expected {expected_box}")
+        if "dby1" not in info["compatible_brands"] and info["major_brand"] != "dby1":
+            problems.append("Dolby Vision track but no 'dby1' brand")
+        if expect_profile and str(cfg["profile"]) != str(expect_profile):
+            problems.append(f"{name}: DV profile {cfg['profile']}, --dv-profile was {expect_profile}")
+        if expect_compat and str(cfg["bl_compat_id"]) != str(expect_compat):
+            problems.append(f"{name}: BL compatibility id {cfg['bl_compat_id']}, --dv-bl-compatible-id was {expect_compat}")
+    return problems
+
+def format_mp4_info(info, problems=()):
+    lines = [f"{info['path']}: brand {info['major_brand']} [{', '.join(info['compatible_brands'])}]"
+             + (f", {format_hms(info['duration'])}" if info.get("duration") else ""),
+             f"  moov at {info['moov_offset']}, mdat at {info['mdat_offset']} ({'fast-start' if info['faststart'] else 'moov at end'})"]
+    for t in info["tracks"]:
+        details = []
+        if t.get("width"):
+            details.append(f"{t['width']}x{t['height']}")
+        if t.get("sample_rate"):
+            details.append(f"{t['sample_rate']} Hz, {t['channels']} ch")
+        if t.get("dovi"):
+            details.append(f"{format_dovi_config(t['dovi'])} ({t['dovi_box']})")
+        if t.get("config_boxes"):
+            details.append("boxes: " + " ".join(t["config_boxes"]))
+        lines.append(f"  track {t.get('id', '?')}: {t.get('handler', '?')} {t.get('sample_entry', '?')} {t.get('language', '')}"
+                     + (f" ({'; '.join(details)})" if details else ""))
+    lines += [f"  problem: {p}" for p in problems] or ["  problems: none"]
+    return lines
+
+def sniff_container(path):
+    """'mkv', 'mp4' or None from the first bytes of a file."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "mkv"
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide"):
+        return "mp4"
+    return None
+
+# ---------------------------------------------------------------------------
+# Probing: what is in an input file (codecs, resolution, HDR / DV, tracks).
+# Results are cached on disk by (path, size, mtime) so re-picking a file or
+# reopening the app does not probe again.
+# ---------------------------------------------------------------------------
+MKV_PROBE_CODECS = {"V_MPEGH/ISO/HEVC": "hevc", "V_MPEG4/ISO/AVC": "h264", "V_AV1": "av1", "V_VP9": "vp9",
+                    "A_AAC": "aac", "A_AC3": "ac3", "A_EAC3": "eac3", "A_DTS": "dts", "A_TRUEHD": "truehd",
+                    "A_FLAC": "flac", "A_OPUS": "opus", "A_MPEG/L3": "mp3", "S_TEXT/UTF8": "subrip",
+                    "S_TEXT/ASS": "ass", "S_HDMV/PGS": "hdmv_pgs_subtitle"}
+MP4_PROBE_CODECS = {"hvc1": "hevc", "hev1": "hevc", "dvh1": "hevc", "dvhe": "hevc", "avc1": "h264", "avc3": "h264",
+                    "dva1": "h264", "dvav": "h264", "av01": "av1", "vp09": "vp9", "mp4a": "aac", "ac-3": "ac3",
+                    "ec-3": "eac3", "Opus": "opus", "fLaC": "flac"}
+HDR_TRANSFERS = {"smpte2084": "HDR10", "arib-std-b67": "HLG"}
+
+def _probe_result(source, container, duration=None):
+    return {"source": source, "container": container, "duration": duration, "start_time": 0.0, "video": None,
+            "dovi": None, "audio": [], "subtitles": []}
+
+def _fraction(text):
+    try:
+        num, _, den = str(text).partition("/")
+        return round(float(num) / float(den or 1), 3)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def probe_ffprobe(ffprobe, path):
+    cmd = [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    if proc.returncode != 0:
+        raise ValueError(proc.stderr.decode("utf-8", "replace").strip() or f"ffprobe exited with {proc.returncode}")
+    data = json.loads(proc.stdout.decode("utf-8", "replace"))
+    fmt = data.get("format", {})
+    duration = float(fmt["duration"]) if fmt.get("duration") else None
+    res = _probe_result("ffprobe", fmt.get("format_name", ""), duration)
+    try:
+        res["start_time"] = float(fmt.get("start_time") or 0)  # non-zero in most TS / M2TS files
+    except ValueError:
+        pass
+    for s in data.get("streams", []):
+        kind = s.get("codec_type")
+        lang = s.get("tags", {}).get("language", "")
+        if kind == "video" and res["video"] is None and not s.get("disposition", {}).get("attached_pic"):
+            res["video"] = {"codec": s.get("codec_name"), "width": s.get("width"), "height": s.get("height"),
+                            "fps": _fraction(s.get("avg_frame_rate") or s.get("r_frame_rate")),
+                            "pix_fmt": s.get("pix_fmt"), "hdr": HDR_TRANSFERS.get(s.get("color_transfer"))}
+            for sd in s.get("side_data_list", []):
+                if "dv_profile" in sd:
+                    res["dovi"] = {"version": f"{sd.get('dv_version_major', 1)}.{sd.get('dv_version_minor', 0)}",
+                                   "profile": sd["dv_profile"], "level": sd.get("dv_level", 0),
+                                   "rpu_present": bool(sd.get("rpu_present_flag")),
+                                   "el_present": bool(sd.get("el_present_flag")),
+                                   "bl_present": bool(sd.get("bl_present_flag")),
+                                   "bl_compat_id": sd.get("dv_bl_signal_compatibility_id", 0)}
+        elif kind == "audio":
+            res["audio"].append({"codec": s.get("codec_name"), "channels": s.get("channels"), "language": lang})
+        elif kind == "subtitle":
+            res["subtitles"].append({"codec": s.get("codec_name"), "language": lang})
+    return res
+
+def probe_hevc_rpu(path, limit=8 << 20):
+    """DV profile from the first RPU within the first ``limit`` bytes of a raw HEVC stream."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(b"\x00\x00\x01" + RPU_NAL_HEADER, 0, min(len(mm), limit))
+        if pos < 0:
+            return None
+        profile = rpu_profile(parse_rpu_header(mm[pos + 5:pos + 5 + 128]))
+    return {"profile": profile} if profile is not None else None
+
+def probe_native(path):
+    """Probe with the built-in header readers (no ffprobe)."""
+    if path.lower().endswith(RAW_HEVC_EXTS):
+        res = _probe_result("native", "hevc")
+        res["video"] = {"codec": "hevc"}
+        res["dovi"] = probe_hevc_rpu(path)
+        return res
+    kind = sniff_container(path)
+    if kind == "mkv":
+        info = inspect_mkv(path)
+        res = _probe_result("native", info["doctype"], info.get("duration"))
+        for t in info["tracks"]:
+            codec = MKV_PROBE_CODECS.get(t.get("codec", ""), t.get("codec", "").lower())
+            lang = t.get("language_bcp47") or t["language"]
+            if t["type"] == "video" and res["video"] is None:
+                fps = round(1e9 / t["default_duration"], 3) if t.get("default_duration") else None
+                res["video"] = {"codec": codec, "width": t.get("width"), "height": t.get("height"), "fps": fps}
+                res["dovi"] = t["dovi"]
+            elif t["type"] == "audio":
+                res["audio"].append({"codec": codec, "channels": t.get("channels"), "language": lang})
+            elif t["type"] == "subtitles":
+                res["subtitles"].append({"codec": codec, "language": lang})
+        return res
+    if kind == "mp4":
+        info = inspect_mp4(path)
+        res = _probe_result("native", info["major_brand"], info.get("duration"))
+        for t in info["tracks"]:
+            codec = MP4_PROBE_CODECS.get(t.get("sample_entry", ""), t.get("sample_entry"))
+            if t.get("handler") == "vide" and res["video"] is None:
+                res["video"] = {"codec": codec, "width": t.get("width"), "height": t.get("height")}
+                res["dovi"] = t.get("dovi")
+            elif t.get("handler") == "soun":
+                res["audio"].append({"codec": codec, "channels": t.get("channels"), "language": t.get("language", "")})
+            elif t.get("handler") in ("subt", "text", "sbtl"):
+                res["subtitles"].append({"codec": codec, "language": t.get("language", "")})
+        return res
+    raise ValueError(f"Unknown container: {path}")
+
+def probe_file(path, ffprobe=None):
+    """Normalized description of a media file: ffprobe when available, else the native readers."""
+    ffprobe = ffprobe or find_exe("ffprobe")
+    if ffprobe and not path.lower().endswith(RAW_HEVC_EXTS):
+        try:
+            return probe_ffprobe(ffprobe, path)
+        except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+            print(f"ffprobe failed for {path}: {e}; using the built-in readers")
+    return probe_native(path)
+
+def probe_summary(res):
+    parts = []
+    v = res.get("video")
+    if v:
+        desc = (v.get("codec") or "?").upper()
+        if v.get("width"):
+            desc += f" {v['width']}x{v['height']}"
+        if v.get("fps"):
+            desc += f" {v['fps']:g} fps"
+        if v.get("hdr"):
+            desc += f" {v['hdr']}"
+        parts.append(desc)
+    if res.get("dovi"):
+        cfg = res["dovi"]
+        parts.append(format_dovi_config(cfg) if "level" in cfg else f"DV profile {cfg['profile']}")
+    if res.get("audio"):
+        parts.append(f"{len(res['audio'])} audio ({', '.join(a['codec'] or '?' for a in res['audio'])})")
+    if res.get("subtitles"):
+        parts.append(f"{len(res['subtitles'])} subtitle")
+    if res.get("duration"):
+        parts.append(format_hms(res["duration"]))
+    return ", ".join(parts) or res.get("container", "")
+
+class ProbeCache:
+    """Bounded (LRU) on-disk cache of probe_file() results keyed by
+    (path, size, mtime_ns). Misses are probed on one background thread."""
+
+    def __init__(self, cache_file=PROBE_CACHE_FILE, max_entries=PROBE_CACHE_SIZE):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self._entries = None  # OrderedDict key -> result, oldest first; loaded on first use
+        self._errors = {}
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        st = os.stat(path)
+        return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+    def peek(self, path):
+        """Cached result for path, or None while it is being probed (starts the probe).
+        Failed probes give {"error": message}."""
+        try:
+            key = self.key(path)
+        except OSError as e:
+            return {"error": str(e)}
+        with self._lock:
+            self._load()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if key in self._errors:
+                return self._errors[key]
+            if key not in self._pending:
+                self._pending.add(key)
+                self._queue.put((key, path))
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._work, daemon=True)
+                    self._worker.start()
+        return None
+
+    def get(self, path):
+        """Blocking lookup: probe now on a miss."""
+        result = self.peek(path)
+        while result is None:
+            time.sleep(0.05)
+            result = self.peek(path)
+        return result
+
+    def _work(self):
+        while True:
+            key, path = self._queue.get()
+            try:
+                result, error = probe_file(path), None
+            except Exception as e:
+                result, error = None, {"error": str(e)}
+            with self._lock:
+                self._pending.discard(key)
+                if error:
+                    self._errors[key] = error
+                    continue
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                data = {"entries": list(self._entries.items())}
+            self._save(data)
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = collections.OrderedDict()
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, result in data.get("entries", [])[-self.max_entries:]:
+                self._entries[key] = result
+        except Exception:
+            pass
+
+    def _save(self, data):
+        try:
+            make_parent(self.cache_file)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_file)
+        except Exception as e:
+            print(f"Probe cache not saved: {e}")
+
+PROBE_CACHE = ProbeCache()
+
+def when_probed(picker, path, apply):
+    """Call apply(result) on the Tk thread once ``path`` is probed, unless the
+    picker has moved on to another file meanwhile. Never blocks: the cache
+    lookup (a stat, and the cache file on first use) runs on FS."""
+    if picker.var.get().strip() != path:
+        return
+    when_done(picker, FS.submit(PROBE_CACHE.peek, path, key=("probe", path)),
+              lambda result: _when_probed(picker, path, apply, result), timeout=None)
+
+def _when_probed(picker, path, apply, result):
+    if picker.var.get().strip() != path:
+        return
+    if result is None:
+        picker.after(100, when_probed, picker, path, apply)
+        return
+    if "error" in result:
+        print(f"Probe failed for {path}: {result['error']}")
+        return
+    apply(result)
+
+# ---------------------------------------------------------------------------
+# Filesystem calls off the Tk thread. A stat() on a stalled SMB/NFS share can
+# hang for minutes, so the widgets go through FS: the call runs on a worker
+# thread, the Tk side polls for the result with after(), and stat results
+# are cached for a moment so repeated checks of one path stay cheap.
+# ---------------------------------------------------------------------------
+class FsExecutor:
+    """Runs filesystem calls on a few worker threads. Identical calls in
+    flight share one worker (a hung path ties up a single thread) and stat
+    results are cached for ``ttl`` seconds."""
+
+    def __init__(self, workers=4, ttl=FS_CACHE_SECONDS):
+        self.ttl = ttl
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="fs")
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future
+        self._stats = {}     # path -> (monotonic time, os.stat_result or None)
+
+    def submit(self, fn, *args, key=None):
+        """Future of fn(*args); calls with the same ``key`` share one future
+        while it is running."""
+        with self._lock:
+            if key is not None and key in self._inflight:
+                return self._inflight[key]
+            future = self._pool.submit(fn, *args)
+            if key is not None:
+                self._inflight[key] = future
+        if key is not None:
+            future.add_done_callback(lambda f: self._finished(key))
+        return future
+
+    def _finished(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def stat(self, path):
+        """Future of os.stat(path), or of None when it does not exist."""
+        with self._lock:
+            hit = self._stats.get(path)
+        if hit is not None and time.monotonic() - hit[0] < self.ttl:
+            future = concurrent.futures.Future()
+            future.set_result(hit[1])
+            return future
+        return self.submit(self._stat, path, key=("stat", path))
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        now = time.monotonic()
+        with self._lock:
+            if len(self._stats) > 1000:
+                self._stats = {p: v for p, v in self._stats.items() if now - v[0] < self.ttl}
+            self._stats[path] = (now, st)
+        return st
+
+    def isfile(self, path, timeout=FS_TIMEOUT_SECONDS):
+        """True / False, or None if the answer did not come within ``timeout`` s."""
+        try:
+            st = self.stat(path).result(timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def isdir(self, path, timeout=FS_TIMEOUT_SECONDS):
+        try:
+            st = self.stat(path).result(timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+FS = FsExecutor()
+
+def when_done(widget, future, apply, on_error=None, timeout=FS_TIMEOUT_SECONDS, _deadline=None):
+    """Call apply(result) on the Tk thread once ``future`` is done (polling
+    with after(), never blocking). If it raised, or is still running after
+    ``timeout`` seconds (None: no limit), on_error(exception) is called
+    instead, or the error is printed."""
+    if not widget.winfo_exists():
+        return
+    if _deadline is None and timeout is not None:
+        _deadline = time.monotonic() + timeout
+    if not future.done():
+        if _deadline is None or time.monotonic() < _deadline:
+            widget.after(50, when_done, widget, future, apply, on_error, timeout, _deadline)
+            return
+        error = TimeoutError(f"no answer from the file system after {timeout:g} s")
+    else:
+        error = future.exception()
+        if error is None:
+            apply(future.result())
+            return
+    if on_error is not None:
+        on_error(error)
+    else:
+        print(f"Background file operation failed: {error}")
+
+def autofill_tool_path(picker, name):
+    """Fill an empty picker with the discovered tool path once discovery is done.
+
+    Never blocks the Tk thread: while discovery runs in the background the
+    check is simply re-scheduled.
+    """
+    found = TOOL_DISCOVERY.peek()
+    if found is None:
+        picker.after(100, autofill_tool_path, picker, name)
+        return
+    path = found.get(name)
+    if path and not picker.var.get():
+        picker.var.set(path)
+        print(f"Auto-found {name}: {path}")
 
 class PathPicker(ttk.Frame):
     def __init__(self, master, label, default_cmd=None, must_exist=True, **kwargs):
         super().__init__(master, **kwargs)
         self.must_exist = must_exist
+        self._change_job = None
         ttk.Label(self, text=label).grid(row=0, column=0, sticky="w")
         self.var = tk.StringVar()
+        self.var.trace_add("write", self._changed)
         entry = ttk.Entry(self, textvariable=self.var, width=60)
         entry.grid(row=0, column=1, sticky="we", padx=4)
         self.columnconfigure(1, weight=1)
@@ -303,26 +4385,46 @@ class PathPicker(ttk.Frame):
             self.var.set(path)
 
     def find_in_path(self, cmd):
-        p = which(cmd)
+        # PATH may include network folders: look on a worker thread
+        when_done(self, FS.submit(which, cmd), lambda p: self._found_in_path(cmd, p))
+
+    def _found_in_path(self, cmd, p):
         if p:
             self.var.set(p)
         else:
             messagebox.showinfo("Not found", f"'{cmd}' not found in PATH.")
 
+    def _changed(self, *args):
+        if self._change_job is not None:
+            self.after_cancel(self._change_job)
+        self._change_job = self.after(300, self._prefetch)
+
+    def _prefetch(self):
+        # stat in the background now, so get() finds the answer cached
+        self._change_job = None
+        path = self.var.get().strip()
+        if path:
+            FS.stat(path)
+
     def get(self):
         v = self.var.get().strip()
-        if self.must_exist and v and not os.path.isfile(v):
+        # Unknown after a short wait (slow share): let the tool report it
+        if self.must_exist and v and FS.isfile(v, FS_UI_WAIT_SECONDS) is False:
             messagebox.showerror("Path error", f"File not found: {v}")
             return None
         return v or ""
 
 class FilePicker(ttk.Frame):
-    def __init__(self, master, label, mode="open", must_exist=True, **kwargs):
+    def __init__(self, master, label, mode="open", must_exist=True, on_change=None, **kwargs):
         super().__init__(master, **kwargs)
         self.mode = mode
         self.must_exist = must_exist
+        # on_change(path) runs once the value has settled on an existing file
+        self.on_change = on_change
+        self._change_job = None
         ttk.Label(self, text=label).grid(row=0, column=0, sticky="w")
         self.var = tk.StringVar()
+        self.var.trace_add("write", self._changed)
         entry = ttk.Entry(self, textvariable=self.var, width=60)
         entry.grid(row=0, column=1, sticky="we", padx=4)
         self.columnconfigure(1, weight=1)
@@ -336,9 +4438,26 @@ class FilePicker(ttk.Frame):
         if path:
             self.var.set(path)
 
+    def _changed(self, *args):
+        if self._change_job is not None:
+            self.after_cancel(self._change_job)
+        self._change_job = self.after(300, self._fire_change)  # wait for typing to stop
+
+    def _fire_change(self):
+        self._change_job = None
+        path = self.var.get().strip()
+        if path:
+            when_done(self, FS.stat(path), lambda st: self._stat_done(path, st))
+
+    def _stat_done(self, path, st):
+        if self.on_change is not None and st is not None and stat.S_ISREG(st.st_mode) \
+                and self.var.get().strip() == path:
+            self.on_change(path)
+
     def get(self):
         v = self.var.get().strip()
-        if self.must_exist and v and not os.path.isfile(v):
+        # Unknown after a short wait (slow share): let the tool report it
+        if self.must_exist and v and FS.isfile(v, FS_UI_WAIT_SECONDS) is False:
             messagebox.showerror("File error", f"File not found: {v}")
             return None
         return v or ""
@@ -359,10 +4478,165 @@ class Collapsible(ttk.Frame):
         else:
             self.body.grid_remove()
 
+class RpuPlotWindow(tk.Toplevel):
+    """L1 max / avg brightness of an RPU drawn on a canvas.
+
+    Only about one point per horizontal pixel is drawn (LTTB over the visible
+    frame range), so zooming and resizing stay fast on feature-length RPUs.
+    Wheel zooms around the cursor, dragging pans, double-click resets.
+    """
+
+    MARGIN_L, MARGIN_R, MARGIN_T, MARGIN_B = 60, 12, 12, 28
+    NIT_TICKS = (0.1, 1, 10, 100, 400, 1000, 4000, 10000)
+    SERIES = (("max", "#EF4444", "L1 max (MaxCLL)"), ("avg", "#3B82F6", "L1 avg (MaxFALL)"))
+
+    def __init__(self, master, rpu_path, dovi_tool=None):
+        super().__init__(master)
+        self.title(f"RPU brightness - {os.path.basename(rpu_path)}")
+        self.geometry("1000x420")
+        self.series = None
+        self.view = (0, 0)
+        self._drag = None
+        self._redraw_pending = False
+        self._loaded = queue.Queue()
+
+        bar = ttk.Frame(self)
+        bar.pack(fill="x", padx=6, pady=4)
+        ttk.Button(bar, text="Reset zoom", command=self.reset_zoom).pack(side="left")
+        self.status = tk.StringVar(value="Exporting RPU...")
+        ttk.Label(bar, textvariable=self.status).pack(side="left", padx=10)
+        self.canvas = tk.Canvas(self, bg="#111827", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", lambda e: self._zoom(e.x, 0.8 if e.delta > 0 else 1.25))
+        self.canvas.bind("<Button-4>", lambda e: self._zoom(e.x, 0.8))
+        self.canvas.bind("<Button-5>", lambda e: self._zoom(e.x, 1.25))
+        self.canvas.bind("<ButtonPress-1>", self._drag_start)
+        self.canvas.bind("<B1-Motion>", self._drag_move)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.reset_zoom())
+        self.canvas.bind("<Motion>", self._hover)
+
+        def load():
+            try:
+                self._loaded.put(load_rpu_l1(rpu_path, dovi_tool))
+            except Exception as e:
+                self._loaded.put(e)
+        threading.Thread(target=load, daemon=True).start()
+        self.after(100, self._poll_loaded)
+
+    def _poll_loaded(self):
+        try:
+            result = self._loaded.get_nowait()
+        except queue.Empty:
+            self.after(100, self._poll_loaded)
+            return
+        if isinstance(result, Exception):
+            self.status.set(f"Failed: {result}")
+            return
+        max_pq, avg_pq = result
+        if not max_pq:
+            self.status.set("No frames in RPU")
+            return
+        self.series = {"max": max_pq, "avg": avg_pq}
+        self.summary = (f"{len(max_pq)} frames, MaxCLL {pq_to_nits(max(max_pq)):.0f} nits, "
+                        f"MaxFALL {pq_to_nits(max(avg_pq)):.0f} nits")
+        self.status.set(self.summary)
+        self.reset_zoom()
+
+    # ---------------- View -----------------
+    def reset_zoom(self):
+        if self.series:
+            self.view = (0, len(self.series["max"]))
+            self.redraw()
+
+    def _plot_width(self):
+        return max(1, self.canvas.winfo_width() - self.MARGIN_L - self.MARGIN_R)
+
+    def _frame_at(self, x):
+        lo, hi = self.view
+        frac = min(1.0, max(0.0, (x - self.MARGIN_L) / self._plot_width()))
+        return lo + frac * (hi - lo)
+
+    def _zoom(self, x, factor):
+        if not self.series:
+            return
+        total = len(self.series["max"])
+        lo, hi = self.view
+        center = self._frame_at(x)
+        span = min(total, max(10, (hi - lo) * factor))
+        frac = (center - lo) / max(1, hi - lo)
+        lo = int(max(0, min(total - span, center - frac * span)))
+        self.view = (lo, int(min(total, lo + span)))
+        self.redraw()
+
+    def _drag_start(self, event):
+        self._drag = (event.x, self.view)
+
+    def _drag_move(self, event):
+        if not self.series or not self._drag:
+            return
+        x0, (lo, hi) = self._drag
+        total = len(self.series["max"])
+        shift = int((x0 - event.x) / self._plot_width() * (hi - lo))
+        shift = max(-lo, min(total - hi, shift))
+        self.view = (lo + shift, hi + shift)
+        self.redraw()
+
+    def _hover(self, event):
+        if not self.series:
+            return
+        i = min(len(self.series["max"]) - 1, int(self._frame_at(event.x)))
+        self.status.set(f"{self.summary}  |  frame {i}: max {pq_to_nits(self.series['max'][i]):.1f}, "
+                        f"avg {pq_to_nits(self.series['avg'][i]):.1f} nits")
+
+    # ---------------- Drawing -----------------
+    def redraw(self):
+        # Coalesce bursts of wheel/drag/configure events into one redraw
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._draw)
+
+    def _draw(self):
+        self._redraw_pending = False
+        c = self.canvas
+        c.delete("all")
+        w, h = c.winfo_width(), c.winfo_height()
+        left, top = self.MARGIN_L, self.MARGIN_T
+        right, bottom = w - self.MARGIN_R, h - self.MARGIN_B
+        if right - left < 10 or bottom - top < 10:
+            return
+
+        def y_of(pq):
+            return bottom - (bottom - top) * pq / 4095
+
+        for nits in self.NIT_TICKS:
+            y = y_of(nits_to_pq(nits))
+            c.create_line(left, y, right, y, fill="#374151")
+            c.create_text(left - 4, y, text=f"{nits:g}", anchor="e", fill="#9CA3AF", font=("Segoe UI", 8))
+        c.create_rectangle(left, top, right, bottom, outline="#6B7280")
+        if not self.series:
+            return
+        lo, hi = self.view
+        c.create_text(left, bottom + 4, text=str(lo), anchor="nw", fill="#9CA3AF", font=("Segoe UI", 8))
+        c.create_text(right, bottom + 4, text=str(hi - 1), anchor="ne", fill="#9CA3AF", font=("Segoe UI", 8))
+        c.create_text((left + right) / 2, bottom + 4, text="frame  (nits on a PQ scale)", anchor="n", fill="#9CA3AF", font=("Segoe UI", 8))
+        x_scale = (right - left) / max(1, hi - lo - 1)
+        for key, color, label in self.SERIES:
+            values = self.series[key]
+            points = []
+            for i in lttb(values, lo, hi, right - left):
+                points += (left + (i - lo) * x_scale, y_of(values[i]))
+            if len(points) >= 4:
+                c.create_line(*points, fill=color)
+        for n, (key, color, label) in enumerate(self.SERIES):
+            c.create_text(right - 6, top + 6 + 14 * n, text=label, anchor="ne", fill=color, font=("Segoe UI", 8))
+
 class DoviToolTab(ttk.Frame):
-    def __init__(self, master, runner: AsyncRunner, **kwargs):
+    def __init__(self, master, runner: AsyncRunner, jobs: JobQueue = None, **kwargs):
         super().__init__(master, **kwargs)
         self.runner = runner
+        self.jobs = jobs
 
         # Tool path
         self.path_picker = PathPicker(self, "dovi_tool path:", default_cmd="dovi_tool")
@@ -370,19 +4644,16 @@ class DoviToolTab(ttk.Frame):
         self.columnconfigure(1, weight=1)
         
         # Auto-populate dovi_tool path if it exists
-        dovi_path = find_exe("dovi_tool")
-        if dovi_path:
-            self.path_picker.var.set(dovi_path)
-            print(f"Auto-found dovi_tool: {dovi_path}")
+        autofill_tool_path(self.path_picker, "dovi_tool")
 
         # Subcommand
         ttk.Label(self, text="Subcommand:").grid(row=1, column=0, sticky="w")
         self.subcmd = tk.StringVar(value="extract-rpu")
-        dovi_subs = ["convert", "demux", "editor", "export", "extract-rpu", "inject-rpu", "generate", "info", "mux", "plot", "remove"]
-        ttk.Combobox(self, textvariable=self.subcmd, values=dovi_subs, state="readonly", width=20).grid(row=1, column=1, sticky="w", pady=2)
+        ttk.Combobox(self, textvariable=self.subcmd, values=DOVI_SUBCOMMANDS, state="readonly", width=20).grid(row=1, column=1, sticky="w", pady=2)
 
         # IO
-        self.in_file = FilePicker(self, "Input:", mode="open", must_exist=True)
+        self.in_file = FilePicker(self, "Input:", mode="open", must_exist=True,
+                                  on_change=lambda path: self._log_probe(self.in_file, path))
         self.in_file.grid(row=2, column=0, columnspan=3, sticky="we", pady=2)
         self.out_file = FilePicker(self, "Output:", mode="save", must_exist=False)
         self.out_file.grid(row=3, column=0, columnspan=3, sticky="we", pady=2)
@@ -446,60 +4717,89 @@ class DoviToolTab(ttk.Frame):
         self.run_btn.pack(side="left")
         self.cancel_btn = ttk.Button(btns, text="Cancel", command=self.runner.cancel, state="disabled")
         self.cancel_btn.pack(side="left", padx=6)
+        ttk.Button(btns, text="Add to queue", command=self.enqueue).pack(side="left")
+        ttk.Button(btns, text="Plot L1", command=self.plot_l1).pack(side="left", padx=6)
+        ttk.Button(btns, text="Inspect RPU", command=self.inspect_rpu).pack(side="left")
         self.runner.run_button = self.run_btn
         self.runner.cancel_button = self.cancel_btn
 
-    def build_cmd(self):
-        exe = self.path_picker.get()
-        if not exe:
-            raise ValueError("dovi_tool path is required")
-        sub = self.subcmd.get().strip()
-        cmd = [exe, sub]
-
-        # I/O by subcommand
-        inf = self.in_file.get()
-        outf = self.out_file.get()
-        if sub in ["extract-rpu", "convert", "demux", "mux", "remove", "export", "plot", "info", "editor", "inject-rpu", "generate"]:
-            if inf:
-                cmd += [inf]
-        # outputs
-        if outf:
-            cmd += ["-o", outf]
+    def _log_probe(self, picker, path):
+        if path.lower().endswith((".bin", ".json")):
+            return  # RPU / export, not a media file
+        when_probed(picker, path, lambda res: self.runner.log(f"{os.path.basename(path)}: {probe_summary(res)}"))
+
+    def get_state(self):
+        return {
+            "path": self.path_picker.var.get(),
+            "subcmd": self.subcmd.get(),
+            "in": self.in_file.var.get(),
+            "out": self.out_file.var.get(),
+            "rpu_in": self.rpu_in.var.get(),
+            "rpu_out": self.rpu_out.var.get(),
+            "mode": self.mode.get(),
+            "crop": self.crop.get(),
+            "drop_hdr10p": self.drop_hdr10p.get(),
+            "edit_cfg": self.edit_cfg.var.get(),
+            "start_code": self.start_code.get(),
+            "extra": self.extra.get(),
+        }
 
-        # RPU in/out
-        if sub == "inject-rpu":
-            rpu_in = self.rpu_in.get()
-            if rpu_in:
-                cmd += ["--rpu-in", rpu_in]
-        if sub == "extract-rpu":
-            rpu_out = self.rpu_out.get()
-            if rpu_out:
-                cmd += ["-o", rpu_out]
-
-        # global options - build them in the correct order
-        global_opts = []
-        if self.mode.get():
-            global_opts.extend(["-m", self.mode.get()])
-        if self.crop.get():
-            global_opts.append("-c")
-        if self.drop_hdr10p.get():
-            global_opts.append("--drop-hdr10plus")
-        editc = self.edit_cfg.get()
-        if editc:
-            global_opts.extend(["--edit-config", editc])
-        if self.start_code.get():
-            global_opts.extend(["--start-code", self.start_code.get()])
-        
-        # Rebuild command with global options before subcommand
-        if global_opts:
-            cmd = [exe] + global_opts + [sub] + cmd[2:]
+    def set_state(self, d):
+        self.path_picker.var.set(d.get("path", ""))
+        self.subcmd.set(d.get("subcmd", "extract-rpu"))
+        self.in_file.var.set(d.get("in", ""))
+        self.out_file.var.set(d.get("out", ""))
+        self.rpu_in.var.set(d.get("rpu_in", ""))
+        self.rpu_out.var.set(d.get("rpu_out", ""))
+        self.mode.set(d.get("mode", ""))
+        self.crop.set(bool(d.get("crop", False)))
+        self.drop_hdr10p.set(bool(d.get("drop_hdr10p", False)))
+        self.edit_cfg.var.set(d.get("edit_cfg", ""))
+        self.start_code.set(d.get("start_code", ""))
+        self.extra.set(d.get("extra", ""))
+
+    def rpu_file(self):
+        """The RPU this tab points at: RPU out, RPU in, or an RPU/export input."""
+        candidates = [self.rpu_out.var.get(), self.rpu_in.var.get()]
+        inp = self.in_file.var.get()
+        if inp.lower().endswith((".bin", ".json")):
+            candidates.append(inp)
+        for path in candidates:
+            path = path.strip()
+            if path and FS.isfile(path, FS_UI_WAIT_SECONDS) is not False:
+                return path
+        return None
 
-        # extra args
-        extra = self.extra.get().strip()
-        if extra:
-            cmd += extra.split()
+    def plot_l1(self):
+        rpu = self.rpu_file()
+        if not rpu:
+            messagebox.showerror("Plot L1", "Set RPU out / RPU in (or an RPU .bin / export .json input) to an existing file.")
+            return
+        RpuPlotWindow(self, rpu, dovi_tool=self.path_picker.var.get().strip() or (TOOL_DISCOVERY.peek() or {}).get("dovi_tool"))
 
-        return cmd
+    def inspect_rpu(self):
+        rpu = self.rpu_file()
+        if not rpu or rpu.lower().endswith(".json"):
+            messagebox.showerror("Inspect RPU", "Set RPU out / RPU in (or an RPU .bin input) to an existing file.")
+            return
+        when_done(self, FS.submit(inspect_rpu, rpu), self._show_rpu_info,
+                  on_error=lambda e: messagebox.showerror("Inspect RPU", str(e)), timeout=None)
+
+    def _show_rpu_info(self, info):
+        for line in format_rpu_info(info):
+            self.runner.log(line)
+
+    def build_cmd(self):
+        opts = self.get_state()
+        # File fields go through the pickers so missing files are reported
+        pickers = [("path", self.path_picker), ("in", self.in_file), ("out", self.out_file), ("edit_cfg", self.edit_cfg)]
+        if opts["subcmd"] == "inject-rpu":
+            pickers.append(("rpu_in", self.rpu_in))
+        if opts["subcmd"] == "extract-rpu":
+            pickers.append(("rpu_out", self.rpu_out))
+        for key, picker in pickers:
+            opts[key] = picker.get() or ""
+        return build_dovi_cmd(opts)
 
     def run(self):
         try:
@@ -509,10 +4809,19 @@ class DoviToolTab(ttk.Frame):
             return
         self.runner.run(cmd)
 
+    def enqueue(self):
+        try:
+            cmd = self.build_cmd()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.jobs.submit(cmd, label=f"dovi_tool {self.subcmd.get()}")
+
 class Mp4MuxerTab(ttk.Frame):
-    def __init__(self, master, runner: AsyncRunner, **kwargs):
+    def __init__(self, master, runner: AsyncRunner, jobs: JobQueue = None, **kwargs):
         super().__init__(master, **kwargs)
         self.runner = runner
+        self.jobs = jobs
         self.inputs = []
 
         self.path_picker = PathPicker(self, "mp4muxer path:", default_cmd="mp4muxer")
@@ -520,10 +4829,7 @@ class Mp4MuxerTab(ttk.Frame):
         self.columnconfigure(1, weight=1)
         
         # Auto-populate mp4muxer path if it exists
-        mp4muxer_path = find_exe("mp4muxer")
-        if mp4muxer_path:
-            self.path_picker.var.set(mp4muxer_path)
-            print(f"Auto-found mp4muxer: {mp4muxer_path}")
+        autofill_tool_path(self.path_picker, "mp4muxer")
 
         # Inputs area
         self.in_frame = ttk.LabelFrame(self, text="Inputs (add multiple)")
@@ -573,6 +4879,8 @@ class Mp4MuxerTab(ttk.Frame):
         self.run_btn.pack(side="left")
         self.cancel_btn = ttk.Button(btns, text="Cancel", command=self.runner.cancel, state="disabled")
         self.cancel_btn.pack(side="left", padx=6)
+        ttk.Button(btns, text="Add to queue", command=self.enqueue).pack(side="left")
+        ttk.Button(btns, text="Inspect output", command=self.inspect_output).pack(side="left", padx=6)
         self.runner.run_button = self.run_btn
         self.runner.cancel_button = self.cancel_btn
 
@@ -581,6 +4889,7 @@ class Mp4MuxerTab(ttk.Frame):
         frame = ttk.Frame(self.in_frame)
         frame.grid(row=row, column=0, sticky="we", padx=4, pady=2)
         fp = FilePicker(frame, f"Input {row}:", mode="open", must_exist=True)
+        fp.on_change = lambda path, fp=fp: when_probed(fp, path, self._apply_probe)
         fp.grid(row=0, column=0, columnspan=3, sticky="we")
         lang = tk.StringVar()
         tscale = tk.StringVar()
@@ -594,45 +4903,80 @@ class Mp4MuxerTab(ttk.Frame):
         ttk.Entry(frame, textvariable=fr, width=10).grid(row=0, column=8)
         self.inputs.append((fp, lang, tscale, fr))
 
-    def build_cmd(self):
-        exe = self.path_picker.get()
-        if not exe:
-            raise ValueError("mp4muxer path is required")
-        cmd = [exe]
-
-        for fp, lang, tscale, fr in self.inputs:
-            f = fp.get()
-            if f:
-                cmd += ["-i", f]
-                if lang.get().strip():
-                    cmd += ["--media-lang", lang.get().strip()]
-                if tscale.get().strip():
-                    cmd += ["--media-timescale", tscale.get().strip()]
-                if fr.get().strip():
-                    cmd += ["--input-video-frame-rate", fr.get().strip()]
-
-        out = self.out_file.get()
-        if out:
-            cmd += ["-o", out]
-
-        if self.dv_profile.get():
-            cmd += ["--dv-profile", self.dv_profile.get()]
-        if self.dv_bl_compat.get().strip():
-            cmd += ["--dv-bl-compatible-id", self.dv_bl_compat.get().strip()]
-        if self.brands.get().strip():
-            cmd += ["--mpeg4-comp-brand", self.brands.get().strip()]
-        if self.hvc1flag.get():
-            cmd += ["--hvc1flag", "0"]
-        if self.dvh1flag.get():
-            cmd += ["--dvh1flag", "0"]
-        if self.overwrite.get():
-            cmd += ["--overwrite"]
-
-        extra = self.extra.get().strip()
-        if extra:
-            cmd += extra.split()
+    def inspect_output(self):
+        out = self.out_file.var.get().strip()
+        if not out or FS.isfile(out, FS_UI_WAIT_SECONDS) is False:
+            messagebox.showerror("Inspect output", "Output .mp4 does not exist yet.")
+            return
+        when_done(self, FS.submit(inspect_mp4, out), self._show_output_info,
+                  on_error=lambda e: messagebox.showerror("Inspect output", str(e)), timeout=None)
+
+    def _show_output_info(self, info):
+        problems = mp4_checks(info, self.dv_profile.get(), self.dv_bl_compat.get().strip())
+        for line in format_mp4_info(info, problems):
+            self.runner.log(line)
+
+    def _apply_probe(self, res):
+        """Take the DV profile / compatibility id from a probed input if not set yet."""
+        cfg = res.get("dovi")
+        if not cfg:
+            return
+        if not self.dv_profile.get():
+            self.dv_profile.set(str(cfg["profile"]))
+        if "bl_compat_id" in cfg and cfg["profile"] >= 8 and not self.dv_bl_compat.get().strip():
+            self.dv_bl_compat.set(str(cfg["bl_compat_id"]))
+
+    def get_state(self):
+        return {
+            "path": self.path_picker.var.get(),
+            "out": self.out_file.var.get(),
+            "dv_profile": self.dv_profile.get(),
+            "dv_bl_compat": self.dv_bl_compat.get(),
+            "brands": self.brands.get(),
+            "hvc1flag": self.hvc1flag.get(),
+            "dvh1flag": self.dvh1flag.get(),
+            "overwrite": self.overwrite.get(),
+            "extra": self.extra.get(),
+            "inputs": [
+                {
+                    "file": fp.var.get(),
+                    "lang": lang.get(),
+                    "tscale": tscale.get(),
+                    "fr": fr.get(),
+                }
+                for (fp, lang, tscale, fr) in self.inputs
+            ],
+        }
 
-        return cmd
+    def set_state(self, d):
+        self.path_picker.var.set(d.get("path", ""))
+        self.out_file.var.set(d.get("out", ""))
+        self.dv_profile.set(d.get("dv_profile", ""))
+        self.dv_bl_compat.set(d.get("dv_bl_compat", ""))
+        self.brands.set(d.get("brands", "mp42,iso6,isom,msdh,dby1"))
+        self.hvc1flag.set(bool(d.get("hvc1flag", False)))
+        self.dvh1flag.set(bool(d.get("dvh1flag", False)))
+        self.overwrite.set(bool(d.get("overwrite", True)))
+        self.extra.set(d.get("extra", ""))
+        # reset inputs
+        for child in self.in_frame.winfo_children():
+            child.destroy()
+        self.inputs = []
+        for it in d.get("inputs", []):
+            self._add_input_row()
+            fp, lang, tscale, fr = self.inputs[-1]
+            fp.var.set(it.get("file", ""))
+            lang.set(it.get("lang", ""))
+            tscale.set(it.get("tscale", ""))
+            fr.set(it.get("fr", ""))
+
+    def build_cmd(self):
+        opts = self.get_state()
+        opts["path"] = self.path_picker.get() or ""
+        for it, (fp, _, _, _) in zip(opts["inputs"], self.inputs):
+            it["file"] = fp.get() or ""
+        opts["out"] = self.out_file.get() or ""
+        return build_mp4muxer_cmd(opts)
 
     def run(self):
         try:
@@ -642,10 +4986,19 @@ class Mp4MuxerTab(ttk.Frame):
             return
         self.runner.run(cmd)
 
+    def enqueue(self):
+        try:
+            cmd = self.build_cmd()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.jobs.submit(cmd, label="mp4muxer")
+
 class FFmpegTab(ttk.Frame):
-    def __init__(self, master, runner: AsyncRunner, **kwargs):
+    def __init__(self, master, runner: AsyncRunner, jobs: JobQueue = None, **kwargs):
         super().__init__(master, **kwargs)
         self.runner = runner
+        self.jobs = jobs
 
         # Tool path
         self.path_picker = PathPicker(self, "ffmpeg path:", default_cmd="ffmpeg")
@@ -653,10 +5006,7 @@ class FFmpegTab(ttk.Frame):
         self.columnconfigure(1, weight=1)
         
         # Auto-populate ffmpeg path if it exists
-        ffmpeg_path = find_exe("ffmpeg")
-        if ffmpeg_path:
-            self.path_picker.var.set(ffmpeg_path)
-            print(f"Auto-found ffmpeg: {ffmpeg_path}")
+        autofill_tool_path(self.path_picker, "ffmpeg")
 
         # Operation type
         ttk.Label(self, text="Operation:").grid(row=1, column=0, sticky="w")
@@ -667,7 +5017,7 @@ class FFmpegTab(ttk.Frame):
         op_help.grid(row=1, column=2, sticky="w", padx=(5,0))
 
         # Input files
-        self.input_file = FilePicker(self, "Input file:", mode="open", must_exist=True)
+        self.input_file = FilePicker(self, "Input file:", mode="open", must_exist=True, on_change=self._input_changed)
         self.input_file.grid(row=2, column=0, columnspan=3, sticky="we", pady=2)
         
         self.input2_file = FilePicker(self, "Input 2 (for merge):", mode="open", must_exist=True)
@@ -733,96 +5083,123 @@ class FFmpegTab(ttk.Frame):
         preset_help = ttk.Label(audio_frame, text="ultrafast=Fast, slow=Better quality", font=("Arial", 8), foreground="gray")
         preset_help.grid(row=2, column=2, sticky="w", padx=(5,0))
 
+        # Chunked encode
+        chunk_frame = ttk.LabelFrame(self, text="Chunked / Resumable Encode (convert)")
+        chunk_frame.grid(row=7, column=0, columnspan=4, sticky="we", pady=4)
+        self.chunked = tk.BooleanVar(self, False)
+        ttk.Checkbutton(chunk_frame, text="Encode in parallel chunks", variable=self.chunked).grid(row=0, column=0, sticky="w")
+        ttk.Label(chunk_frame, text="Workers:").grid(row=0, column=1, sticky="e", padx=(10,0))
+        self.chunk_workers = tk.StringVar(value=str(DEFAULT_CHUNK_WORKERS))
+        ttk.Spinbox(chunk_frame, from_=1, to=64, textvariable=self.chunk_workers, width=4).grid(row=0, column=2, sticky="w")
+        ttk.Label(chunk_frame, text="Chunk length (s):").grid(row=0, column=3, sticky="e", padx=(10,0))
+        self.chunk_seconds = tk.StringVar(value=str(DEFAULT_CHUNK_SECONDS))
+        ttk.Entry(chunk_frame, textvariable=self.chunk_seconds, width=6).grid(row=0, column=4, sticky="w")
+        ttk.Label(chunk_frame, text="Split at:").grid(row=0, column=5, sticky="e", padx=(10,0))
+        self.chunk_split = tk.StringVar(value="keyframes")
+        ttk.Combobox(chunk_frame, textvariable=self.chunk_split, values=["keyframes", "scenes"], width=10, state="readonly").grid(row=0, column=6, sticky="w")
+        ttk.Label(chunk_frame, text="Scene threshold:").grid(row=0, column=7, sticky="e", padx=(10,0))
+        self.scene_threshold = tk.StringVar(value="0.3")
+        ttk.Entry(chunk_frame, textvariable=self.scene_threshold, width=5).grid(row=0, column=8, sticky="w")
+        chunk_help = ttk.Label(chunk_frame, text="Chunks run as one job on the Job Queue tab and are joined losslessly (concat demuxer); "
+                               "a cancelled or interrupted encode queued again resumes from its finished chunks", font=("Arial", 8), foreground="gray")
+        chunk_help.grid(row=1, column=0, columnspan=9, sticky="w")
+
         # Custom command
-        ttk.Label(self, text="Custom FFmpeg command:").grid(row=7, column=0, sticky="w")
+        ttk.Label(self, text="Custom FFmpeg command:").grid(row=8, column=0, sticky="w")
         self.custom_cmd = tk.StringVar()
-        ttk.Entry(self, textvariable=self.custom_cmd, width=80).grid(row=7, column=1, columnspan=3, sticky="we", pady=2)
+        ttk.Entry(self, textvariable=self.custom_cmd, width=80).grid(row=8, column=1, columnspan=3, sticky="we", pady=2)
         custom_help = ttk.Label(self, text="Override all settings above. Use full ffmpeg command without 'ffmpeg'", font=("Arial", 8), foreground="gray")
-        custom_help.grid(row=8, column=0, columnspan=4, sticky="w")
+        custom_help.grid(row=9, column=0, columnspan=4, sticky="w")
 
         # Run/Cancel buttons
-        btns = ttk.Frame(self)
-        btns.grid(row=9, column=0, columnspan=4, sticky="we", pady=4)
-        # Primary action button
-        self.run_btn = ttk.Button(btns, text="Run", command=self.run, style="Primary.TButton")
-        self.run_btn.pack(side="left")
-        self.cancel_btn = ttk.Button(btns, text="Cancel", command=self.runner.cancel, state="disabled")
-        self.cancel_btn.pack(side="left", padx=6)
-        self.runner.run_button = self.run_btn
-        self.runner.cancel_button = self.cancel_btn
-
-    def build_cmd(self):
-        exe = self.path_picker.get()
-        if not exe:
-            raise ValueError("ffmpeg path is required")
-        
-        # Check for custom command
-        custom = self.custom_cmd.get().strip()
-        if custom:
-            return [exe] + custom.split()
-        
-        # Build command based on operation
-        operation = self.operation.get()
-        cmd = [exe]
-        
-        # Input file
-        input_file = self.input_file.get()
-        if not input_file:
-            raise ValueError("Input file is required")
-        cmd += ["-i", input_file]
-        
-        # Second input for merge
-        if operation == "merge":
-            input2 = self.input2_file.get()
-            if input2:
-                cmd += ["-i", input2]
-        
-        # Video settings
-        if operation in ["convert", "extract_video", "merge"]:
-            vcodec = self.video_codec.get()
-            if vcodec:
-                cmd += ["-c:v", vcodec]
-            
-            quality = self.quality.get()
-            if quality:
-                cmd += ["-crf", quality]
-            
-            resolution = self.resolution.get()
-            if resolution:
-                cmd += ["-s", resolution]
-            
-            preset = self.preset.get()
-            if preset:
-                cmd += ["-preset", preset]
-        
-        # Audio settings
-        if operation in ["convert", "extract_audio", "merge"]:
-            acodec = self.audio_codec.get()
-            if acodec:
-                cmd += ["-c:a", acodec]
-            
-            abitrate = self.audio_bitrate.get()
-            if abitrate:
-                cmd += ["-b:a", abitrate]
-        
-        # Operation-specific settings
-        if operation == "extract_audio":
-            cmd += ["-vn"]  # No video
-        elif operation == "extract_video":
-            cmd += ["-an"]  # No audio
-        elif operation == "info":
-            cmd = [exe, "-i", input_file]
-            return cmd
-        
-        # Output file
-        output_file = self.output_file.get()
-        if not output_file:
-            raise ValueError("Output file is required")
-        cmd += [output_file]
-        
-        return cmd
+        btns = ttk.Frame(self)
+        btns.grid(row=10, column=0, columnspan=4, sticky="we", pady=4)
+        # Primary action button
+        self.run_btn = ttk.Button(btns, text="Run", command=self.run, style="Primary.TButton")
+        self.run_btn.pack(side="left")
+        self.cancel_btn = ttk.Button(btns, text="Cancel", command=self.runner.cancel, state="disabled")
+        self.cancel_btn.pack(side="left", padx=6)
+        ttk.Button(btns, text="Add to queue", command=self.enqueue).pack(side="left")
+        ttk.Button(btns, text="Benchmark...", command=self.show_benchmark).pack(side="left", padx=6)
+        self.runner.run_button = self.run_btn
+        self.runner.cancel_button = self.cancel_btn
+
+    def show_benchmark(self):
+        BenchmarkWindow(self, self)
+
+    def _input_changed(self, path):
+        when_probed(self.input_file, path, self._apply_probe)
+
+    def _apply_probe(self, res):
+        """Fill settings that are still empty from what the input contains."""
+        v = res.get("video") or {}
+        if v and not self.video_codec.get():
+            # Re-encoding drops the Dolby Vision RPU, so keep DV video as is
+            encoders = {"hevc": "libx265", "h264": "libx264", "vp9": "libvpx-vp9", "av1": "libaom-av1"}
+            self.video_codec.set("copy" if res.get("dovi") else encoders.get(v.get("codec"), ""))
+        audio = res.get("audio") or []
+        if audio and not self.audio_codec.get() and all(a["codec"] in ("aac", "mp3", "ac3", "eac3") for a in audio):
+            self.audio_codec.set("copy")
+        self.runner.log(f"{os.path.basename(self.input_file.var.get())}: {probe_summary(res)}")
+
+    def get_state(self):
+        return {
+            "path": self.path_picker.var.get(),
+            "operation": self.operation.get(),
+            "input": self.input_file.var.get(),
+            "input2": self.input2_file.var.get(),
+            "output": self.output_file.var.get(),
+            "video_codec": self.video_codec.get(),
+            "quality": self.quality.get(),
+            "resolution": self.resolution.get(),
+            "audio_codec": self.audio_codec.get(),
+            "audio_bitrate": self.audio_bitrate.get(),
+            "preset": self.preset.get(),
+            "custom_cmd": self.custom_cmd.get(),
+            "chunked": self.chunked.get(),
+            "chunk_workers": self.chunk_workers.get(),
+            "chunk_seconds": self.chunk_seconds.get(),
+            "chunk_split": self.chunk_split.get(),
+            "scene_threshold": self.scene_threshold.get(),
+        }
+
+    def set_state(self, d):
+        self.path_picker.var.set(d.get("path", ""))
+        self.operation.set(d.get("operation", "convert"))
+        self.input_file.var.set(d.get("input", ""))
+        self.input2_file.var.set(d.get("input2", ""))
+        self.output_file.var.set(d.get("output", ""))
+        self.video_codec.set(d.get("video_codec", ""))
+        self.quality.set(d.get("quality", ""))
+        self.resolution.set(d.get("resolution", ""))
+        self.audio_codec.set(d.get("audio_codec", ""))
+        self.audio_bitrate.set(d.get("audio_bitrate", ""))
+        self.preset.set(d.get("preset", ""))
+        self.custom_cmd.set(d.get("custom_cmd", ""))
+        self.chunked.set(bool(d.get("chunked", False)))
+        self.chunk_workers.set(d.get("chunk_workers", str(DEFAULT_CHUNK_WORKERS)))
+        self.chunk_seconds.set(d.get("chunk_seconds", str(DEFAULT_CHUNK_SECONDS)))
+        self.chunk_split.set(d.get("chunk_split", "keyframes"))
+        self.scene_threshold.set(d.get("scene_threshold", "0.3"))
+
+    def build_opts(self):
+        opts = self.get_state()
+        opts["path"] = self.path_picker.get() or ""
+        if opts["path"] and not opts["custom_cmd"].strip():
+            opts["input"] = self.input_file.get() or ""
+            if opts["operation"] == "merge":
+                opts["input2"] = self.input2_file.get() or ""
+            opts["output"] = self.output_file.get() or ""
+        return opts
+
+    def build_cmd(self):
+        return build_ffmpeg_cmd(self.build_opts())
 
     def run(self):
+        if self.chunked.get():
+            # Several processes: only the job queue can run it
+            self.enqueue()
+            return
         try:
             cmd = self.build_cmd()
         except Exception as e:
@@ -830,10 +5207,321 @@ class FFmpegTab(ttk.Frame):
             return
         self.runner.run(cmd)
 
+    def enqueue(self):
+        try:
+            if self.chunked.get():
+                job = build_chunked_job(self.build_opts())
+            else:
+                cmd = self.build_cmd()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if self.chunked.get():
+            self.jobs.add(job)
+            self.runner.log(f"Chunked encode queued as job {job.id} (see the Job Queue tab)")
+        else:
+            self.jobs.submit(cmd, label=f"ffmpeg {self.operation.get()}")
+
+class BenchmarkWindow(tk.Toplevel):
+    """Runs a BenchmarkJob on the job queue and fills a results table as the
+    cases finish. Double-click a row to copy its settings to the FFmpeg tab."""
+
+    COLUMNS = (("codec", "Codec", 90), ("preset", "Preset", 80), ("crf", "CRF", 40), ("fps", "fps", 60),
+               ("cpu_seconds", "CPU s", 60), ("bitrate_kbps", "kbit/s", 70), ("ssim", "SSIM", 70),
+               ("psnr", "PSNR", 60), ("status", "Status", 70))
+
+    def __init__(self, master, tab):
+        super().__init__(master)
+        self.tab = tab
+        self.job = None
+        self._shown = 0
+        self.title("Encoder benchmark")
+        self.geometry("760x420")
+
+        form = ttk.Frame(self)
+        form.pack(fill="x", padx=6, pady=4)
+        form.columnconfigure(1, weight=1)
+        self.source = tk.StringVar(value="synthetic")
+        src = ttk.Frame(form)
+        src.grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(src, text="Synthetic test pattern", variable=self.source, value="synthetic").pack(side="left")
+        ttk.Radiobutton(src, text="Sample of the tab's input from", variable=self.source, value="input").pack(side="left", padx=(8, 0))
+        self.start = tk.StringVar(value="0")
+        ttk.Entry(src, textvariable=self.start, width=6).pack(side="left", padx=4)
+        ttk.Label(src, text="s, length").pack(side="left")
+        self.seconds = tk.StringVar(value=str(DEFAULT_BENCH_SECONDS))
+        ttk.Entry(src, textvariable=self.seconds, width=5).pack(side="left", padx=4)
+        ttk.Label(src, text="s").pack(side="left")
+        self.codecs = tk.StringVar(value=tab.video_codec.get() if tab.video_codec.get() not in ("", "copy") else "libx265")
+        self.presets = tk.StringVar(value=" ".join(BENCH_PRESETS))
+        self.crfs = tk.StringVar(value=tab.quality.get() or " ".join(BENCH_CRFS))
+        for row, (label, var) in enumerate((("Codecs:", self.codecs), ("Presets:", self.presets), ("CRF values:", self.crfs)), 1):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky="w")
+            ttk.Entry(form, textvariable=var).grid(row=row, column=1, sticky="we", pady=1)
+        self.quality = tk.BooleanVar(value=False)
+        ttk.Checkbutton(form, text="Measure SSIM / PSNR (slower)", variable=self.quality).grid(row=4, column=0, columnspan=2, sticky="w")
+
+        btns = ttk.Frame(self)
+        btns.pack(fill="x", padx=6)
+        ttk.Button(btns, text="Run", command=self.run, style="Primary.TButton").pack(side="left")
+        ttk.Button(btns, text="Export...", command=self.export).pack(side="left", padx=6)
+        self.status = tk.StringVar()
+        ttk.Label(btns, textvariable=self.status).pack(side="left", padx=6)
+
+        self.tree = ttk.Treeview(self, columns=[c for c, _, _ in self.COLUMNS], show="headings")
+        for col, title, width in self.COLUMNS:
+            self.tree.heading(col, text=title)
+            self.tree.column(col, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=6, pady=6)
+        self.tree.bind("<Double-1>", self._apply_row)
+
+    def run(self):
+        if self.job is not None and self.job.active:
+            messagebox.showwarning("Benchmark", "A benchmark is already running.", parent=self)
+            return
+        ffmpeg = self.tab.path_picker.get()
+        if not ffmpeg:
+            messagebox.showerror("Benchmark", "Set the ffmpeg path first.", parent=self)
+            return
+        source = None
+        if self.source.get() == "input":
+            source = self.tab.input_file.get()
+            if not source:
+                messagebox.showerror("Benchmark", "Pick an input file on the FFmpeg tab first.", parent=self)
+                return
+        try:
+            cases = bench_cases(parse_bench_list(self.codecs.get()), parse_bench_list(self.presets.get()),
+                                parse_bench_list(self.crfs.get()))
+            self.job = BenchmarkJob(ffmpeg, cases, source, float(self.start.get() or 0),
+                                    float(self.seconds.get() or DEFAULT_BENCH_SECONDS), self.quality.get())
+        except ValueError as e:
+            messagebox.showerror("Benchmark", str(e), parent=self)
+            return
+        self.tree.delete(*self.tree.get_children())
+        self._shown = 0
+        self.tab.jobs.add(self.job)
+        self._poll()
+
+    def _poll(self):
+        job = self.job
+        if job is None or not self.winfo_exists():
+            return
+        for r in job.results[self._shown:]:
+            self.tree.insert("", "end", iid=str(self._shown),
+                             values=["" if r.get(c) is None else r[c] for c, _, _ in self.COLUMNS])
+            self._shown += 1
+        self.status.set(f"Job {job.id}: {job.status} {job.progress.summary()}".strip())
+        if job.active:
+            self.after(500, self._poll)
+
+    def export(self):
+        if self.job is None or not self.job.results:
+            messagebox.showinfo("Benchmark", "No results yet.", parent=self)
+            return
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path:
+            return
+        when_done(self, FS.submit(write_bench_results, list(self.job.results), path), lambda _: None,
+                  on_error=lambda e: messagebox.showerror("Benchmark", str(e), parent=self), timeout=None)
+
+    def _apply_row(self, event):
+        sel = self.tree.focus()
+        if not sel or self.job is None:
+            return
+        r = self.job.results[int(sel)]
+        self.tab.video_codec.set(r["codec"])
+        self.tab.preset.set(r.get("preset") or "")
+        self.tab.quality.set(r.get("crf") or "")
+
+class WatchFoldersWindow(tk.Toplevel):
+    """Edit the watch-folder list (kept in the preset store) and start / stop
+    watching. Queued files and errors go to the main log."""
+
+    COLUMNS = (("folder", "Folder", 220), ("pattern", "Pattern", 90), ("preset", "Preset", 110),
+               ("tab", "Tab", 60), ("output", "Output template", 200), ("settle", "Settle s", 60))
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("Watch folders")
+        self.geometry("820x400")
+
+        self.tree = ttk.Treeview(self, columns=[c for c, _, _ in self.COLUMNS], show="headings", height=8)
+        for col, title, width in self.COLUMNS:
+            self.tree.heading(col, text=title)
+            self.tree.column(col, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=6, pady=6)
+
+        form = ttk.Frame(self)
+        form.pack(fill="x", padx=6)
+        form.columnconfigure(1, weight=1)
+        self.folder = tk.StringVar()
+        ttk.Label(form, text="Folder:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(form, textvariable=self.folder).grid(row=0, column=1, columnspan=3, sticky="we")
+        ttk.Button(form, text="Browse", command=self._browse).grid(row=0, column=4, padx=4)
+        self.pattern = tk.StringVar(value="*.mkv;*.mp4;*.hevc;*.ts;*.m2ts")
+        ttk.Label(form, text="Pattern:").grid(row=1, column=0, sticky="w")
+        ttk.Entry(form, textvariable=self.pattern).grid(row=1, column=1, sticky="we")
+        self.settle = tk.StringVar(value=str(WATCH_SETTLE_SECONDS))
+        ttk.Label(form, text="Settle s:").grid(row=1, column=2, sticky="e")
+        ttk.Entry(form, textvariable=self.settle, width=6).grid(row=1, column=3, sticky="w", padx=4)
+        self.preset = tk.StringVar()
+        ttk.Label(form, text="Preset:").grid(row=2, column=0, sticky="w")
+        self.preset_box = ttk.Combobox(form, textvariable=self.preset)
+        self.preset_box.grid(row=2, column=1, sticky="we")
+        self.tab = tk.StringVar()
+        ttk.Label(form, text="Tab:").grid(row=2, column=2, sticky="e")
+        ttk.Combobox(form, textvariable=self.tab, values=("",) + PRESET_TABS, width=9, state="readonly").grid(row=2, column=3, sticky="w", padx=4)
+        self.output = tk.StringVar(value=os.path.join("{dir}", "done", "{stem}{ext}"))
+        ttk.Label(form, text="Output:").grid(row=3, column=0, sticky="w")
+        ttk.Entry(form, textvariable=self.output).grid(row=3, column=1, columnspan=3, sticky="we")
+        ttk.Label(form, text="{dir} {name} {stem} {ext} of the new file", font=("Arial", 8), foreground="gray").grid(row=4, column=1, sticky="w")
+
+        btns = ttk.Frame(self)
+        btns.pack(fill="x", padx=6, pady=6)
+        ttk.Button(btns, text="Add", command=self.add).pack(side="left")
+        ttk.Button(btns, text="Remove", command=self.remove).pack(side="left", padx=6)
+        self.existing = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btns, text="Also queue files already there", variable=self.existing).pack(side="left", padx=6)
+        self.toggle_btn = ttk.Button(btns, text="", command=self.toggle, style="Primary.TButton")
+        self.toggle_btn.pack(side="right")
+        self.status = tk.StringVar()
+        ttk.Label(btns, textvariable=self.status).pack(side="right", padx=6)
+
+        self.entries = []
+        self._refresh()
+        store = app.preset_store
+        when_done(self, FS.submit(lambda: (sorted(store.names()), store.watch_folders())), self._loaded,
+                  on_error=lambda e: messagebox.showerror("Watch folders", str(e), parent=self))
+
+    def _loaded(self, result):
+        names, self.entries = result
+        self.preset_box.configure(values=names)
+        self._refresh()
+
+    def _browse(self):
+        folder = filedialog.askdirectory(parent=self)
+        if folder:
+            self.folder.set(folder)
+
+    def _refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for i, e in enumerate(self.entries):
+            self.tree.insert("", "end", iid=str(i), values=[e.get(c, "") for c, _, _ in self.COLUMNS])
+        watcher = self.app.watcher
+        if watcher is not None and watcher.running:
+            self.toggle_btn.configure(text="Stop watching")
+            self.status.set(f"Watching ({watcher.backend})")
+        else:
+            self.toggle_btn.configure(text="Start watching")
+            self.status.set("Stopped")
+
+    def add(self):
+        entry = {"folder": self.folder.get().strip(), "pattern": self.pattern.get().strip() or "*",
+                 "preset": self.preset.get().strip(), "tab": self.tab.get() or None,
+                 "output": self.output.get().strip(), "settle": self.settle.get().strip() or str(WATCH_SETTLE_SECONDS)}
+        try:
+            float(entry["settle"])
+        except ValueError as e:
+            messagebox.showerror("Watch folders", str(e), parent=self)
+            return
+        # The folder may be on a slow share: check it (and the preset) in the background
+        self.status.set("Checking folder...")
+        when_done(self, FS.submit(check_watch_entry, entry, self.app.preset_store), lambda tab: self._added(entry, tab),
+                  on_error=self._failed)
+
+    def _added(self, entry, tab):
+        entry["tab"] = tab
+        self.entries = [e for e in self.entries if os.path.abspath(e["folder"]) != os.path.abspath(entry["folder"])]
+        self.entries.append(entry)
+        self._save()
+
+    def remove(self):
+        drop = {int(iid) for iid in self.tree.selection()}
+        self.entries = [e for i, e in enumerate(self.entries) if i not in drop]
+        self._save()
+
+    def _save(self):
+        self._refresh()
+        when_done(self, FS.submit(self.app.preset_store.set_watch_folders, list(self.entries)), lambda _: None,
+                  on_error=self._failed)
+
+    def _failed(self, error):
+        messagebox.showerror("Watch folders", str(error), parent=self)
+        self._refresh()
+
+    def toggle(self):
+        if self.app.watcher is not None and self.app.watcher.running:
+            self.app.stop_watching()
+        elif not self.entries:
+            messagebox.showinfo("Watch folders", "Add a folder first.", parent=self)
+            return
+        else:
+            self.status.set("Starting...")
+            self.app.start_watching(self.entries, self.existing.get(), on_done=self._started)
+            return
+        self._refresh()
+
+    def _started(self, error):
+        if not self.winfo_exists():
+            return
+        if error is not None:
+            messagebox.showerror("Watch folders", str(error), parent=self)
+        self._refresh()
+
+class MkvTracksWindow(tk.Toplevel):
+    """Track table of a Matroska file from inspect_mkv(). Double-click a row
+    to add it to the mkvextract 'tracks' arguments of the MKV tab."""
+
+    COLUMNS = (("id", "ID", 40), ("type", "Type", 70), ("codec", "Codec", 150), ("language", "Lang", 50),
+               ("name", "Name", 160), ("default", "Default", 60), ("forced", "Forced", 60),
+               ("details", "Details", 170), ("dovi", "Dolby Vision", 170))
+
+    def __init__(self, master, tab, info):
+        super().__init__(master)
+        self.tab = tab
+        self.info = info
+        self.title(f"Tracks - {os.path.basename(info['path'])}")
+        self.geometry("980x300")
+        head = f"{info['doctype']}"
+        if info.get("duration"):
+            head += f", {format_hms(info['duration'])}"
+        if info.get("title"):
+            head += f", title: {info['title']}"
+        if info.get("writing_app"):
+            head += f", written by {info['writing_app']}"
+        ttk.Label(self, text=head).pack(anchor="w", padx=6, pady=4)
+        self.tree = ttk.Treeview(self, columns=[c for c, _, _ in self.COLUMNS], show="headings")
+        for col, title, width in self.COLUMNS:
+            self.tree.heading(col, text=title)
+            self.tree.column(col, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=6, pady=(0, 6))
+        for t in info["tracks"]:
+            self.tree.insert("", "end", iid=str(t["id"]), values=(
+                t["id"], t["type"], t.get("codec", ""), t.get("language_bcp47") or t["language"], t.get("name", ""),
+                "yes" if t["default"] else "", "yes" if t["forced"] else "",
+                mkv_track_details(t), format_dovi_config(t["dovi"])))
+        self.tree.bind("<Double-1>", self._add_to_extract)
+
+    def _add_to_extract(self, event):
+        sel = self.tree.focus()
+        if not sel:
+            return
+        t = self.info["tracks"][int(sel)]
+        stem = os.path.splitext(self.info["path"])[0]
+        spec = f"{t['id']}:{stem}.track{t['id']}.{MKV_CODEC_EXTS.get(t.get('codec', ''), 'bin')}"
+        args = self.tab.args.get().split()
+        if not args or args[0] != "tracks":
+            args = ["tracks"]
+        self.tab.tool.set("mkvextract")
+        self.tab.args.set(" ".join(args + [spec]))
+
 class MKVToolNixTab(ttk.Frame):
-    def __init__(self, master, runner: AsyncRunner, **kwargs):
+    def __init__(self, master, runner: AsyncRunner, jobs: JobQueue = None, **kwargs):
         super().__init__(master, **kwargs)
         self.runner = runner
+        self.jobs = jobs
 
         self.mkvmerge = PathPicker(self, "mkvmerge path:", default_cmd="mkvmerge")
         self.mkvmerge.grid(row=0, column=0, columnspan=4, sticky="we", pady=2)
@@ -855,7 +5543,8 @@ class MKVToolNixTab(ttk.Frame):
         tool_help = ttk.Label(self, text="merge=Create, extract=Extract, info=Analyze, propedit=Edit", font=("Arial", 8), foreground="gray")
         tool_help.grid(row=4, column=2, sticky="w", padx=(5,0))
 
-        self.src = FilePicker(self, "Source:", mode="open", must_exist=True)
+        self.src = FilePicker(self, "Source:", mode="open", must_exist=True,
+                              on_change=lambda path: self._log_probe(self.src, path))
         self.src.grid(row=5, column=0, columnspan=4, sticky="we", pady=2)
 
         self.out = FilePicker(self, "Output (where applicable):", mode="save", must_exist=False)
@@ -874,6 +5563,8 @@ class MKVToolNixTab(ttk.Frame):
         self.run_btn.pack(side="left")
         self.cancel_btn = ttk.Button(btns, text="Cancel", command=self.runner.cancel, state="disabled")
         self.cancel_btn.pack(side="left", padx=6)
+        ttk.Button(btns, text="Add to queue", command=self.enqueue).pack(side="left")
+        ttk.Button(btns, text="Tracks", command=self.show_tracks).pack(side="left", padx=6)
         self.runner.run_button = self.run_btn
         self.runner.cancel_button = self.cancel_btn
 
@@ -887,10 +5578,7 @@ class MKVToolNixTab(ttk.Frame):
         ]
         
         for tool_name, path_picker in tools:
-            tool_path = find_exe(tool_name)
-            if tool_path:
-                path_picker.var.set(tool_path)
-                print(f"Auto-found {tool_name}: {tool_path}")
+            autofill_tool_path(path_picker, tool_name)
 
     def pick_tool(self):
         t = self.tool.get()
@@ -904,138 +5592,704 @@ class MKVToolNixTab(ttk.Frame):
             return self.mkvpropedit.get()
         return None
 
-    def run(self):
-        exe = self.pick_tool()
-        if not exe:
-            messagebox.showerror("Error", f"{self.tool.get()} path is required. Please set the path using 'Find in PATH' or browse to the executable.")
-            return
+    def show_tracks(self):
         src = self.src.get()
         if not src:
-            messagebox.showerror("Error", "Source file is required")
+            if src is not None:
+                messagebox.showerror("Tracks", "Source file is required")
             return
-        args = self.args.get().strip().split() if self.args.get().strip() else []
-        out = self.out.get()
+        when_done(self, FS.submit(inspect_mkv, src), lambda info: MkvTracksWindow(self, self, info),
+                  on_error=lambda e: messagebox.showerror("Tracks", str(e)), timeout=None)
+
+    def _log_probe(self, picker, path):
+        when_probed(picker, path, lambda res: self.runner.log(f"{os.path.basename(path)}: {probe_summary(res)}"))
+
+    def get_state(self):
+        return {
+            "mkvmerge": self.mkvmerge.var.get(),
+            "mkvextract": self.mkvextract.var.get(),
+            "mkvinfo": self.mkvinfo.var.get(),
+            "mkvpropedit": self.mkvpropedit.var.get(),
+            "tool": self.tool.get(),
+            "src": self.src.var.get(),
+            "out": self.out.var.get(),
+            "args": self.args.get(),
+        }
+
+    def set_state(self, d):
+        self.mkvmerge.var.set(d.get("mkvmerge", ""))
+        self.mkvextract.var.set(d.get("mkvextract", ""))
+        self.mkvinfo.var.set(d.get("mkvinfo", ""))
+        self.mkvpropedit.var.set(d.get("mkvpropedit", ""))
+        self.tool.set(d.get("tool", "mkvmerge"))
+        self.src.var.set(d.get("src", ""))
+        self.out.var.set(d.get("out", ""))
+        self.args.set(d.get("args", ""))
+
+    def build_cmd(self):
+        opts = self.get_state()
+        opts[opts["tool"]] = self.pick_tool() or ""
+        opts["src"] = self.src.get() or ""
+        opts["out"] = self.out.get() or ""
 
         # Debug: Log what we're trying to execute
-        print(f"Debug: Tool = {self.tool.get()}")
-        print(f"Debug: Executable = {exe}")
-        print(f"Debug: Source = {src}")
-        print(f"Debug: Args = {args}")
-
-        # Validate executable exists
-        if not os.path.isfile(exe):
-            messagebox.showerror("Error", f"Executable not found: {exe}")
-            return
-
-        cmd = [exe] + args
-        # For mkvmerge, append -o out if provided
-        if self.tool.get() == "mkvmerge" and out:
-            cmd += ["-o", out]
-        # mkvpropedit expects the file before actions; mkvextract has modes; mkvinfo just takes file
-        # Here we adopt a simple pattern: put source at the end for mkvmerge/info; for others we place src first
-        if self.tool.get() in ["mkvinfo", "mkvmerge"]:
-            if src:
-                cmd += [src]
-        else:
-            # mkvextract/mkvpropedit: put src immediately after exe
-            cmd = [exe]
-            if src:
-                cmd += [src]
-            cmd += args
-            # mkvextract modes and output targets must be expressed via args field
-
-        if self.tool.get() == "mkvpropedit" and out:
-            # Not typically used; mkvpropedit edits in-place; ignore out
-            pass
+        print(f"Debug: Tool = {opts['tool']}")
+        print(f"Debug: Executable = {opts[opts['tool']]}")
+        print(f"Debug: Source = {opts['src']}")
+        print(f"Debug: Args = {opts['args'].split()}")
+
+        return build_mkv_cmd(opts)
 
+    def run(self):
+        try:
+            cmd = self.build_cmd()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
         self.runner.run(cmd)
 
+    def enqueue(self):
+        try:
+            cmd = self.build_cmd()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.jobs.submit(cmd, label=self.tool.get())
+
+class PipelineTab(ttk.Frame):
+    """Dolby Vision workflows run as one job with ffmpeg -> dovi_tool piped
+    (no raw HEVC written), plus a mux step when the output is .mkv/.mp4."""
+
+    def __init__(self, master, runner: AsyncRunner, jobs: JobQueue = None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.runner = runner
+        self.jobs = jobs
+        self.columnconfigure(1, weight=1)
+
+        ttk.Label(self, text="Workflow:").grid(row=0, column=0, sticky="w")
+        self.workflow = tk.StringVar(value="extract-rpu")
+        wf_box = ttk.Combobox(self, textvariable=self.workflow, values=PIPELINE_WORKFLOWS, state="readonly", width=15)
+        wf_box.grid(row=0, column=1, sticky="w", pady=2)
+        wf_help = ttk.Label(self, text="ffmpeg | dovi_tool via pipes; tools are taken from the other tabs or auto-detected", font=("Arial", 8), foreground="gray")
+        wf_help.grid(row=0, column=2, sticky="w", padx=(5,0))
+
+        self.source = FilePicker(self, "Source (.mkv/.mp4/.ts/.hevc):", mode="open", must_exist=True)
+        self.source.grid(row=1, column=0, columnspan=3, sticky="we", pady=2)
+        self.rpu = FilePicker(self, "RPU (out for extract, in for inject):", mode="save", must_exist=False)
+        self.rpu.grid(row=2, column=0, columnspan=3, sticky="we", pady=2)
+        self.output = FilePicker(self, "Output (.hevc, or .mkv/.mp4 to mux):", mode="save", must_exist=False)
+        self.output.grid(row=3, column=0, columnspan=3, sticky="we", pady=2)
+
+        opts = ttk.LabelFrame(self, text="Options")
+        opts.grid(row=4, column=0, columnspan=3, sticky="we", pady=4)
+        ttk.Label(opts, text="dovi_tool --mode:").grid(row=0, column=0, sticky="w")
+        self.mode = tk.StringVar(value="")
+        ttk.Combobox(opts, textvariable=self.mode, values=["", "0", "1", "2", "3", "4", "5"], width=6, state="readonly").grid(row=0, column=1, sticky="w")
+        self.crop = tk.BooleanVar(self, False)
+        ttk.Checkbutton(opts, text="--crop", variable=self.crop).grid(row=0, column=2, sticky="w", padx=6)
+        self.discard_el = tk.BooleanVar(self, True)
+        ttk.Checkbutton(opts, text="convert --discard (drop EL)", variable=self.discard_el).grid(row=0, column=3, sticky="w", padx=6)
+        self.keep_streams = tk.BooleanVar(self, True)
+        ttk.Checkbutton(opts, text="Keep source audio/subs (.mkv)", variable=self.keep_streams).grid(row=1, column=0, columnspan=2, sticky="w")
+        ttk.Label(opts, text="MP4 --dv-profile:").grid(row=1, column=2, sticky="e")
+        self.dv_profile = tk.StringVar(value="8")
+        ttk.Combobox(opts, textvariable=self.dv_profile, values=["", "5", "7", "8"], width=4, state="readonly").grid(row=1, column=3, sticky="w")
+        ttk.Label(opts, text="--dv-bl-compatible-id:").grid(row=1, column=4, sticky="e")
+        self.dv_bl_compat = tk.StringVar(value="1")
+        ttk.Entry(opts, textvariable=self.dv_bl_compat, width=4).grid(row=1, column=5, sticky="w")
+
+        btns = ttk.Frame(self)
+        btns.grid(row=5, column=0, columnspan=3, sticky="we", pady=4)
+        ttk.Button(btns, text="Add to queue", command=self.enqueue, style="Primary.TButton").pack(side="left")
+        ttk.Button(btns, text="Show commands", command=self.show_commands).pack(side="left", padx=6)
+
+    def get_state(self):
+        return {
+            "workflow": self.workflow.get(),
+            "source": self.source.var.get(),
+            "rpu": self.rpu.var.get(),
+            "output": self.output.var.get(),
+            "mode": self.mode.get(),
+            "crop": self.crop.get(),
+            "discard_el": self.discard_el.get(),
+            "keep_streams": self.keep_streams.get(),
+            "dv_profile": self.dv_profile.get(),
+            "dv_bl_compat": self.dv_bl_compat.get(),
+        }
+
+    def set_state(self, d):
+        self.workflow.set(d.get("workflow", "extract-rpu"))
+        self.source.var.set(d.get("source", ""))
+        self.rpu.var.set(d.get("rpu", ""))
+        self.output.var.set(d.get("output", ""))
+        self.mode.set(d.get("mode", ""))
+        self.crop.set(bool(d.get("crop", False)))
+        self.discard_el.set(bool(d.get("discard_el", True)))
+        self.keep_streams.set(bool(d.get("keep_streams", True)))
+        self.dv_profile.set(d.get("dv_profile", "8"))
+        self.dv_bl_compat.set(d.get("dv_bl_compat", "1"))
+
+    def build_job(self):
+        opts = self.get_state()
+        opts["source"] = self.source.get() or ""
+        if opts["workflow"] == "inject-rpu" and opts["rpu"] and FS.isfile(opts["rpu"], FS_UI_WAIT_SECONDS) is False:
+            raise ValueError(f"File not found: {opts['rpu']}")
+        lookup = getattr(self.winfo_toplevel(), "tool_path", find_exe)
+        for name in PIPELINE_TOOLS:
+            opts[name] = lookup(name) or ""
+        return build_pipeline_job(opts)
+
+    def show_commands(self):
+        try:
+            job = self.build_job()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        for line in job.describe():
+            self.runner.log(line)
+
+    def enqueue(self):
+        try:
+            job = self.build_job()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.jobs.add(job)
+
+class LogText(tk.Text):
+    """Read-only log view that renders batches of lines in a single insert.
+
+    Keeps at most ``max_lines`` lines (oldest dropped first). With
+    ``overwrite_cr`` a \\r-terminated (transient) line is replaced by the
+    next line, like a terminal, instead of piling up progress updates.
+    """
+
+    def __init__(self, master, max_lines=DEFAULT_LOG_MAX_LINES, overwrite_cr=True, **kwargs):
+        kwargs.setdefault("state", "disabled")
+        super().__init__(master, **kwargs)
+        self.max_lines = max_lines
+        self.overwrite_cr = overwrite_cr
+        self._tail_transient = False
+
+    def clear(self):
+        self.configure(state="normal")
+        self.delete("1.0", "end")
+        self.configure(state="disabled")
+        self._tail_transient = False
+
+    def append(self, records):
+        """Append (text, transient) records."""
+        lines = []
+        drop_tail = False
+        tail_transient = self._tail_transient
+        for text, transient in records:
+            if tail_transient:
+                if lines:
+                    lines[-1] = text
+                else:
+                    drop_tail = True
+                    lines.append(text)
+            else:
+                lines.append(text)
+            tail_transient = transient and self.overwrite_cr
+        if not lines:
+            return
+        self._tail_transient = tail_transient
+        self.configure(state="normal")
+        if drop_tail:
+            self.delete("end-2l linestart", "end-1c")
+        self.insert("end", "\n".join(lines) + "\n")
+        if self.max_lines:
+            count = int(self.index("end-1c").split(".")[0]) - 1
+            if count > self.max_lines:
+                self.delete("1.0", f"{count - self.max_lines + 1}.0")
+        self.see("end")
+        self.configure(state="disabled")
+
 class LogPane(ttk.Frame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
-        self.text = tk.Text(self, height=14, wrap="word", state="disabled")
+        self.text = LogText(self, height=14, wrap="word")
         self.text.grid(row=0, column=0, sticky="nsew")
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         vsb = ttk.Scrollbar(self, orient="vertical", command=self.text.yview)
         self.text.configure(yscrollcommand=vsb.set)
         vsb.grid(row=0, column=1, sticky="ns")
+        status = ttk.Frame(self)
+        status.grid(row=1, column=0, columnspan=2, sticky="we")
+        self.progress_bar = ttk.Progressbar(status, orient="horizontal", mode="determinate", maximum=100, length=240)
+        self.progress_bar.pack(side="left", pady=2)
+        self.progress_var = tk.StringVar(value="")
+        ttk.Label(status, textvariable=self.progress_var).pack(side="left", padx=6)
+
+    def show_progress(self, progress):
+        """Reflect a Progress sample in the bar and throughput label (None clears)."""
+        if progress is None:
+            self.progress_bar["value"] = 0
+            self.progress_var.set("")
+            return
+        self.progress_bar["value"] = progress.percent or 0
+        self.progress_var.set(progress.summary())
+
+class JobsPane(ttk.Frame):
+    """Job list (status / exit code per job) with the selected job's log beside it.
+    Redrawn when the queue reports a change (TkWaker), plus once a second
+    while jobs are active for the stall / ETA columns; idle, nothing runs."""
+
+    COLUMNS = ("id", "job", "status", "progress", "fps", "speed", "eta", "exit")
 
-def load_presets():
-    if os.path.isfile(DEFAULT_PRESET_FILE):
+    def __init__(self, master, jobs: JobQueue, **kwargs):
+        super().__init__(master, **kwargs)
+        self.jobs = jobs
+        self._shown_job = None
+        self._shown_lines = 0
+        self._tick = None
+
+        bar = ttk.Frame(self)
+        bar.pack(fill="x", pady=4)
+        ttk.Label(bar, text="Parallel workers:").pack(side="left")
+        self.workers = tk.IntVar(value=jobs.workers)
+        self.workers.trace_add("write", lambda *_: self._workers_changed())
+        ttk.Spinbox(bar, from_=1, to=max(64, os.cpu_count() or 1), textvariable=self.workers,
+                    width=4).pack(side="left", padx=4)
+        ttk.Button(bar, text="Cancel job", command=self.cancel_selected).pack(side="left", padx=6)
+        ttk.Button(bar, text="Retry", command=self.retry_selected).pack(side="left")
+        ttk.Button(bar, text="Clear finished", command=self.clear_finished).pack(side="left")
+        ttk.Label(bar, text="Partial outputs:").pack(side="left", padx=(6, 0))
+        self.partial = tk.StringVar(value=jobs.partial_outputs)
+        partial = ttk.Combobox(bar, textvariable=self.partial, values=PARTIAL_OUTPUT_MODES, width=10, state="readonly")
+        partial.pack(side="left", padx=4)
+        partial.bind("<<ComboboxSelected>>", self._partial_changed)
+        self.force = tk.BooleanVar(value=jobs.force)
+        ttk.Checkbutton(bar, text="Re-run up-to-date jobs", variable=self.force,
+                        command=lambda: self.jobs.use_build_cache(self.jobs.builds, self.force.get())).pack(side="left", padx=6)
+
+        limits = ttk.Frame(self)
+        limits.pack(fill="x", pady=(0, 4))
+        policy = jobs.policy
+        ttk.Label(limits, text="Nice:").pack(side="left")
+        self.nice = tk.IntVar(value=policy.nice)
+        ttk.Spinbox(limits, from_=0, to=19, textvariable=self.nice, width=3).pack(side="left", padx=4)
+        ttk.Label(limits, text="CPUs:").pack(side="left")
+        self.cpus = tk.StringVar(value=format_cpu_list(policy.cpus))
+        ttk.Entry(limits, textvariable=self.cpus, width=10).pack(side="left", padx=4)
+        ttk.Label(limits, text="Threads/job:").pack(side="left")
+        self.threads = tk.StringVar(value="off" if policy.threads is None else (policy.threads or "auto"))
+        ttk.Combobox(limits, textvariable=self.threads, values=("auto", "off", "2", "4", "8", "16"),
+                     width=5).pack(side="left", padx=4)
+        ttk.Label(limits, text="Max load:").pack(side="left")
+        self.max_load = tk.StringVar(value="auto" if policy.max_load is None else (policy.max_load or "off"))
+        ttk.Combobox(limits, textvariable=self.max_load, values=("off", "auto"), width=5).pack(side="left", padx=4)
+        ttk.Button(limits, text="Apply limits", command=self.apply_limits).pack(side="left", padx=6)
+
+        panes = ttk.PanedWindow(self, orient="horizontal")
+        panes.pack(fill="both", expand=True)
+        tree_frame = ttk.Frame(panes)
+        self.tree = ttk.Treeview(tree_frame, columns=self.COLUMNS, show="headings", selectmode="browse", height=12)
+        for col, width in zip(self.COLUMNS, (40, 200, 80, 70, 60, 60, 70, 50)):
+            self.tree.heading(col, text=col.capitalize())
+            self.tree.column(col, width=width, stretch=(col == "job"))
+        self.tree.pack(side="left", fill="both", expand=True)
+        tsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=tsb.set)
+        tsb.pack(side="right", fill="y")
+        panes.add(tree_frame, weight=1)
+        self.log_pane = LogPane(panes)
+        panes.add(self.log_pane, weight=2)
+
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self._show_selected(reset=True))
+        self._waker = TkWaker(self, self._refresh)
+        jobs.on_change = self._waker.wake
+        self._refresh()
+
+    def _workers_changed(self):
         try:
-            with open(DEFAULT_PRESET_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+            self.jobs.set_workers(self.workers.get())
+        except (tk.TclError, ValueError):
+            pass
 
-def save_presets(data):
-    try:
-        with open(DEFAULT_PRESET_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        messagebox.showerror("Save presets", str(e))
+    def _partial_changed(self, event=None):
+        self.jobs.partial_outputs = self.partial.get()
+
+    def apply_limits(self):
+        try:
+            policy = ResourcePolicy(self.nice.get(), parse_cpu_list(self.cpus.get()),
+                                    parse_thread_budget(self.threads.get()), parse_max_load(self.max_load.get()))
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Resource limits", str(e))
+            return
+        unknown = set(policy.cpus or ()) - set(usable_cpus())
+        if unknown:
+            messagebox.showerror("Resource limits", f"CPUs not available: {format_cpu_list(sorted(unknown))}")
+            return
+        self.jobs.set_policy(policy)
+
+    def _selected_job(self):
+        sel = self.tree.selection()
+        if not sel:
+            return None
+        for job in self.jobs.jobs:
+            if str(job.id) == sel[0]:
+                return job
+        return None
+
+    def cancel_selected(self):
+        job = self._selected_job()
+        if job is not None:
+            self.jobs.cancel(job)
+
+    def retry_selected(self):
+        """Queue a finished job again; chunked encodes resume from their checkpoint."""
+        job = self._selected_job()
+        if job is not None and not job.active:
+            self.jobs.add(job.clone())
+
+    def clear_finished(self):
+        self.jobs.clear_finished()
+        self._refresh()
+
+    def _show_selected(self, reset=False):
+        job = self._selected_job()
+        text = self.log_pane.text
+        if reset or job is not self._shown_job:
+            text.clear()
+            self._shown_job = job
+            self._shown_lines = 0
+        if job is None:
+            self.log_pane.show_progress(None)
+            return
+        self.log_pane.show_progress(job.progress)
+        records, self._shown_lines = job.tail(self._shown_lines)
+        if records:
+            text.append(records)
+
+    def _ticked(self):
+        self._tick = None
+        self._refresh()
+
+    def _refresh(self):
+        known = set(self.tree.get_children())
+        current = set()
+        for job in self.jobs.jobs:
+            iid = str(job.id)
+            current.add(iid)
+            p = job.progress
+            status = job.status
+            if status == "running" and p.stalled():
+                status = "stalled"
+            values = (
+                job.id,
+                job.label,
+                status,
+                "" if p.percent is None else f"{p.percent:.1f}%",
+                "" if p.fps is None else f"{p.fps:.1f}",
+                "" if p.speed is None else f"{p.speed:.2f}x",
+                "" if p.eta is None or not job.active else format_hms(p.eta),
+                "" if job.returncode is None else job.returncode,
+            )
+            if iid in known:
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert("", "end", iid=iid, values=values)
+        for iid in known - current:
+            self.tree.delete(iid)
+        self._show_selected()
+        if self._tick is None and any(job.active for job in self.jobs.jobs):
+            self._tick = self.after(1000, self._ticked)
+
+class PresetStore:
+    """Presets in SQLite, one row per (preset name, tab), so one tab's
+    settings load without reading the others and every save is a single
+    transaction (a crash mid-write cannot damage other presets).
+
+    The JSON file of earlier versions is imported the first time the store
+    is opened; the file itself is left alone.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS presets (
+            name TEXT NOT NULL,
+            tab TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated REAL NOT NULL,
+            PRIMARY KEY (name, tab)
+        );
+        CREATE INDEX IF NOT EXISTS presets_by_tab ON presets (tab, name);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS watch_folders (folder TEXT PRIMARY KEY, data TEXT NOT NULL);
+    """
+
+    def __init__(self, path=DEFAULT_PRESET_FILE, legacy_json=None):
+        self.path = path
+        self.legacy_json = legacy_json
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            make_parent(self.path)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+            self._db = db
+            self._import_legacy()
+        return self._db
+
+    def _import_legacy(self):
+        db = self._db
+        if not self.legacy_json or not os.path.isfile(self.legacy_json):
+            return
+        if db.execute("SELECT 1 FROM meta WHERE key = 'imported_json'").fetchone():
+            return
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Preset import from {self.legacy_json} failed: {e}")
+            return
+        now = time.time()
+        rows = [(name, tab, json.dumps(section), now)
+                for name, preset in data.items() if isinstance(preset, dict)
+                for tab, section in preset.items() if isinstance(section, dict)]
+        with db:
+            db.executemany("INSERT OR IGNORE INTO presets VALUES (?, ?, ?, ?)", rows)
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('imported_json', ?)", (os.path.abspath(self.legacy_json),))
+        print(f"Imported {len(rows)} preset sections from {self.legacy_json}")
+
+    def find(self, text="", tab=None, limit=500):
+        """[(name, tab, updated)] whose name contains ``text`` (any case)."""
+        pattern = "%" + re.sub(r"([%_\\])", r"\\\1", text or "") + "%"
+        sql = "SELECT name, tab, updated FROM presets WHERE name LIKE ? ESCAPE '\\'"
+        args = [pattern]
+        if tab:
+            sql += " AND tab = ?"
+            args.append(tab)
+        sql += " ORDER BY name COLLATE NOCASE, tab LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return self._conn().execute(sql, args).fetchall()
+
+    def names(self, text="", tab=None):
+        """{name: [tabs]} of the presets matching ``text`` / ``tab``."""
+        result = {}
+        for name, t, _ in self.find(text, tab, limit=-1):
+            result.setdefault(name, []).append(t)
+        return result
+
+    def get(self, name, tab=None):
+        """{tab: settings} of a preset (only ``tab`` if given); {} if missing."""
+        sql, args = "SELECT tab, data FROM presets WHERE name = ?", [name]
+        if tab:
+            sql += " AND tab = ?"
+            args.append(tab)
+        with self._lock:
+            rows = self._conn().execute(sql, args).fetchall()
+        return {t: json.loads(data) for t, data in rows}
+
+    def save(self, name, state):
+        """Store {tab: settings} under ``name``, replacing those tabs only."""
+        if not name:
+            raise ValueError("Preset name is empty")
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO presets VALUES (?, ?, ?, ?)",
+                               [(name, tab, json.dumps(section), now) for tab, section in state.items()])
+
+    def delete(self, name, tab=None):
+        sql, args = "DELETE FROM presets WHERE name = ?", [name]
+        if tab:
+            sql += " AND tab = ?"
+            args.append(tab)
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute(sql, args)
+
+    def watch_folders(self):
+        """Watch-folder entries (dicts, see FolderWatcher) in folder order."""
+        with self._lock:
+            rows = self._conn().execute("SELECT data FROM watch_folders ORDER BY folder").fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def set_watch_folders(self, entries):
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM watch_folders")
+                db.executemany("INSERT OR REPLACE INTO watch_folders VALUES (?, ?)",
+                               [(os.path.abspath(e["folder"]), json.dumps(e)) for e in entries])
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def open_presets(path=DEFAULT_PRESET_FILE):
+    """PresetStore for ``path``. A .json path (older versions) is imported
+    into a .db file next to it; a .db path imports its .json sibling. The
+    default store starts as a copy of a tool_gui_presets.db in the working
+    folder, where older versions kept it (and imports the .json next to that)."""
+    if path == DEFAULT_PRESET_FILE and not os.path.exists(path):
+        if os.path.isfile(LEGACY_PRESET_FILE):
+            try:
+                make_parent(path)
+                old, new = sqlite3.connect(LEGACY_PRESET_FILE), sqlite3.connect(path)
+                try:
+                    old.backup(new)
+                finally:
+                    old.close()
+                    new.close()
+                print(f"Copied presets from {os.path.abspath(LEGACY_PRESET_FILE)} to {path}")
+            except (OSError, sqlite3.Error) as e:
+                print(f"Presets in {LEGACY_PRESET_FILE} not copied: {e}")
+        return PresetStore(path, legacy_json=os.path.splitext(LEGACY_PRESET_FILE)[0] + ".json")
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == ".json":
+        return PresetStore(stem + ".db", legacy_json=path)
+    return PresetStore(path, legacy_json=stem + ".json")
+
+class PresetPicker(tk.Toplevel):
+    """Searchable preset list. Loading applies the selected rows' tabs only,
+    so a per-tab preset leaves the other tabs as they are."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.store = app.preset_store
+        self._rows = []
+        self._after = None
+        self._seq = 0  # newest refresh; older results are dropped
+        self.title("Presets")
+        self.geometry("560x400")
+
+        bar = ttk.Frame(self)
+        bar.pack(fill="x", padx=6, pady=4)
+        ttk.Label(bar, text="Search:").pack(side="left")
+        self.search = tk.StringVar()
+        entry = ttk.Entry(bar, textvariable=self.search, width=28)
+        entry.pack(side="left", padx=4)
+        ttk.Label(bar, text="Tab:").pack(side="left")
+        self.tab = tk.StringVar(value="all")
+        ttk.Combobox(bar, textvariable=self.tab, values=["all"] + [k for k, _, _ in app.TAB_SPECS],
+                     width=10, state="readonly").pack(side="left", padx=4)
+
+        self.tree = ttk.Treeview(self, columns=("name", "tab", "updated"), show="headings")
+        for col, title, width in (("name", "Preset", 260), ("tab", "Tab", 80), ("updated", "Saved", 130)):
+            self.tree.heading(col, text=title)
+            self.tree.column(col, width=width, anchor="w", stretch=(col == "name"))
+        self.tree.pack(fill="both", expand=True, padx=6)
+
+        btns = ttk.Frame(self)
+        btns.pack(fill="x", padx=6, pady=6)
+        ttk.Button(btns, text="Load", command=self.load, style="Primary.TButton").pack(side="left")
+        ttk.Button(btns, text="Delete", command=self.delete).pack(side="left", padx=6)
+        ttk.Button(btns, text="Close", command=self.destroy).pack(side="right")
+
+        self.search.trace_add("write", lambda *a: self._schedule())
+        self.tab.trace_add("write", lambda *a: self._schedule())
+        self.tree.bind("<Double-1>", lambda e: self.load())
+        entry.bind("<Return>", lambda e: self.load())
+        entry.bind("<Down>", lambda e: self.tree.focus_set())
+        entry.focus_set()
+        self.refresh()
+
+    def _schedule(self):
+        if self._after is not None:
+            self.after_cancel(self._after)
+        self._after = self.after(150, self.refresh)
+
+    def refresh(self):
+        self._after = None
+        self._seq += 1
+        seq = self._seq
+        tab = self.tab.get()
+        when_done(self, FS.submit(self.store.find, self.search.get(), None if tab == "all" else tab),
+                  lambda rows: self._show(seq, rows), on_error=self._failed)
+
+    def _failed(self, error):
+        messagebox.showerror("Presets", str(error), parent=self)
+
+    def _show(self, seq, rows):
+        if seq != self._seq:  # the search changed while this one ran
+            return
+        self.tree.delete(*self.tree.get_children())
+        self._rows = rows
+        for i, (name, t, updated) in enumerate(rows):
+            self.tree.insert("", "end", iid=str(i),
+                             values=(name, t, time.strftime("%Y-%m-%d %H:%M", time.localtime(updated))))
+        if rows:
+            self.tree.selection_set("0")
+
+    def _selected(self):
+        return [self._rows[int(iid)] for iid in self.tree.selection()]
+
+    def load(self):
+        rows = self._selected()
+        if rows:
+            when_done(self, FS.submit(self._read, rows), self._apply, on_error=self._failed)
+
+    def _read(self, rows):
+        state = {}
+        for name, tab, _ in rows:
+            state.update(self.store.get(name, tab))
+        return state
+
+    def _apply(self, state):
+        if not state:
+            return
+        self.app.apply_state(state)
+        self.destroy()
+
+    def delete(self):
+        rows = self._selected()
+        if not rows:
+            return
+        what = ", ".join(f"{name} ({tab})" for name, tab, _ in rows[:5]) + (" ..." if len(rows) > 5 else "")
+        if not messagebox.askyesno("Presets", f"Delete {what}?", parent=self):
+            return
+        when_done(self, FS.submit(lambda: [self.store.delete(name, tab) for name, tab, _ in rows]),
+                  lambda _: self.refresh(), on_error=self._failed)
 
 class App(tk.Tk):
+    # Tool tabs, built the first time they are selected: (key, class, title)
+    TAB_SPECS = (
+        ("dovi", DoviToolTab, "Dolby Vision (dovi_tool)"),
+        ("mp4", Mp4MuxerTab, "MP4 Muxer (mp4muxer)"),
+        ("mkv", MKVToolNixTab, "Matroska (MKVToolNix)"),
+        ("ffmpeg", FFmpegTab, "FFmpeg"),
+        ("pipeline", PipelineTab, "DV Pipeline"),
+    )
+    # exe name -> (tab key, PathPicker attribute) for auto-populating paths
+    TOOL_PICKERS = {
+        "dovi_tool": ("dovi", "path_picker"),
+        "mp4muxer": ("mp4", "path_picker"),
+        "ffmpeg": ("ffmpeg", "path_picker"),
+        "mkvmerge": ("mkv", "mkvmerge"),
+        "mkvextract": ("mkv", "mkvextract"),
+        "mkvinfo": ("mkv", "mkvinfo"),
+        "mkvpropedit": ("mkv", "mkvpropedit"),
+    }
+
     def __init__(self):
-        super().__init__()
+        # Tool discovery runs in the background while the window is built
+        TOOL_DISCOVERY.start()
+        with PROFILER.phase("tk init"):
+            super().__init__()
+        build_start = time.perf_counter()
         self.title(APP_TITLE)
         self.geometry("1100x700")
         self.minsize(980, 620)
-        # ------------------------------------------------------------------
-        # Window icon setup
-        # Priority (Windows): app.ico -> favicon.ico -> PNG set via iconphoto
-        # On other platforms: PNG set via iconphoto (multi-resolution hint)
-        # Keep references so they are not garbage collected.
-        # ------------------------------------------------------------------
+        self.startup_ms = None
         self._icon_images = []
-        try:
-            debug_icons = os.environ.get("DEBUG_ICONS", "0") == "1"
-            def dbg(msg):
-                if debug_icons:
-                    print(f"[ICON] {msg}")
-
-            if os.name == 'nt':  # Prefer .ico for proper taskbar representation
-                for candidate in ('app.ico', 'favicon.ico'):
-                    p = resource_path(candidate)
-                    dbg(f"Checking ICO: {p} exists={os.path.exists(p)}")
-                    if os.path.exists(p):
-                        try:
-                            self.iconbitmap(p)
-                            dbg(f"Loaded ICO: {p}")
-                            break
-                        except Exception as e:
-                            dbg(f"Failed ICO load {p}: {e}")
-            # PNG fallbacks / multi-size stacking (works cross-platform & alt-tab on some WMs)
-            png_candidates = [
-                'apple-touch-icon.png',   # 180x180
-                'favicon-256.png',        # Optional 256x256 if provided
-                'favicon-128.png',        # Optional 128x128
-                'favicon-64.png',         # Optional 64x64
-                'favicon-48.png',         # Optional 48x48
-                'favicon-32x32.png',      # 32x32
-                'favicon-16x16.png',      # 16x16
-            ]
-            for fn in png_candidates:
-                p = resource_path(fn)
-                if os.path.exists(p):
-                    try:
-                        img = tk.PhotoImage(file=p)
-                        self._icon_images.append(img)
-                        dbg(f"Loaded PNG: {p} size={img.width()}x{img.height()}")
-                    except Exception as e:
-                        dbg(f"Failed PNG load {p}: {e}")
-            if self._icon_images:
-                # True applies to this window and future toplevels
-                self.iconphoto(True, *self._icon_images)
-                dbg(f"Applied {len(self._icon_images)} PNG icon(s)")
-            else:
-                dbg("No PNG icons loaded")
-        except Exception as e:
-            # Silently ignore icon issues to avoid crashing the GUI, but optional debug
-            if os.environ.get("DEBUG_ICONS") == "1":
-                print(f"[ICON] Exception: {e}")
+        if os.name == 'nt':
+            # .ico is cheap (no decoding in Python) and gives the taskbar icon from the start
+            self._load_ico()
+        # PNG icons are decoded after the first paint (see _on_first_map)
+        self.bind("<Map>", self._on_first_map, add="+")
 
         # Theme / style setup
         self.style = ttk.Style()
@@ -1054,29 +6308,40 @@ class App(tk.Tk):
 
         nb = ttk.Notebook(top)
         nb.pack(fill="both", expand=True)
+        self.nb = nb
 
         # Shared log pane
         log_pane = LogPane(self)
         log_pane.pack(fill="both", expand=False, padx=6, pady=6)
         dummy_btn = ttk.Button(self, text="Run")
         dummy_cancel = ttk.Button(self, text="Cancel")
-        self.runner = AsyncRunner(log_pane.text, dummy_btn, dummy_cancel)
-
-        self.dovi_tab = DoviToolTab(nb, self.runner)
-        self.mp4_tab = Mp4MuxerTab(nb, self.runner)
-        self.mkv_tab = MKVToolNixTab(nb, self.runner)
-        self.ffmpeg_tab = FFmpegTab(nb, self.runner)
-
-        nb.add(self.dovi_tab, text="Dolby Vision (dovi_tool)")
-        nb.add(self.mp4_tab, text="MP4 Muxer (mp4muxer)")
-        nb.add(self.mkv_tab, text="Matroska (MKVToolNix)")
-        nb.add(self.ffmpeg_tab, text="FFmpeg")
+        self.runner = AsyncRunner(log_pane.text, dummy_btn, dummy_cancel, progress_view=log_pane)
+        self.jobs = JobQueue()
+        self.jobs.use_agents(*agents_from_env())
+        self.jobs.use_build_cache(BuildCache())
+        self.runner.jobs = self.jobs
+        self.preset_store = open_presets()
+        self.watcher = None
+
+        # Placeholder frame per tool tab; the real tab is built on first selection
+        self._tabs = {}
+        self._tab_frames = {}
+        self._pending_state = {}
+        for key, _, title in self.TAB_SPECS:
+            self._tab_frames[key] = ttk.Frame(nb)
+            nb.add(self._tab_frames[key], text=title)
+        self.jobs_tab = JobsPane(nb, self.jobs)
+        nb.add(self.jobs_tab, text="Job Queue")
+        nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        # The initial selection happened before the binding existed
+        self.after_idle(self._on_tab_changed)
 
         # Menus
         menubar = tk.Menu(self)
         filem = tk.Menu(menubar, tearoff=0)
-        filem.add_command(label="Load presets", command=self.load_presets)
-        filem.add_command(label="Save presets", command=self.save_presets)
+        filem.add_command(label="Load preset...", command=self.load_presets)
+        filem.add_command(label="Save preset (all tabs)...", command=self.save_presets)
+        filem.add_command(label="Save preset (this tab)...", command=self.save_tab_preset)
         filem.add_separator()
         filem.add_command(label="Exit", command=self.destroy)
         menubar.add_cascade(label="File", menu=filem)
@@ -1085,17 +6350,151 @@ class App(tk.Tk):
         for name in THEMES.keys():
             themem.add_radiobutton(label=name, value=name, variable=self.theme_var, command=self._theme_changed)
         menubar.add_cascade(label="Theme", menu=themem)
+        viewm = tk.Menu(menubar, tearoff=0)
+        self.log_overwrite_cr = tk.BooleanVar(value=True)
+        viewm.add_checkbutton(label="Overwrite progress lines (CR)", variable=self.log_overwrite_cr, command=self._log_settings_changed)
+        viewm.add_command(label="Log line limit...", command=self._ask_log_limit)
+        menubar.add_cascade(label="View", menu=viewm)
         toolsm = tk.Menu(menubar, tearoff=0)
-        toolsm.add_command(label="Check external tools", command=self.check_external_tools)
+        toolsm.add_command(label="Check external tools", command=lambda: self.check_external_tools(refresh=True))
+        toolsm.add_command(label="Worker agents...", command=self._ask_agents)
+        toolsm.add_command(label="Watch folders...", command=lambda: WatchFoldersWindow(self))
         menubar.add_cascade(label="Tools", menu=toolsm)
         self.config(menu=menubar)
 
-        self.presets = load_presets()
         self.apply_theme(self.current_theme)
+        PROFILER.record("window build", build_start)
+        self.after_idle(self._load_preset_file)
         # Defer tool check until mainloop idle so window appears quickly
         self.after(250, self.check_external_tools)
-        # ---------------- External Tools Check -----------------
-    def check_external_tools(self):
+
+    def _load_preset_file(self):
+        # Opens the database (and imports the old JSON file on first use) on a
+        # worker thread: the presets file may sit on a network share
+        FS.submit(self._open_preset_store)
+
+    def _open_preset_store(self):
+        with PROFILER.phase("preset load"):
+            try:
+                self.preset_store.find(limit=1)
+            except sqlite3.Error as e:
+                print(f"Preset store {self.preset_store.path}: {e}")
+
+    # ---------------- Window icons -----------------
+    # Priority (Windows): app.ico -> favicon.ico -> PNG set via iconphoto
+    # On other platforms: PNG set via iconphoto (multi-resolution hint)
+    # Keep references so they are not garbage collected.
+    def _icon_debug(self, msg):
+        if os.environ.get("DEBUG_ICONS", "0") == "1":
+            print(f"[ICON] {msg}")
+
+    def _load_ico(self):
+        with PROFILER.phase("icon load (ico)"):
+            self._load_ico_files()
+
+    def _load_ico_files(self):
+        dbg = self._icon_debug
+        for candidate in ('app.ico', 'favicon.ico'):  # Prefer .ico for proper taskbar representation
+            p = resource_path(candidate)
+            dbg(f"Checking ICO: {p} exists={os.path.exists(p)}")
+            if os.path.exists(p):
+                try:
+                    self.iconbitmap(p)
+                    dbg(f"Loaded ICO: {p}")
+                    break
+                except Exception as e:
+                    dbg(f"Failed ICO load {p}: {e}")
+
+    def _load_png_icons(self):
+        with PROFILER.phase("icon load (png)"):
+            self._load_png_files()
+
+    def _load_png_files(self):
+        dbg = self._icon_debug
+        try:
+            # PNG fallbacks / multi-size stacking (works cross-platform & alt-tab on some WMs)
+            png_candidates = [
+                'apple-touch-icon.png',   # 180x180
+                'favicon-256.png',        # Optional 256x256 if provided
+                'favicon-128.png',        # Optional 128x128
+                'favicon-64.png',         # Optional 64x64
+                'favicon-48.png',         # Optional 48x48
+                'favicon-32x32.png',      # 32x32
+                'favicon-16x16.png',      # 16x16
+            ]
+            for fn in png_candidates:
+                p = resource_path(fn)
+                if os.path.exists(p):
+                    try:
+                        img = tk.PhotoImage(file=p)
+                        self._icon_images.append(img)
+                        dbg(f"Loaded PNG: {p} size={img.width()}x{img.height()}")
+                    except Exception as e:
+                        dbg(f"Failed PNG load {p}: {e}")
+            if self._icon_images:
+                # True applies to this window and future toplevels
+                self.iconphoto(True, *self._icon_images)
+                dbg(f"Applied {len(self._icon_images)} PNG icon(s)")
+            else:
+                dbg("No PNG icons loaded")
+        except Exception as e:
+            # Silently ignore icon issues to avoid crashing the GUI, but optional debug
+            dbg(f"Exception: {e}")
+
+    # ---------------- Startup -----------------
+    def _on_first_map(self, event):
+        if event.widget is not self or self.startup_ms is not None:
+            return
+        self.startup_ms = (time.perf_counter() - APP_START) * 1000
+        PROFILER.mark("first window", self.startup_ms)
+        budget = startup_budget_ms()
+        if self.startup_ms > budget:
+            print(f"Startup: first window after {self.startup_ms:.0f} ms (budget {budget} ms)")
+        # Let the first paint happen before decoding icons
+        self.after(100, self._load_png_icons)
+
+    # ---------------- Tabs -----------------
+    def tab(self, key):
+        """Return the tool tab for key, building it on first use."""
+        tab = self._tabs.get(key)
+        if tab is None:
+            cls = {k: c for k, c, _ in self.TAB_SPECS}[key]
+            with PROFILER.phase(f"tab construction: {key}"):
+                tab = cls(self._tab_frames[key], self.runner, self.jobs)
+            tab.pack(fill="both", expand=True)
+            self._tabs[key] = tab
+            if key in self._pending_state:
+                tab.set_state(self._pending_state.pop(key))
+            self._apply_recursive_widget_palette(tab, THEMES[self.current_theme])
+        return tab
+
+    def tool_path(self, name):
+        """Tool path from a built tab's picker when set, else the discovered one."""
+        key, attr = self.TOOL_PICKERS.get(name, (None, None))
+        tab = self._tabs.get(key)
+        if tab is not None:
+            path = getattr(tab, attr).var.get().strip()
+            if path:
+                return path
+        found = TOOL_DISCOVERY.peek()  # find_exe() would wait for discovery
+        if found is None:
+            raise ValueError("Still looking for the external tools; try again in a moment")
+        return found.get(name)
+
+    def _on_tab_changed(self, event=None):
+        selected = self.nb.select()
+        for key, frame in self._tab_frames.items():
+            if str(frame) == selected:
+                self.tab(key)
+
+    dovi_tab = property(lambda self: self.tab("dovi"))
+    mp4_tab = property(lambda self: self.tab("mp4"))
+    mkv_tab = property(lambda self: self.tab("mkv"))
+    ffmpeg_tab = property(lambda self: self.tab("ffmpeg"))
+    pipeline_tab = property(lambda self: self.tab("pipeline"))
+
+    # ---------------- External Tools Check -----------------
+    def check_external_tools(self, refresh=False):
         """Verify required external command-line tools exist; prompt user if missing."""
         # (exe_name, friendly, url)
         tools = [
@@ -1108,29 +6507,26 @@ class App(tk.Tk):
             ("ffmpeg", "FFmpeg", "https://ffmpeg.org/download.html"),
         ]
 
+        if refresh:
+            TOOL_DISCOVERY.start(refresh=True)
+        found = TOOL_DISCOVERY.peek()
+        if found is None:
+            # Discovery still running in the background; look again shortly
+            self.after(100, self.check_external_tools)
+            return
+
         missing = []
         found_any = False
         for exe, friendly, url in tools:
-            # Attempt to locate;
-            located = find_exe(exe)
+            located = found.get(exe)
             if located:
                 found_any = True
-                # Auto-populate path pickers if empty
+                # Auto-populate path pickers if empty (tabs not built yet fill themselves on build)
                 try:
-                    if exe == "dovi_tool" and not self.dovi_tab.path_picker.var.get():
-                        self.dovi_tab.path_picker.var.set(located)
-                    elif exe == "mp4muxer" and not self.mp4_tab.path_picker.var.get():
-                        self.mp4_tab.path_picker.var.set(located)
-                    elif exe == "ffmpeg" and not self.ffmpeg_tab.path_picker.var.get():
-                        self.ffmpeg_tab.path_picker.var.set(located)
-                    elif exe == "mkvmerge" and not self.mkv_tab.mkvmerge.var.get():
-                        self.mkv_tab.mkvmerge.var.set(located)
-                    elif exe == "mkvextract" and not self.mkv_tab.mkvextract.var.get():
-                        self.mkv_tab.mkvextract.var.set(located)
-                    elif exe == "mkvinfo" and not self.mkv_tab.mkvinfo.var.get():
-                        self.mkv_tab.mkvinfo.var.set(located)
-                    elif exe == "mkvpropedit" and not self.mkv_tab.mkvpropedit.var.get():
-                        self.mkv_tab.mkvpropedit.var.set(located)
+                    key, attr = self.TOOL_PICKERS[exe]
+                    tab = self._tabs.get(key)
+                    if tab is not None and not getattr(tab, attr).var.get():
+                        getattr(tab, attr).var.set(located)
                 except Exception:
                     pass
             else:
@@ -1183,6 +6579,95 @@ class App(tk.Tk):
         win.minsize(520, 300)
         win.focus_set()
 
+    # ---------------- Log settings -----------------
+    def _log_views(self):
+        return [self.runner.text, self.jobs_tab.log_pane.text]
+
+    def _log_settings_changed(self):
+        for view in self._log_views():
+            view.overwrite_cr = self.log_overwrite_cr.get()
+
+    def _ask_log_limit(self):
+        current = self.runner.text.max_lines
+        n = simpledialog.askinteger("Log line limit", "Maximum lines kept in each log view (0 = unlimited):",
+                                    initialvalue=current, minvalue=0, parent=self)
+        if n is None:
+            return
+        for view in self._log_views():
+            view.max_lines = n
+
+    # ---------------- Worker agents -----------------
+    def _ask_agents(self):
+        current = ", ".join(f"{h}:{p}" for h, p in self.jobs.agents)
+        text = simpledialog.askstring("Worker agents", "Agents for queued jobs, host:port separated by commas\n"
+                                      "(empty = run jobs on this machine):", initialvalue=current, parent=self)
+        if text is None:
+            return
+        maps = ";".join(f"{a}={b}" for a, b in self.jobs.path_maps)
+        maps = simpledialog.askstring("Worker agents", "Path mappings FROM=TO separated by ';'\n"
+                                      "(how the agents see this machine's files):", initialvalue=maps, parent=self)
+        if maps is None:
+            return
+        try:
+            agents = [parse_address(a) for a in text.split(",") if a.strip()]
+        except ValueError:
+            messagebox.showerror("Worker agents", f"Invalid agent address list: {text}")
+            return
+        self.jobs.use_agents(agents, parse_path_maps([maps]), self.jobs.agent_token)
+
+        def show(statuses):
+            for address in agents:
+                st = statuses.get(address)
+                state = f"{st['running']}/{st['slots']} busy, {st['queued']} queued" if st else "not reachable"
+                self.runner.log(f"Agent {address[0]}:{address[1]}: {state}")
+
+        # Connects to every agent (DNS + connect timeout each): not on the Tk thread
+        when_done(self, FS.submit(agent_statuses, agents, self.jobs.agent_token), show,
+                  lambda e: self.runner.log(f"Agent status query failed: {e}"))
+
+    # ---------------- Watch folders -----------------
+    def start_watching(self, entries, process_existing=False, on_done=None):
+        """Checks the entries and scans the folders on a worker thread (they
+        may be network shares); on_done(error or None) runs on the Tk thread."""
+        self.stop_watching()
+        watcher = FolderWatcher(entries, lambda entry, path: watch_ingest(entry, path, self.jobs, self.preset_store, watcher),
+                                process_existing)
+        self.watcher = watcher
+
+        def start():
+            for entry in entries:
+                check_watch_entry(entry, self.preset_store)
+            watcher.start()
+
+        def started(_):
+            if watcher is not self.watcher:  # stopped while the folders were scanned
+                watcher.stop()
+            if on_done is not None:
+                on_done(None)
+
+        def failed(error):
+            if watcher is self.watcher:
+                self.watcher = None
+            if on_done is not None:
+                on_done(error)
+            else:
+                self.runner.log(f"[watch] {error}")
+
+        when_done(self, FS.submit(start), started, on_error=failed, timeout=None)
+        self._drain_watch_messages(watcher)
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.runner.log("[watch] stopped")
+            self.watcher = None
+
+    def _drain_watch_messages(self, watcher):
+        while watcher.messages:
+            self.runner.log("[watch] " + watcher.messages.popleft())
+        if watcher is self.watcher:
+            self.after(1000, self._drain_watch_messages, watcher)
+
     # ---------------- Theming -----------------
     def _theme_changed(self):
         self.apply_theme(self.theme_var.get())
@@ -1263,158 +6748,747 @@ class App(tk.Tk):
             self._apply_recursive_widget_palette(child, theme)
 
     def gather_state(self):
-        state = {
-            "dovi": {
-                "path": self.dovi_tab.path_picker.var.get(),
-                "subcmd": self.dovi_tab.subcmd.get(),
-                "in": self.dovi_tab.in_file.var.get(),
-                "out": self.dovi_tab.out_file.var.get(),
-                "rpu_in": self.dovi_tab.rpu_in.var.get(),
-                "rpu_out": self.dovi_tab.rpu_out.var.get(),
-                "mode": self.dovi_tab.mode.get(),
-                "crop": self.dovi_tab.crop.get(),
-                "drop_hdr10p": self.dovi_tab.drop_hdr10p.get(),
-                "edit_cfg": self.dovi_tab.edit_cfg.var.get(),
-                "start_code": self.dovi_tab.start_code.get(),
-                "extra": self.dovi_tab.extra.get(),
-            },
-            "mp4": {
-                "path": self.mp4_tab.path_picker.var.get(),
-                "out": self.mp4_tab.out_file.var.get(),
-                "dv_profile": self.mp4_tab.dv_profile.get(),
-                "dv_bl_compat": self.mp4_tab.dv_bl_compat.get(),
-                "brands": self.mp4_tab.brands.get(),
-                "hvc1flag": self.mp4_tab.hvc1flag.get(),
-                "dvh1flag": self.mp4_tab.dvh1flag.get(),
-                "overwrite": self.mp4_tab.overwrite.get(),
-                "extra": self.mp4_tab.extra.get(),
-                "inputs": [
-                    {
-                        "file": fp.var.get(),
-                        "lang": lang.get(),
-                        "tscale": tscale.get(),
-                        "fr": fr.get(),
-                    }
-                    for (fp, lang, tscale, fr) in self.mp4_tab.inputs
-                ]
-            },
-            "mkv": {
-                "mkvmerge": self.mkv_tab.mkvmerge.var.get(),
-                "mkvextract": self.mkv_tab.mkvextract.var.get(),
-                "mkvinfo": self.mkv_tab.mkvinfo.var.get(),
-                "mkvpropedit": self.mkv_tab.mkvpropedit.var.get(),
-                "tool": self.mkv_tab.tool.get(),
-                "src": self.mkv_tab.src.var.get(),
-                "out": self.mkv_tab.out.var.get(),
-                "args": self.mkv_tab.args.get(),
-            },
-            "ffmpeg": {
-                "path": self.ffmpeg_tab.path_picker.var.get(),
-                "operation": self.ffmpeg_tab.operation.get(),
-                "input": self.ffmpeg_tab.input_file.var.get(),
-                "input2": self.ffmpeg_tab.input2_file.var.get(),
-                "output": self.ffmpeg_tab.output_file.var.get(),
-                "video_codec": self.ffmpeg_tab.video_codec.get(),
-                "quality": self.ffmpeg_tab.quality.get(),
-                "resolution": self.ffmpeg_tab.resolution.get(),
-                "audio_codec": self.ffmpeg_tab.audio_codec.get(),
-                "audio_bitrate": self.ffmpeg_tab.audio_bitrate.get(),
-                "preset": self.ffmpeg_tab.preset.get(),
-                "custom_cmd": self.ffmpeg_tab.custom_cmd.get(),
-            }
-        }
+        """{tab: settings} of the tabs built so far, plus the loaded settings
+        still waiting for a tab that was never opened. Does not build tabs."""
+        state = {}
+        for key, _, _ in self.TAB_SPECS:
+            if key in self._tabs:
+                state[key] = self._tabs[key].get_state()
+            elif key in self._pending_state:
+                state[key] = dict(self._pending_state[key])
         return state
 
     def apply_state(self, state):
+        """Apply {tab: settings}; tabs missing from ``state`` are left alone."""
         try:
-            d = state.get("dovi", {})
-            self.dovi_tab.path_picker.var.set(d.get("path", ""))
-            self.dovi_tab.subcmd.set(d.get("subcmd", "extract-rpu"))
-            self.dovi_tab.in_file.var.set(d.get("in", ""))
-            self.dovi_tab.out_file.var.set(d.get("out", ""))
-            self.dovi_tab.rpu_in.var.set(d.get("rpu_in", ""))
-            self.dovi_tab.rpu_out.var.set(d.get("rpu_out", ""))
-            self.dovi_tab.mode.set(d.get("mode", ""))
-            self.dovi_tab.crop.set(bool(d.get("crop", False)))
-            self.dovi_tab.drop_hdr10p.set(bool(d.get("drop_hdr10p", False)))
-            self.dovi_tab.edit_cfg.var.set(d.get("edit_cfg", ""))
-            self.dovi_tab.start_code.set(d.get("start_code", ""))
-            self.dovi_tab.extra.set(d.get("extra", ""))
-
-            m = state.get("mp4", {})
-            self.mp4_tab.path_picker.var.set(m.get("path", ""))
-            self.mp4_tab.out_file.var.set(m.get("out", ""))
-            self.mp4_tab.dv_profile.set(m.get("dv_profile", ""))
-            self.mp4_tab.dv_bl_compat.set(m.get("dv_bl_compat", ""))
-            self.mp4_tab.brands.set(m.get("brands", "mp42,iso6,isom,msdh,dby1"))
-            self.mp4_tab.hvc1flag.set(bool(m.get("hvc1flag", False)))
-            self.mp4_tab.dvh1flag.set(bool(m.get("dvh1flag", False)))
-            self.mp4_tab.overwrite.set(bool(m.get("overwrite", True)))
-            self.mp4_tab.extra.set(m.get("extra", ""))
-            # reset inputs
-            for child in self.mp4_tab.in_frame.winfo_children():
-                child.destroy()
-            self.mp4_tab.inputs = []
-            for it in m.get("inputs", []):
-                self.mp4_tab._add_input_row()
-                fp, lang, tscale, fr = self.mp4_tab.inputs[-1]
-                fp.var.set(it.get("file", ""))
-                lang.set(it.get("lang", ""))
-                tscale.set(it.get("tscale", ""))
-                fr.set(it.get("fr", ""))
-
-            k = state.get("mkv", {})
-            self.mkv_tab.mkvmerge.var.set(k.get("mkvmerge", ""))
-            self.mkv_tab.mkvextract.var.set(k.get("mkvextract", ""))
-            self.mkv_tab.mkvinfo.var.set(k.get("mkvinfo", ""))
-            self.mkv_tab.mkvpropedit.var.set(k.get("mkvpropedit", ""))
-            self.mkv_tab.tool.set(k.get("tool", "mkvmerge"))
-            self.mkv_tab.src.var.set(k.get("src", ""))
-            self.mkv_tab.out.var.set(k.get("out", ""))
-            self.mkv_tab.args.set(k.get("args", ""))
-
-            f = state.get("ffmpeg", {})
-            self.ffmpeg_tab.path_picker.var.set(f.get("path", ""))
-            self.ffmpeg_tab.operation.set(f.get("operation", "convert"))
-            self.ffmpeg_tab.input_file.var.set(f.get("input", ""))
-            self.ffmpeg_tab.input2_file.var.set(f.get("input2", ""))
-            self.ffmpeg_tab.output_file.var.set(f.get("output", ""))
-            self.ffmpeg_tab.video_codec.set(f.get("video_codec", ""))
-            self.ffmpeg_tab.quality.set(f.get("quality", ""))
-            self.ffmpeg_tab.resolution.set(f.get("resolution", ""))
-            self.ffmpeg_tab.audio_codec.set(f.get("audio_codec", ""))
-            self.ffmpeg_tab.audio_bitrate.set(f.get("audio_bitrate", ""))
-            self.ffmpeg_tab.preset.set(f.get("preset", ""))
-            self.ffmpeg_tab.custom_cmd.set(f.get("custom_cmd", ""))
-
+            for key, _, _ in self.TAB_SPECS:
+                if key not in state:
+                    continue
+                if key in self._tabs:
+                    self._tabs[key].set_state(state.get(key, {}))
+                else:
+                    self._pending_state[key] = state.get(key, {})
         except Exception as e:
             messagebox.showerror("Apply presets", str(e))
 
     def load_presets(self):
-        data = load_presets()
-        if not data:
-            messagebox.showinfo("Presets", "No presets found.")
-            return
-        # pick first by default or prompt selection
-        names = list(data.keys())
-        name = tk.simpledialog.askstring("Load preset", f"Available: {', '.join(names)}\nEnter name:")
+        PresetPicker(self)
+
+    def current_tab_key(self):
+        selected = self.nb.select()
+        for key, frame in self._tab_frames.items():
+            if str(frame) == selected:
+                return key
+        return None
+
+    def _save_preset(self, state, what):
+        name = tk.simpledialog.askstring("Save preset", f"Preset name ({what}):")
         if not name:
             return
-        if name not in data:
-            messagebox.showerror("Presets", f"Preset '{name}' not found.")
+        when_done(self, FS.submit(self.preset_store.get, name, next(iter(state)) if len(state) == 1 else None),
+                  lambda existing: self._confirm_save(name, state, what, existing),
+                  on_error=lambda e: messagebox.showerror("Save preset", str(e)))
+
+    def _confirm_save(self, name, state, what, existing):
+        if existing and not messagebox.askyesno("Save preset", f"Preset '{name}' exists. Replace its {what} settings?"):
             return
-        self.apply_state(data[name])
+        when_done(self, FS.submit(self.preset_store.save, name, state),
+                  lambda _: messagebox.showinfo("Presets", f"Saved preset '{name}' ({what})."),
+                  on_error=lambda e: messagebox.showerror("Save preset", str(e)))
 
     def save_presets(self):
-        name = tk.simpledialog.askstring("Save preset", "Enter preset name:")
-        if not name:
+        self._save_preset(self.gather_state(), "all tabs")
+
+    def save_tab_preset(self):
+        key = self.current_tab_key()
+        if key is None:
+            messagebox.showinfo("Save preset", "Select a tool tab first.")
             return
-        data = load_presets()
-        data[name] = self.gather_state()
-        save_presets(data)
-        messagebox.showinfo("Presets", f"Saved preset '{name}'.")
+        self._save_preset({key: self.tab(key).get_state()}, f"{key} tab")
 
 venv_path = r'.\.venv\Scripts\Activate.ps1'
 
+# ---------------------------------------------------------------------------
+# Self benchmark of the runner and log pipeline. `fake-tool` emits synthetic
+# output at a given line rate / size with optional progress lines; `perf`
+# drives it through Job, JobQueue and (when a display is available, e.g.
+# under Xvfb) AsyncRunner + LogPane, and compares against a JSON baseline.
+# ---------------------------------------------------------------------------
+# metric -> which direction is better
+PERF_METRICS = {
+    "job_lines_per_sec": "higher",
+    "concurrent_cpu_ms_per_1k_lines": "lower",
+    "runner_lines_per_sec": "higher",
+    "mainloop_latency_p95_ms": "lower",
+    "mainloop_latency_max_ms": "lower",
+    "log_memory_kb": "lower",
+    "startup_ms": "lower",
+}
+
+_FAKE_TOOLS = {}
+
+def fake_tool_exe(name):
+    """Path of a wrapper named like a real tool (so its progress parser is
+    used) that runs `media_tool.py fake-tool`."""
+    if name not in _FAKE_TOOLS:
+        base = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+        folder = tempfile.mkdtemp(prefix="media_tool_fake_")
+        atexit.register(shutil.rmtree, folder, True)
+        if os.name == "nt":
+            path = os.path.join(folder, name + ".bat")
+            script = "@" + subprocess.list2cmdline(base + ["fake-tool"]) + " %*\r\n"
+        else:
+            path = os.path.join(folder, name)
+            script = "#!/bin/sh\nexec " + " ".join(shlex.quote(a) for a in base) + ' fake-tool "$@"\n'
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+        _FAKE_TOOLS[name] = path
+    return _FAKE_TOOLS[name]
+
+def fake_tool_cmd(tool, lines, rate=0, line_bytes=80, progress="none"):
+    """argv for the fake tool posing as ``tool`` (e.g. "ffmpeg")."""
+    return [fake_tool_exe(tool), "--lines", str(lines), "--rate", str(rate), "--line-bytes", str(line_bytes),
+            "--progress", progress]
+
+def cli_fake_tool(args):
+    out = sys.stdout.buffer
+    filler = b"x" * max(0, args.line_bytes - 9)
+    start = time.perf_counter()
+    every = max(1, args.progress_every)
+    for i in range(args.lines):
+        if args.rate:
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                out.flush()
+                time.sleep(delay)
+        if args.progress != "none" and i % every == 0:
+            pct = 100.0 * i / args.lines
+            if args.progress == "ffmpeg":
+                out.write(b"frame=%d\nfps=50.0\nout_time_us=%d\nspeed=2.0x\nprogress=continue\n" % (i, i * 20000))
+            elif args.progress == "percent":
+                out.write(b"Progress: %.1f%%\r" % pct)
+            elif args.progress == "mkvmerge":
+                out.write(b"#GUI#progress %d%%\n" % int(pct))
+        out.write(b"%08d %s\n" % (i, filler))
+    out.flush()
+    return args.exit_code
+
+def rss_kb():
+    """Resident set size of this process in kB, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # peak, kB on Linux
+    except ImportError:
+        return None
+
+def perf_job(lines, line_bytes):
+    """Lines per second through Job.execute (pipe reader + progress parser)."""
+    job = Job(fake_tool_cmd("ffmpeg", lines, line_bytes=line_bytes, progress="ffmpeg"))
+    t0 = time.perf_counter()
+    job.execute()
+    elapsed = time.perf_counter() - t0
+    if job.status != "done":
+        raise RuntimeError(f"fake tool failed: {list(job.lines)[-3:]}")
+    return {"job_lines_per_sec": round(lines / elapsed)}
+
+def perf_concurrent(jobs, lines, line_bytes):
+    """CPU time this process spends per 1000 lines with ``jobs`` jobs at once."""
+    queue_ = JobQueue(jobs)
+    cpu = time.process_time()
+    submitted = [queue_.submit(fake_tool_cmd("dovi_tool", lines, line_bytes=line_bytes, progress="percent"))
+                 for _ in range(jobs)]
+    while any(j.active for j in submitted):
+        time.sleep(0.05)
+    cpu = time.process_time() - cpu
+    return {"concurrent_cpu_ms_per_1k_lines": round(cpu * 1000 / (jobs * lines / 1000), 3)}
+
+def perf_gui(lines, line_bytes):
+    """AsyncRunner throughput, main-loop latency while it streams and LogPane
+    memory growth. Empty if Tk cannot open a display."""
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return {}
+    root.withdraw()
+    pane = LogPane(root)
+    pane.pack()
+    button = ttk.Button(root)
+    runner = AsyncRunner(pane.text, button, button, progress_view=pane)
+    latencies = []
+    result = {}
+
+    def tick(expected):
+        now = time.perf_counter()
+        latencies.append(max(0.0, now - expected))
+        if str(button["state"]) == "disabled" or len(latencies) < 2:
+            root.after(10, tick, now + 0.010)
+        else:
+            result["elapsed"] = now - t0
+            root.quit()
+    t0 = time.perf_counter()
+    runner.run(fake_tool_cmd("ffmpeg", lines, line_bytes=line_bytes, progress="ffmpeg"))
+    if runner.proc is None:
+        root.destroy()
+        raise RuntimeError("fake tool did not start")
+    root.after(10, tick, time.perf_counter() + 0.010)
+    root.mainloop()
+    latencies.sort()
+    res = {
+        "runner_lines_per_sec": round(lines / result["elapsed"]),
+        "mainloop_latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        "mainloop_latency_max_ms": round(latencies[-1] * 1000, 2),
+    }
+    # Memory: fill a fresh log far past its line limit
+    text = LogPane(root).text
+    before = rss_kb()
+    batch = [("%08d %s" % (i, "x" * line_bytes), False) for i in range(500)]
+    for _ in range(max(1, lines // 500)):
+        text.append(batch)
+        root.update_idletasks()
+    after = rss_kb()
+    if before is not None and after is not None:
+        res["log_memory_kb"] = after - before
+    root.destroy()
+    return res
+
+def perf_startup():
+    """Time to first window from a fresh `startup-time` process, or {}."""
+    cmd = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+    try:
+        out = subprocess.run(cmd + ["startup-time", "--budget-ms", "600000"], capture_output=True, timeout=120).stdout
+        ms = json.loads(out.decode().strip().splitlines()[-1]).get("first_window_ms")
+    except (OSError, ValueError, IndexError, subprocess.TimeoutExpired):
+        return {}
+    return {"startup_ms": ms} if ms is not None else {}
+
+def compare_perf(results, baseline, tolerance):
+    """(report lines, regression count) of results against a baseline dict."""
+    lines, regressions = [], 0
+    old_results = baseline.get("results", {})
+    for key, better in PERF_METRICS.items():
+        new, old = results.get(key), old_results.get(key)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        worse = change < -tolerance if better == "higher" else change > tolerance
+        regressions += worse
+        lines.append(f"{key}: {old:g} -> {new:g} ({change:+.0%}){'  REGRESSION' if worse else ''}")
+    return lines, regressions
+
+def cli_perf(args):
+    results = {}
+    print(f"Job pipeline: {args.lines} lines of {args.line_bytes} bytes...", flush=True)
+    results.update(perf_job(args.lines, args.line_bytes))
+    print(f"{args.jobs} concurrent jobs...", flush=True)
+    results.update(perf_concurrent(args.jobs, args.lines // args.jobs, args.line_bytes))
+    if not args.skip_gui:
+        print("AsyncRunner / LogPane...", flush=True)
+        gui = perf_gui(args.lines, args.line_bytes)
+        if not gui:
+            print("  skipped: no display (run under Xvfb, or pass --skip-gui)")
+        results.update(gui)
+        print("Startup...", flush=True)
+        results.update(perf_startup())
+    for key in PERF_METRICS:
+        if key in results:
+            print(f"  {key}: {results[key]:g}")
+    report = {"version": APP_VERSION, "python": sys.version.split()[0], "platform": sys.platform,
+              "lines": args.lines, "line_bytes": args.line_bytes, "jobs": args.jobs,
+              "created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare_perf(results, baseline, args.tolerance)
+        print(f"Against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for line in lines:
+            print("  " + line)
+        return 1 if regressions else 0
+    return 0
+
+# ---------------------------------------------------------------------------
+# Headless command line. With no arguments the GUI starts as before; with a
+# subcommand no Tk window is created, e.g.
+#   python media_tool.py run --preset UHD --tab ffmpeg -i a.mkv -i b.mkv -j 4
+# ---------------------------------------------------------------------------
+PRESET_TABS = tuple(COMMAND_BUILDERS) + ("pipeline",)
+TAB_TOOL_KEYS = {
+    "dovi": [("path", "dovi_tool")],
+    "mp4": [("path", "mp4muxer")],
+    "mkv": [(t, t) for t in ("mkvmerge", "mkvextract", "mkvinfo", "mkvpropedit")],
+    "ffmpeg": [("path", "ffmpeg"), ("ffprobe", "ffprobe")],
+    "pipeline": [(t, t) for t in PIPELINE_TOOLS],
+}
+
+def resolve_tool_paths(tab, opts):
+    """Swap tool paths that do not exist on this machine for discovered ones."""
+    for key, name in TAB_TOOL_KEYS[tab]:
+        if not opts.get(key) or not os.path.isfile(opts[key]):
+            found = find_exe(name)
+            if found:
+                opts[key] = found
+
+def preset_output_key(tab, opts):
+    if tab == "dovi":
+        return "rpu_out" if opts.get("subcmd") == "extract-rpu" else "out"
+    if tab == "pipeline":
+        return "rpu" if opts.get("workflow", "extract-rpu") == "extract-rpu" else "output"
+    return {"mp4": "out", "mkv": "out", "ffmpeg": "output"}[tab]
+
+def apply_preset_io(tab, opts, input_path=None, output_path=None):
+    """Point a preset section at another main input / output file (in place)."""
+    if input_path:
+        if tab == "mp4":
+            inputs = opts.setdefault("inputs", [])
+            if not inputs:
+                inputs.append({"file": ""})
+            inputs[0]["file"] = input_path
+        else:
+            opts[{"dovi": "in", "mkv": "src", "ffmpeg": "input", "pipeline": "source"}[tab]] = input_path
+    if output_path:
+        opts[preset_output_key(tab, opts)] = output_path
+    return opts
+
+def expand_output(template, input_path):
+    """Fill {dir} {name} {stem} {ext} of an output template from an input path."""
+    p = os.path.abspath(input_path)
+    folder, name = os.path.split(p)
+    stem, ext = os.path.splitext(name)
+    return template.format(dir=folder, name=name, stem=stem, ext=ext)
+
+def preset_commands(section, tab, inputs, output=None):
+    """Build one argv per input (or one for the preset as saved) from a preset section.
+
+    Pipeline sections (and chunked FFmpeg ones) give a Job per input instead of an argv.
+    """
+    if len(inputs) > 1 and not output and section.get(preset_output_key(tab, section)):
+        raise ValueError("--output template (e.g. '{dir}/{stem}.out.mkv') is required for multiple inputs")
+    cmds = []
+    for inp in inputs or [None]:
+        opts = copy.deepcopy(section)
+        resolve_tool_paths(tab, opts)
+        out = expand_output(output, inp) if (output and inp) else output
+        apply_preset_io(tab, opts, inp, out)
+        if tab == "pipeline":
+            cmds.append(build_pipeline_job(opts))
+        elif tab == "ffmpeg" and opts.get("chunked"):
+            cmds.append(build_chunked_job(opts))
+        else:
+            cmds.append(COMMAND_BUILDERS[tab](opts))
+    return cmds
+
+def preset_section(store, name, tab=None):
+    """(tab, settings) of a stored preset; ``tab`` may be omitted when the
+    preset has settings for a single runnable tab."""
+    preset = store.get(name, tab)
+    if not preset:
+        where = f"'{tab}' settings of " if tab else ""
+        raise ValueError(f"No {where}preset '{name}' in {store.path}")
+    if tab is None:
+        runnable = [t for t in preset if t in PRESET_TABS]
+        if len(runnable) != 1:
+            raise ValueError(f"Preset '{name}' has settings for {', '.join(runnable) or 'no runnable tab'}; pick a tab")
+        tab = runnable[0]
+    return tab, preset[tab]
+
+def check_watch_entry(entry, store):
+    """Validate a watch-folder entry; returns the tab it will run."""
+    if not os.path.isdir(entry["folder"]):
+        raise ValueError(f"Folder not found: {entry['folder']}")
+    tab, section = preset_section(store, entry["preset"], entry.get("tab"))
+    if not entry.get("output") and section.get(preset_output_key(tab, section)):
+        raise ValueError("An output template is needed, otherwise every file would overwrite the preset's output")
+    return tab
+
+def watch_ingest(entry, path, jobs, store, watcher):
+    """Queue the entry's preset for one settled file (called by FolderWatcher)."""
+    tab, section = preset_section(store, entry["preset"], entry.get("tab"))
+    output = entry.get("output") or None
+    if output:
+        # Outputs may land in a watched folder: never pick them up as input
+        watcher.ignore(expand_output(output, path))
+    queued = []
+    for cmd in preset_commands(section, tab, [path], output):
+        if isinstance(cmd, Job):
+            queued.append(jobs.add(cmd))
+        else:
+            queued.append(jobs.submit(cmd, label=f"{tab} {os.path.basename(path)}"))
+    watcher.log(f"{os.path.basename(path)}: queued preset '{entry['preset']}' ({tab}) as job "
+                + ", ".join(str(j.id) for j in queued))
+    return queued
+
+def read_input_list(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+
+def expand_inputs(patterns):
+    """Expand wildcards ourselves (cmd.exe does not) and keep plain paths as given."""
+    result = []
+    for p in patterns:
+        matches = sorted(glob.glob(p)) if glob.has_magic(p) else []
+        result.extend(matches or [p])
+    return result
+
+def job_result(job):
+    return job.status if job.returncode is None else f"{job.status} (exit {job.returncode})"
+
+def print_job_output(jobs, seen, out):
+    """Write the new log lines (and a progress line every few seconds) of
+    ``jobs``; ``seen`` keeps the position per job between calls. Returns
+    True while any of them is still queued or running."""
+    active = False
+    for job in jobs:
+        pos, stamp, shown = seen.get(job.id, (0, 0, ""))
+        records, pos = job.tail(pos)
+        for text, transient in records:
+            if not transient:
+                out.write(f"[job {job.id}] {text}\n")
+        summary = job.progress.summary()
+        if job.status == "running" and summary and summary != shown and time.time() - stamp >= 2:
+            out.write(f"[job {job.id}] progress {summary}\n")
+            stamp, shown = time.time(), summary
+        seen[job.id] = (pos, stamp, shown)
+        active = active or job.active
+    out.flush()
+    return active
+
+def run_jobs_headless(cmds, workers, out=None, agents=(), policy=None, builds=None, force=False,
+                      partial_outputs="delete"):
+    """Run argv lists (or ready Jobs) on a JobQueue, streaming prefixed logs.
+    ``agents`` is an optional (addresses, path maps, token) for JobQueue.use_agents;
+    with a BuildCache ``builds`` up-to-date jobs are skipped unless ``force``.
+    Ctrl+C cancels the jobs. Returns the number of failed jobs."""
+    out = out or sys.stdout
+    jobs = JobQueue(workers)
+    jobs.partial_outputs = partial_outputs
+    if agents:
+        jobs.use_agents(*agents)
+    if policy is not None:
+        jobs.set_policy(policy)
+    if builds is not None:
+        jobs.use_build_cache(builds, force)
+    submitted = [jobs.add(cmd) if isinstance(cmd, Job) else jobs.submit(cmd) for cmd in cmds]
+    seen = {}
+    try:
+        while print_job_output(submitted, seen, out):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        # The tools run in their own process groups and do not see the Ctrl+C
+        out.write("Interrupted, cancelling jobs...\n")
+        for job in submitted:
+            jobs.cancel(job)
+        while print_job_output(submitted, seen, out):
+            time.sleep(0.2)
+    failed = [j for j in submitted if j.status not in ("done", "skipped")]
+    for job in submitted:
+        out.write(f"[job {job.id}] {job_result(job)}\n")
+    return len(failed)
+
+def add_policy_args(parser):
+    parser.add_argument("--nice", type=int, default=0, help="lower the priority of the tools, 0-19 (default: %(default)s)")
+    parser.add_argument("--cpus", type=parse_cpu_list, help="pin the tools to these CPUs, e.g. 0-7,16-23")
+    parser.add_argument("--threads", type=parse_thread_budget, default=0, metavar="N|auto|off",
+                        help="ffmpeg threads per job (default: auto, an equal share of the free cores)")
+    parser.add_argument("--max-load", type=parse_max_load, default=0, metavar="LOAD|auto|off",
+                        help="hold queued jobs while the load average is at or above this (default: off)")
+
+def policy_from_args(args):
+    return ResourcePolicy(args.nice, args.cpus, args.threads, args.max_load)
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="media_tool.py", description=f"{APP_TITLE} {APP_VERSION}. Run without arguments to start the GUI.")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="run a saved preset without the GUI")
+    run.add_argument("--preset", required=True, help="preset name from the presets file")
+    run.add_argument("--tab", choices=PRESET_TABS, help="which tab of the preset to run (needed if it has several)")
+    run.add_argument("-i", "--input", action="append", default=[], help="input file (repeatable, wildcards allowed)")
+    run.add_argument("--inputs-from", metavar="LIST", help="text file with one input path per line")
+    run.add_argument("-o", "--output", help="output path, or template using {dir} {name} {stem} {ext}")
+    run.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOB_WORKERS, help="parallel jobs (default: %(default)s)")
+    run.add_argument("--dry-run", action="store_true", help="print the commands instead of running them")
+    run.add_argument("--force", action="store_true", help="run jobs even when their outputs are up to date")
+    run.add_argument("--build-cache", default=BUILD_CACHE_FILE, help="fingerprints of finished jobs (default: %(default)s)")
+    run.add_argument("--partial-outputs", choices=PARTIAL_OUTPUT_MODES, default="delete",
+                     help="files created by a cancelled job: delete, rename to .partial or keep (default: %(default)s)")
+    run.add_argument("--presets-file", default=DEFAULT_PRESET_FILE, help="preset database (a .json file of older versions is imported)")
+    run.add_argument("--agent", action="append", default=[], metavar="HOST:PORT",
+                     help="dispatch jobs to worker agents (repeatable; default: $MEDIA_TOOL_AGENTS)")
+    run.add_argument("--path-map", action="append", default=[], metavar="FROM=TO",
+                     help="rewrite path prefixes for the agents (repeatable)")
+    run.add_argument("--agent-token", help="shared secret of the agents (default: $MEDIA_TOOL_AGENT_TOKEN)")
+    add_policy_args(run)
+
+    ag = sub.add_parser("agent", help="run as a worker agent that executes jobs sent by other machines")
+    ag.add_argument("--listen", default=f"127.0.0.1:{DEFAULT_AGENT_PORT}", metavar="HOST:PORT",
+                    help="address to listen on (default: %(default)s; port 0 picks a free one)")
+    ag.add_argument("--slots", type=int, default=DEFAULT_JOB_WORKERS, help="parallel jobs (default: %(default)s)")
+    ag.add_argument("--path-map", action="append", default=[], metavar="FROM=TO",
+                    help="extra path prefix rewrites applied to every job (repeatable)")
+    ag.add_argument("--token", help="shared secret clients must send (default: $MEDIA_TOOL_AGENT_TOKEN)")
+    ag.add_argument("--partial-outputs", choices=PARTIAL_OUTPUT_MODES, default="delete",
+                    help="files created by a cancelled job: delete, rename to .partial or keep (default: %(default)s)")
+    add_policy_args(ag)
+
+    wt = sub.add_parser("watch", help="queue a preset for every new file in drop folders, once the file stops growing")
+    wt.add_argument("folder", nargs="*", help="folder(s) to watch (default: the watch folders set up in the GUI)")
+    wt.add_argument("--preset", help="preset to run on each new file")
+    wt.add_argument("--tab", choices=PRESET_TABS, help="which tab of the preset to run (needed if it has several)")
+    wt.add_argument("-o", "--output", help="output template using {dir} {name} {stem} {ext} of the new file")
+    wt.add_argument("--pattern", default="*", help="file name patterns, e.g. '*.mkv;*.mp4' (default: %(default)s)")
+    wt.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                    help="seconds a file's size and mtime must hold still (default: %(default)s)")
+    wt.add_argument("--existing", action="store_true", help="also queue files already in the folders")
+    wt.add_argument("--poll", action="store_true", help="poll the folders instead of using inotify")
+    wt.add_argument("--force", action="store_true", help="run jobs even when their outputs are up to date")
+    wt.add_argument("--build-cache", default=BUILD_CACHE_FILE, help="fingerprints of finished jobs (default: %(default)s)")
+    wt.add_argument("--partial-outputs", choices=PARTIAL_OUTPUT_MODES, default="delete",
+                    help="files created by a cancelled job: delete, rename to .partial or keep (default: %(default)s)")
+    wt.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOB_WORKERS, help="parallel jobs (default: %(default)s)")
+    wt.add_argument("--presets-file", default=DEFAULT_PRESET_FILE, help="preset database (a .json file of older versions is imported)")
+    add_policy_args(wt)
+
+    lst = sub.add_parser("list-presets", help="list saved preset names")
+    lst.add_argument("--presets-file", default=DEFAULT_PRESET_FILE)
+    lst.add_argument("--tab", choices=PRESET_TABS, help="only presets with settings for this tab")
+    lst.add_argument("--search", default="", help="only names containing this text")
+
+    ri = sub.add_parser("rpu-info", help="frame count, profile and header of an RPU .bin (no dovi_tool needed)")
+    ri.add_argument("rpu", help="RPU file written by dovi_tool extract-rpu")
+    ri.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    ins = sub.add_parser("inspect", help="list the tracks of a Matroska or MP4 file (no mkvinfo/mediainfo needed)")
+    ins.add_argument("file")
+    ins.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    bn = sub.add_parser("bench", help="encoder benchmark: codec x preset x CRF on a test pattern or a sample of a file")
+    bn.add_argument("-i", "--input", help="sample this file instead of a synthetic test pattern")
+    bn.add_argument("--start", type=float, default=0.0, help="where the sample starts, in seconds")
+    bn.add_argument("--seconds", type=float, default=DEFAULT_BENCH_SECONDS, help="clip length (default: %(default)s)")
+    bn.add_argument("--codec", action="append", default=[], help="encoder(s), repeatable or comma separated (default: libx265)")
+    bn.add_argument("--preset", action="append", default=[], help="preset(s) (default: %s)" % ",".join(BENCH_PRESETS))
+    bn.add_argument("--crf", action="append", default=[], help="CRF value(s) (default: %s)" % ",".join(BENCH_CRFS))
+    bn.add_argument("--quality", action="store_true", help="also measure SSIM and PSNR against the source")
+    bn.add_argument("-o", "--output", help="write the results to a .csv or .json file")
+    bn.add_argument("--ffmpeg", help="ffmpeg executable (default: auto-detected)")
+
+    pf = sub.add_parser("perf", help="benchmark the runner / log pipeline with a fake tool; compare with a JSON baseline")
+    pf.add_argument("--lines", type=int, default=200000, help="lines per run (default: %(default)s)")
+    pf.add_argument("--line-bytes", type=int, default=100, help="bytes per line (default: %(default)s)")
+    pf.add_argument("--jobs", type=int, default=4, help="jobs in the concurrency run (default: %(default)s)")
+    pf.add_argument("--skip-gui", action="store_true", help="only the headless measurements")
+    pf.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    pf.add_argument("--baseline", metavar="JSON", help="compare with a saved baseline; exit 1 on a regression")
+    pf.add_argument("--tolerance", type=float, default=0.25, help="allowed change before a metric counts as regressed (default: %(default)s)")
+
+    ft = sub.add_parser("fake-tool", help="emit synthetic tool output (used by perf)")
+    ft.add_argument("--lines", type=int, default=1000)
+    ft.add_argument("--rate", type=float, default=0, help="lines per second (0 = as fast as possible)")
+    ft.add_argument("--line-bytes", type=int, default=80)
+    ft.add_argument("--progress", choices=("none", "ffmpeg", "percent", "mkvmerge"), default="none")
+    ft.add_argument("--progress-every", type=int, default=100, help="lines between progress reports")
+    ft.add_argument("--exit-code", type=int, default=0)
+    # Accepted and ignored: what prepare_progress_cmd() adds for the real tools
+    ft.add_argument("-progress", help=argparse.SUPPRESS)
+    ft.add_argument("-nostats", "-stats", "--gui-mode", action="store_true", help=argparse.SUPPRESS)
+
+    st = sub.add_parser("startup-time", help="open the GUI, report time to first window as JSON and exit")
+    st.add_argument("--budget-ms", type=int, help="fail (exit 1) above this many ms (default: %d or $MEDIA_TOOL_STARTUP_BUDGET_MS)" % STARTUP_BUDGET_MS)
+    return parser
+
+def cli_run(args):
+    args.tab, section = preset_section(open_presets(args.presets_file), args.preset, args.tab)
+    inputs = expand_inputs(args.input)
+    if args.inputs_from:
+        inputs += read_input_list(args.inputs_from)
+    missing = [p for p in inputs if not os.path.isfile(p)]
+    if missing:
+        raise ValueError("Input file(s) not found: " + ", ".join(missing))
+    cmds = preset_commands(section, args.tab, inputs, args.output)
+    builds = BuildCache(args.build_cache)
+    if args.dry_run:
+        for cmd in cmds:
+            fp = builds.fingerprint(cmd if isinstance(cmd, Job) else Job(cmd))
+            if fp and builds.up_to_date(fp) and not args.force:
+                print("# up to date, would be skipped:")
+            if isinstance(cmd, PipelineJob):
+                print("\n".join(cmd.describe()))
+            elif isinstance(cmd, ChunkedEncodeJob):
+                print(f"# {cmd.split} chunks of ~{cmd.chunk_seconds:g}s, {cmd.workers} at a time, e.g.")
+                print(format_cmd(cmd.chunk_cmd(0, 0.0, cmd.chunk_seconds)))
+            else:
+                print(format_cmd(cmd))
+        return 0
+    env_agents, env_maps, env_token = agents_from_env()
+    agents = [parse_address(a) for a in args.agent] or env_agents
+    maps = parse_path_maps(args.path_map) or env_maps
+    remote = (agents, maps, args.agent_token or env_token) if agents else ()
+    failed = run_jobs_headless(cmds, args.jobs, agents=remote, policy=policy_from_args(args),
+                               builds=builds, force=args.force, partial_outputs=args.partial_outputs)
+    return 1 if failed else 0
+
+def cli_watch(args):
+    store = open_presets(args.presets_file)
+    if args.folder:
+        if not args.preset:
+            raise ValueError("--preset is required with folders on the command line")
+        entries = [{"folder": f, "pattern": args.pattern, "preset": args.preset, "tab": args.tab,
+                    "output": args.output or "", "settle": args.settle} for f in args.folder]
+    else:
+        entries = store.watch_folders()
+        if not entries:
+            raise ValueError("No watch folders given or saved")
+    for entry in entries:
+        entry["tab"] = check_watch_entry(entry, store)
+    jobs = JobQueue(args.jobs)
+    jobs.set_policy(policy_from_args(args))
+    jobs.use_build_cache(BuildCache(args.build_cache), args.force)
+    jobs.partial_outputs = args.partial_outputs
+    watcher = FolderWatcher(entries, lambda entry, path: watch_ingest(entry, path, jobs, store, watcher),
+                            args.existing, use_inotify=not args.poll)
+    watcher.start()
+    seen = {}
+    try:
+        while True:
+            while watcher.messages:
+                print(f"[watch] {watcher.messages.popleft()}")
+            current = list(jobs.jobs)
+            finished = [j for j in current if not j.active]
+            print_job_output(current, seen, sys.stdout)
+            for job in finished:
+                print(f"[job {job.id}] {job_result(job)}")
+                seen.pop(job.id, None)
+            jobs.clear_finished(finished)
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        for job in list(jobs.jobs):
+            jobs.cancel(job)
+        while print_job_output(list(jobs.jobs), seen, sys.stdout):
+            time.sleep(0.2)
+    return 0
+
+def cli_agent(args):
+    token = args.token or os.environ.get("MEDIA_TOOL_AGENT_TOKEN") or None
+    address = parse_address(args.listen)
+    if not token and not is_loopback(address[0]):
+        # Anyone who can connect could make the tools read and write any path
+        raise ValueError(f"listening on {address[0]} needs --token (or MEDIA_TOOL_AGENT_TOKEN)")
+    server = AgentServer(address, args.slots, token, parse_path_maps(args.path_map),
+                         policy_from_args(args))
+    server.jobs.partial_outputs = args.partial_outputs
+    host, port = server.server_address[:2]
+    print(f"{APP_TITLE} agent listening on {host}:{port} ({server.jobs.workers} slots)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for job in list(server.jobs.jobs):
+            server.jobs.cancel(job)
+        while any(job.active for job in server.jobs.jobs):
+            time.sleep(0.2)
+        server.server_close()
+    return 0
+
+def cli_rpu_info(args):
+    info = inspect_rpu(args.rpu)
+    if args.json:
+        print(json.dumps(info, indent=2))
+    else:
+        print("\n".join(format_rpu_info(info)))
+    return 0
+
+def cli_inspect(args):
+    kind = sniff_container(args.file)
+    if kind == "mp4":
+        info = inspect_mp4(args.file)
+        info["problems"] = mp4_checks(info)
+        lines = format_mp4_info(info, info["problems"])
+    else:
+        info = inspect_mkv(args.file)
+        lines = format_mkv_info(info)
+    if args.json:
+        print(json.dumps(info, indent=2))
+    else:
+        print("\n".join(lines))
+    return 0
+
+def cli_bench(args):
+    ffmpeg = args.ffmpeg or find_exe("ffmpeg")
+    if not ffmpeg:
+        raise ValueError("ffmpeg not found; pass --ffmpeg")
+    if args.input and not os.path.isfile(args.input):
+        raise ValueError(f"Input file not found: {args.input}")
+    lists = [parse_bench_list(",".join(values)) for values in (args.codec, args.preset, args.crf)]
+    cases = bench_cases(lists[0] or ["libx265"], lists[1] or BENCH_PRESETS, lists[2] or BENCH_CRFS)
+    job = BenchmarkJob(ffmpeg, cases, args.input, args.start, args.seconds, args.quality)
+    failed = run_jobs_headless([job], 1)
+    if args.output and job.results:
+        write_bench_results(job.results, args.output)
+        print(f"Results written to {args.output}")
+    return 1 if failed else 0
+
+def cli_startup_time(args):
+    app = App()
+    deadline = time.time() + 30
+
+    def close_when_shown():
+        if app.startup_ms is None and time.time() < deadline:
+            app.after(20, close_when_shown)
+        else:
+            app.destroy()
+    app.after(20, close_when_shown)
+    app.mainloop()
+    budget = args.budget_ms or startup_budget_ms()
+    ms = app.startup_ms
+    print(json.dumps({"first_window_ms": None if ms is None else round(ms, 1), "budget_ms": budget}))
+    return 0 if ms is not None and ms <= budget else 1
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        PROFILER.run_mainloop(App())
+        return 0
+    try:
+        if args.command == "run":
+            return cli_run(args)
+        if args.command == "watch":
+            return cli_watch(args)
+        if args.command == "agent":
+            return cli_agent(args)
+        if args.command == "perf":
+            return cli_perf(args)
+        if args.command == "fake-tool":
+            return cli_fake_tool(args)
+        if args.command == "bench":
+            return cli_bench(args)
+        if args.command == "inspect":
+            return cli_inspect(args)
+        if args.command == "rpu-info":
+            return cli_rpu_info(args)
+        if args.command == "startup-time":
+            return cli_startup_time(args)
+        if args.command == "list-presets":
+            for name, tabs in open_presets(args.presets_file).names(args.search, args.tab).items():
+                print(f"{name}  ({', '.join(tabs)})")
+            return 0
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
 if __name__ == "__main__":
-    App().mainloop()
+    sys.exit(main())